@@ -0,0 +1,21 @@
+import time
+
+
+def setup_module():
+    time.sleep(0.1)
+
+def test_slow():
+    time.sleep(0.05)
+
+def test_fast():
+    pass
+
+
+class TestClass:
+
+    def setup_class(cls):
+        pass
+    setup_class = classmethod(setup_class)
+
+    def test_method(self):
+        pass
@@ -0,0 +1,9 @@
+import alpha
+
+
+def test_double():
+    assert alpha.double(2) == 4
+
+
+def test_nothing():
+    pass
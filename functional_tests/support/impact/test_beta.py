@@ -0,0 +1,6 @@
+import beta
+
+
+class TestNegate:
+    def test_negate(self):
+        assert beta.negate(1) == -1
@@ -0,0 +1,12 @@
+import gamma
+
+state = None
+
+
+def setup_module():
+    global state
+    state = gamma.prepare()
+
+
+def test_state():
+    assert state == []
@@ -0,0 +1 @@
+import no_such_module_for_the_index
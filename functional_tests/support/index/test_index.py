@@ -0,0 +1,17 @@
+def setup():
+    raise AssertionError("fixtures must not run when indexing")
+
+def test_function():
+    pass
+
+def test_generator():
+    raise AssertionError("generators must not be called when indexing")
+    yield
+
+class TestClass:
+    def test_method(self):
+        pass
+
+    def test_generator_method(self):
+        raise AssertionError("generators must not be called when indexing")
+        yield
@@ -0,0 +1,13 @@
+import time
+
+
+def spin(seconds):
+    end = time.time() + seconds
+    while time.time() < end:
+        pass
+
+def test_busy():
+    spin(0.3)
+
+def test_idle():
+    pass
@@ -0,0 +1,2 @@
+def test_s6():
+    pass
@@ -0,0 +1,74 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from cStringIO import StringIO
+from nose.config import Config
+from nose.core import TestProgram
+from nose.plugins.capture import Capture
+from nose.plugins.collect import CollectOnly
+from nose.plugins.manager import PluginManager
+
+support = os.path.join(os.path.dirname(__file__), 'support')
+
+
+class TestCollectIndex(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.index = tempfile.mkstemp()
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.index)
+
+    def test_index_written_without_running_anything(self):
+        stream = StringIO()
+        config = Config(plugins=PluginManager(plugins=[CollectOnly()]),
+                        stream=stream)
+        prog = TestProgram(argv=['nosetests', '--test-index=%s' % self.index,
+                                 os.path.join(support, 'index')],
+                           config=config, exit=False)
+        assert not prog.success
+        self.assertEqual(stream.getvalue(), "Indexed 5 tests\n")
+
+        records = [json.loads(line) for line in open(self.index)]
+        ids = sorted([r['id'] for r in records])
+        self.assertEqual(ids, [
+            'test_broken',
+            'test_index.TestClass.test_generator_method',
+            'test_index.TestClass.test_method',
+            'test_index.test_function',
+            'test_index.test_generator'])
+        by_id = dict([(r['id'], r) for r in records])
+        function = by_id['test_index.test_function']
+        self.assertEqual(function['call'], 'test_function')
+        self.assertEqual(function['module'], 'test_index')
+        self.assertEqual(function['file'],
+                         os.path.join(support, 'index', 'test_index.py'))
+        assert by_id['test_index.test_generator']['generator']
+        assert 'generator' not in function
+        assert 'ImportError' in by_id['test_broken']['error']
+
+    def test_index_written_to_stdout_while_capturing(self):
+        stream = StringIO()
+        stdout = StringIO()
+        config = Config(plugins=PluginManager(plugins=[CollectOnly(),
+                                                       Capture()]),
+                        stream=stream)
+        old_stdout = sys.stdout
+        sys.stdout = stdout
+        try:
+            TestProgram(argv=['nosetests', '--test-index=-',
+                              os.path.join(support, 'index')],
+                        config=config, exit=False)
+        finally:
+            sys.stdout = old_stdout
+        self.assertEqual(stream.getvalue(), "Indexed 5 tests\n")
+        records = [json.loads(line)
+                   for line in stdout.getvalue().splitlines()]
+        self.assertEqual(len(records), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
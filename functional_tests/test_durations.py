@@ -0,0 +1,79 @@
+import json
+import os
+import tempfile
+import unittest
+from cStringIO import StringIO
+from nose.config import Config
+from nose.core import TestProgram
+from nose.plugins.manager import PluginManager
+from nose.plugins.xunit import Xunit
+from xml.etree import ElementTree
+
+support = os.path.join(os.path.dirname(__file__), 'support', 'durations')
+
+
+class TestDurations(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.durations = tempfile.mkstemp()
+        os.close(fd)
+
+    def tearDown(self):
+        os.remove(self.durations)
+
+    def run_durations(self, *args):
+        stream = StringIO()
+        config = Config(plugins=PluginManager(plugins=[Xunit()]),
+                        stream=stream)
+        prog = TestProgram(argv=['nosetests'] + list(args) + [support],
+                           config=config, exit=False)
+        assert prog.success
+        return stream.getvalue()
+
+    def test_slowest_reported(self):
+        output = self.run_durations('--durations=1')
+        print output
+        lines = output.splitlines()
+        ix = lines.index('Slowest 1 tests:')
+        assert lines[ix + 1].endswith('  test_timed.test_slow'), lines[ix + 1]
+        ix = lines.index('Slowest 1 fixture contexts:')
+        assert '  test_timed (setup ' in lines[ix + 1], lines[ix + 1]
+        assert 'Test durations (3 tests, ' in output
+        assert '  p50 ' in output
+        self.assertEqual(os.path.getsize(self.durations), 0)
+
+    def test_fixture_times_in_xunit(self):
+        os.remove(self.durations)
+        self.run_durations('--with-xunit', '--xunit-file=%s' % self.durations)
+        tree = ElementTree.parse(self.durations)
+        props = dict([(p.get('name'), float(p.get('value')))
+                      for p in tree.findall('properties/property')])
+        self.assertEqual(sorted(props.keys()), [
+            'setup:test_timed', 'setup:test_timed.TestClass',
+            'teardown:test_timed', 'teardown:test_timed.TestClass'])
+        assert props['setup:test_timed'] >= 0.1
+        self.assertEqual(len(tree.findall('testcase')), 3)
+
+    def test_durations_file(self):
+        output = self.run_durations('--durations-file=%s' % self.durations)
+        assert 'Slowest' not in output
+        data = json.load(open(self.durations))
+        tests = dict([(t['id'], t['time']) for t in data['tests']])
+        self.assertEqual(sorted(tests.keys()), [
+            'test_timed.TestClass.test_method',
+            'test_timed.test_fast',
+            'test_timed.test_slow'])
+        assert tests['test_timed.test_slow'] >= 0.05
+        contexts = dict([(c['id'], c['time']) for c in data['contexts']])
+        self.assertEqual(sorted(contexts.keys()),
+                         ['test_timed', 'test_timed.TestClass'])
+        assert contexts['test_timed'] >= 0.1
+        module = [c for c in data['contexts'] if c['id'] == 'test_timed'][0]
+        assert module['setup'] >= 0.1
+        assert module['teardown'] < 0.1
+        self.assertEqual(data['percentiles']['max'],
+                         tests['test_timed.test_slow'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+import json
+import os
+import tempfile
+import unittest
+from nose.plugins import PluginTester
+from nose.plugins.hooktiming import HookTiming
+from nose.plugins.skip import Skip
+
+support = os.path.join(os.path.dirname(__file__), 'support')
+
+
+class TestHookTimingPlugin(PluginTester, unittest.TestCase):
+    activate = '--with-hook-timing'
+    plugins = [HookTiming(), Skip()]
+    suitepath = os.path.join(support, 'shard')
+
+    def setUp(self):
+        fd, self.filename = tempfile.mkstemp()
+        os.close(fd)
+        self.args = ['--hook-timing-file=%s' % self.filename]
+        PluginTester.setUp(self)
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def runTest(self):
+        print str(self.output)
+        assert 'Plugin             Call' in self.output
+        records = json.load(open(self.filename))
+        calls = dict([((r['plugin'], r['call']), r['calls'])
+                      for r in records])
+        self.assertEqual(calls[('skip', 'prepareTestResult')], 1)
@@ -1,12 +1,18 @@
 import os
 import re
+import shutil
 import sys
 import tempfile
 import unittest
+from cStringIO import StringIO
 
+from nose.config import Config
+from nose.core import TestProgram
 from nose.plugins import PluginTester
+from nose.plugins.manager import PluginManager
 from nose.plugins.builtin import Doctest
 from nose.plugins.builtin import TestId
+from nose.plugins.skip import SkipTest
 from cPickle import dump, load
 
 support = os.path.join(os.path.dirname(__file__), 'support')
@@ -247,7 +253,78 @@ class TestWithDoctestFileTests_2(PluginTester, unittest.TestCase):
         assert count == 1
         teardown()
         
-        
+
+class TestRunFirst(unittest.TestCase):
+    """Failed and new tests run ahead of the rest, and only once"""
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.dir = tempfile.mkdtemp()
+        self.write('test_idorder_a.py',
+                   "def test_1():\n    pass\n\n"
+                   "def test_2():\n    assert False\n\n"
+                   "def test_3():\n    pass\n")
+
+    def tearDown(self):
+        # --where changes the working directory
+        os.chdir(self.cwd)
+        shutil.rmtree(self.dir)
+        for name in ('test_idorder_a', 'test_idorder_b'):
+            sys.modules.pop(name, None)
+
+    def write(self, name, source):
+        fh = open(os.path.join(self.dir, name), 'w')
+        fh.write(source)
+        fh.close()
+
+    def run_ids(self, *args, **kw):
+        stream = StringIO()
+        plugins = [TestId()] + kw.get('plugins', [])
+        config = Config(plugins=PluginManager(plugins=plugins),
+                        stream=stream)
+        TestProgram(argv=['nosetests', '-v', '--with-id',
+                          '--where=%s' % self.dir] + list(args),
+                    config=config, exit=False)
+        self.output = stream.getvalue()
+        return re.findall(r'^#\d+ (\S+) \.\.\. ', self.output, re.M)
+
+    def test_failed_first(self):
+        self.assertEqual(self.run_ids(), ['test_idorder_a.test_1',
+                                          'test_idorder_a.test_2',
+                                          'test_idorder_a.test_3'])
+        self.assertEqual(self.run_ids('--failed-first'),
+                         ['test_idorder_a.test_2',
+                          'test_idorder_a.test_1',
+                          'test_idorder_a.test_3'])
+
+    def test_new_first(self):
+        self.run_ids()
+        self.write('test_idorder_b.py', "def test_4():\n    pass\n")
+        self.assertEqual(self.run_ids('--new-first', '--failed-first'),
+                         ['test_idorder_a.test_2',
+                          'test_idorder_b.test_4',
+                          'test_idorder_a.test_1',
+                          'test_idorder_a.test_3'])
+        # nothing is new the second time
+        self.assertEqual(self.run_ids('--new-first'),
+                         ['test_idorder_a.test_1',
+                          'test_idorder_a.test_2',
+                          'test_idorder_a.test_3',
+                          'test_idorder_b.test_4'])
+
+    def test_ignored_with_processes(self):
+        try:
+            import multiprocessing
+        except ImportError:
+            raise SkipTest("multiprocessing module not available")
+        from nose.plugins.multiprocess import MultiProcess
+        self.run_ids()
+        self.run_ids('--failed-first', '--processes=2',
+                     plugins=[MultiProcess()])
+        # each test runs once
+        assert 'Ran 3 tests' in self.output, self.output
+
+
 if __name__ == '__main__':
     import logging
     logging.basicConfig()
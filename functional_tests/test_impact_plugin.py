@@ -0,0 +1,129 @@
+import os
+import pickle
+import re
+import shutil
+import sys
+import tempfile
+import unittest
+from cStringIO import StringIO
+from nose.config import Config
+from nose.core import TestProgram, TextTestRunner
+from nose.plugins.manager import DefaultPluginManager
+from nose.plugins.skip import SkipTest
+
+support = os.path.join(os.path.dirname(__file__), 'support', 'impact')
+
+
+class TestImpactPlugin(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.mkdtemp()
+        self.index = os.path.join(self.tmp, 'index')
+
+    def tearDown(self):
+        # --where changes the working directory
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tmp)
+
+    def run_impact(self, *args):
+        """Run the impact support tests with args, and return the names of
+        the tests that ran.
+        """
+        stream = StringIO()
+        config = Config(plugins=DefaultPluginManager(), stream=stream)
+        argv = ['nosetests', '-v', '--where=%s' % support,
+                '--impact-file=%s' % self.index]
+        prog = TestProgram(argv=argv + list(args),
+                           testRunner=TextTestRunner(stream=stream,
+                                                     verbosity=2,
+                                                     config=config),
+                           config=config, exit=False)
+        assert prog.success, stream.getvalue()
+        names = []
+        # tests loaded by address are described by their address
+        for name in re.findall(r'^(\S+) \.\.\. ok$', stream.getvalue(),
+                               re.M):
+            if ':' in name:
+                path, call = name.split(':')
+                name = '%s.%s' % (os.path.basename(path)[:-3], call)
+            names.append(name)
+        return sorted(names)
+
+    def changed(self, *names):
+        return self.run_impact('--impact-changed=%s' % ','.join(
+            [os.path.join(support, name) for name in names]))
+
+    def test_select_affected_tests(self):
+        everything = self.run_impact('--impact-record')
+        self.assertEqual(len(everything), 4)
+        assert os.path.exists(self.index)
+        self.assertEqual(self.changed('alpha.py'),
+                         ['test_alpha.test_double'])
+        self.assertEqual(self.changed('beta.py'),
+                         ['test_beta.TestNegate.test_negate'])
+        # module fixtures are dependencies of the tests in the module
+        self.assertEqual(self.changed('gamma.py'),
+                         ['test_fixture.test_state'])
+        # every test in a changed test file runs
+        self.assertEqual(self.changed('test_alpha.py'),
+                         ['test_alpha.test_double', 'test_alpha.test_nothing'])
+        self.assertEqual(self.changed('alpha.py', 'beta.py'),
+                         ['test_alpha.test_double',
+                          'test_beta.TestNegate.test_negate'])
+        self.assertEqual(self.changed('README.txt'), [])
+
+    def test_files_missing_from_index_run(self):
+        self.run_impact('--impact-record')
+        added = os.path.join(support, 'test_added.py')
+        fh = open(added, 'w')
+        fh.write('def test_added():\n    pass\n')
+        fh.close()
+        try:
+            self.assertEqual(self.changed('README.txt'),
+                             ['test_added.test_added'])
+            self.assertEqual(self.changed('beta.py'),
+                             ['test_added.test_added',
+                              'test_beta.TestNegate.test_negate'])
+        finally:
+            for name in (added, added + 'c'):
+                if os.path.exists(name):
+                    os.remove(name)
+            sys.modules.pop('test_added', None)
+
+    def test_deleted_test_files_skipped(self):
+        self.run_impact('--impact-record')
+        test_beta = os.path.join(support, 'test_beta.py')
+        moved = os.path.join(self.tmp, 'test_beta.py')
+        shutil.move(test_beta, moved)
+        if os.path.exists(test_beta + 'c'):
+            os.remove(test_beta + 'c')
+        try:
+            self.assertEqual(self.changed('test_beta.py'), [])
+            self.assertEqual(self.changed('beta.py'), [])
+            # recording drops the deleted file's tests from the index
+            self.run_impact('--impact-record', '--impact-changed=%s'
+                            % os.path.join(support, 'alpha.py'))
+            fh = open(self.index, 'rb')
+            try:
+                tests = pickle.load(fh)['tests']
+            finally:
+                fh.close()
+            self.assertEqual([name for name in tests
+                              if name.startswith('test_beta.py')], [])
+        finally:
+            shutil.move(moved, test_beta)
+            sys.modules.pop('test_beta', None)
+
+    def test_no_index_runs_everything(self):
+        self.assertEqual(len(self.changed('alpha.py')), 4)
+        assert not os.path.exists(self.index)
+
+    def test_record_in_workers(self):
+        try:
+            import multiprocessing
+        except ImportError:
+            raise SkipTest("multiprocessing module not available")
+        self.run_impact('--impact-record', '--processes=2')
+        self.assertEqual(self.changed('beta.py'),
+                         ['test_beta.TestNegate.test_negate'])
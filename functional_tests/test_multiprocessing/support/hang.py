@@ -0,0 +1,11 @@
+import signal
+import time
+
+
+def test_hang():
+    "this test ignores the timeout signal, so its worker must be killed"
+    signal.signal(signal.SIGILL, signal.SIG_IGN)
+    time.sleep(30)
+
+def test_pass():
+    pass
@@ -0,0 +1,14 @@
+import signal
+import time
+
+
+def test_a():
+    pass
+
+def test_b():
+    pass
+
+def test_hang():
+    "this test ignores the timeout signal, so its worker must be killed"
+    signal.signal(signal.SIGILL, signal.SIG_IGN)
+    time.sleep(30)
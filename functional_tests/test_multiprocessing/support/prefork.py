@@ -0,0 +1,19 @@
+import os
+import sys
+
+
+def check():
+    preloaded = sys.modules.get('prefork_preloaded')
+    assert preloaded is not None, "prefork_preloaded was not preloaded"
+    # imported by the template process, which forked this worker
+    assert preloaded.pid != os.getpid()
+    assert preloaded.pid == os.getppid()
+
+def test_a():
+    check()
+
+def test_b():
+    check()
+
+def test_c():
+    check()
@@ -0,0 +1,4 @@
+import os
+
+# the process that imported this module
+pid = os.getpid()
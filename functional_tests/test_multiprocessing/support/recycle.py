@@ -0,0 +1,22 @@
+# tests run in this module by the current worker process
+runs = []
+
+
+def check():
+    runs.append(1)
+    assert len(runs) <= 2, "worker has run %s tests" % len(runs)
+
+def test_a():
+    check()
+
+def test_b():
+    check()
+
+def test_c():
+    check()
+
+def test_d():
+    check()
+
+def test_e():
+    check()
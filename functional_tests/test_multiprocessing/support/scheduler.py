@@ -0,0 +1,20 @@
+import time
+
+
+def test_a():
+    time.sleep(0.2)
+
+def test_b():
+    pass
+
+def test_c():
+    pass
+
+def test_d():
+    pass
+
+def test_e():
+    pass
+
+def test_f():
+    pass
@@ -0,0 +1,15 @@
+_multiprocess_can_split_ = True
+
+calls = []
+
+def setup():
+    calls.append('setup')
+
+def teardown():
+    calls.append('teardown')
+
+def test_a():
+    assert calls[-1] == 'setup'
+
+def test_b():
+    assert calls[-1] == 'setup'
@@ -0,0 +1,27 @@
+import os
+
+from test_multiprocessing import MPTestBase, support
+from test_multiprocessing import test_process_timeout
+
+
+class TestPrefork(MPTestBase):
+    """Workers, and the workers that replace them, are forked from the
+    template process"""
+    processes = 2
+    args = ['--process-preload=prefork_preloaded',
+            '--process-max-tasks-per-worker=1']
+    suitepath = os.path.join(support, 'prefork.py')
+
+    def runTest(self):
+        assert 'Ran 3 tests' in self.output
+        assert str(self.output).strip().endswith('OK')
+
+
+class TestPreforkSteal(TestPrefork):
+    processes = 2
+    args = TestPrefork.args + ['--process-scheduler=steal']
+
+
+class TestPreforkTimeoutKill(test_process_timeout.TestMPTimeoutKill):
+    """Forked workers that time out are killed and replaced"""
+    args = ['--process-timeout=1', '--process-prefork']
@@ -1,5 +1,6 @@
 import os
 
+from nose.plugins.multiprocess import MultiProcessTestRunner
 from test_multiprocessing import MPTestBase
 
 class TestMPTimeout(MPTestBase):
@@ -19,3 +20,36 @@ class TestMPTimeoutPass(TestMPTimeout):
         assert "Ran 2 tests in" in self.output
         assert str(self.output).strip().endswith('OK')
 
+
+class TestMPTimeoutKill(MPTestBase):
+    args = ['--process-timeout=1']
+    suitepath = os.path.join(os.path.dirname(__file__), 'support', 'hang.py')
+
+    def setUp(self):
+        self.waitkilltime = MultiProcessTestRunner.waitkilltime
+        MultiProcessTestRunner.waitkilltime = 0.5
+        MPTestBase.setUp(self)
+
+    def tearDown(self):
+        MultiProcessTestRunner.waitkilltime = self.waitkilltime
+
+    def runTest(self):
+        assert "hang.py:test_hang() (worker 0 killed after" in self.output
+        assert "Ran 2 tests in" in self.output
+        assert "FAILED (errors=1)" in self.output
+
+
+class TestMPTimeoutKillBatched(TestMPTimeoutKill):
+    """Results held back in a batch by a killed worker are not lost"""
+    args = ['--process-timeout=1', '--process-result-batch=10',
+            '--process-result-interval=60']
+    suitepath = os.path.join(os.path.dirname(__file__), 'support',
+                             'hang_batched.py')
+
+    def runTest(self):
+        assert "hang_batched.py:test_hang() (worker 0 killed after" \
+               in self.output
+        assert "hang_batched.py:test_a() (result lost when worker 0 was " \
+               "killed)" in self.output
+        assert "Ran 3 tests in" in self.output
+        assert "FAILED (errors=3)" in self.output
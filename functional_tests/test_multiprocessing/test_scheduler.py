@@ -0,0 +1,88 @@
+import os
+import tempfile
+
+from nose.plugins.multiprocess import TaskDurations
+from test_multiprocessing import MPTestBase
+
+
+class TestWorkStealing(MPTestBase):
+    processes = 2
+    args = ['--process-scheduler=steal']
+    suitepath = os.path.join(os.path.dirname(__file__), 'support',
+                             'scheduler.py')
+
+    def runTest(self):
+        assert 'Ran 6 tests' in self.output
+        assert str(self.output).strip().endswith('OK')
+
+
+class TestDurationOrdering(MPTestBase):
+    processes = 2
+    suitepath = os.path.join(os.path.dirname(__file__), 'support',
+                             'scheduler.py')
+
+    def setUp(self):
+        fd, self.durations = tempfile.mkstemp()
+        os.close(fd)
+        os.remove(self.durations)
+        self.args = ['--process-durations-file=%s' % self.durations]
+        MPTestBase.setUp(self)
+
+    def tearDown(self):
+        if os.path.exists(self.durations):
+            os.remove(self.durations)
+
+    def runTest(self):
+        assert 'Ran 6 tests' in self.output
+        assert str(self.output).strip().endswith('OK')
+        durations = TaskDurations(self.durations)
+        assert len(durations.durations) == 6
+        slowest = max(durations.durations.items(), key=lambda d: d[1])[0]
+        assert 'scheduler.py:test_a' in slowest, slowest
+
+
+class TestWorkerReusesLoader(MPTestBase):
+    """Tasks run by the same worker still run split fixtures each time"""
+    suitepath = os.path.join(os.path.dirname(__file__), 'support',
+                             'split_fixtures.py')
+
+    def runTest(self):
+        assert 'Ran 2 tests' in self.output
+        assert str(self.output).strip().endswith('OK')
+
+
+class TestResultBatches(MPTestBase):
+    processes = 2
+    args = ['--process-result-batch=4']
+    suitepath = os.path.join(os.path.dirname(__file__), 'support',
+                             'scheduler.py')
+
+    def runTest(self):
+        assert 'Ran 6 tests' in self.output
+        assert str(self.output).strip().endswith('OK')
+
+
+class TestWorkerRecycling(MPTestBase):
+    """Workers are replaced after running the maximum number of tasks"""
+    args = ['--process-max-tasks-per-worker=2']
+    suitepath = os.path.join(os.path.dirname(__file__), 'support',
+                             'recycle.py')
+
+    def runTest(self):
+        assert 'Ran 5 tests' in self.output
+        assert str(self.output).strip().endswith('OK')
+
+
+class TestWorkerDurations(MPTestBase):
+    """Test durations recorded by workers are reported by the main process"""
+    processes = 2
+    args = ['--durations=1']
+    suitepath = os.path.join(os.path.dirname(__file__), 'support',
+                             'scheduler.py')
+
+    def runTest(self):
+        assert 'Ran 6 tests' in self.output
+        assert 'Test durations (6 tests, ' in self.output
+        lines = str(self.output).splitlines()
+        slowest = lines[lines.index('Slowest 1 tests:') + 1]
+        assert slowest.endswith('scheduler.test_a'), slowest
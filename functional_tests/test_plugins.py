@@ -37,8 +37,8 @@ class TestPluginCalls(unittest.TestCase):
              'makeTest', 'wantMethod', 'loadTestsFromTestClass',
              'loadTestsFromTestCase', 'loadTestsFromModule', 'startContext',
              'beforeTest', 'prepareTestCase', 'startTest', 'addSuccess',
-             'stopTest', 'afterTest', 'stopContext', 'afterContext',
-             'loadTestsFromDir', 'afterDirectory',
+             'stopTest', 'afterTest', 'stopContext', 'addContextDuration',
+             'afterContext', 'loadTestsFromDir', 'afterDirectory',
              'report', 'finalize'])
 
     def test_plugin_calls_package1_verbose(self):
@@ -62,7 +62,8 @@ class TestPluginCalls(unittest.TestCase):
              'loadTestsFromTestCase', 'loadTestsFromModule', 'startContext',
              'beforeTest', 'prepareTestCase', 'startTest', 'describeTest',
              'testName', 'addSuccess', 'stopTest', 'afterTest', 'stopContext',
-             'afterContext', 'loadTestsFromDir', 'afterDirectory',
+             'addContextDuration', 'afterContext', 'loadTestsFromDir',
+             'afterDirectory',
              'report', 'finalize'])
 
 
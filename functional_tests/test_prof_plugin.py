@@ -0,0 +1,124 @@
+import os
+import pstats
+import shutil
+import signal
+import tempfile
+import unittest
+from cStringIO import StringIO
+from nose.config import Config
+from nose.core import TestProgram
+from nose.plugins.manager import DefaultPluginManager
+from nose.plugins.prof import Profile
+from nose.plugins.skip import SkipTest
+
+support = os.path.join(os.path.dirname(__file__), 'support')
+
+
+class ProfileTestBase(unittest.TestCase):
+
+    def setUp(self):
+        if not Profile.available():
+            raise SkipTest('profile plugin not available; skipping')
+        self.dir = tempfile.mkdtemp()
+        self.stats_file = os.path.join(self.dir, 'merged.prof')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def run_profile(self, *args):
+        stream = StringIO()
+        config = Config(plugins=DefaultPluginManager(), stream=stream)
+        argv = ['nosetests', '--with-profile',
+                '--profile-stats-file=%s' % self.stats_file]
+        prog = TestProgram(argv=argv + list(args), config=config,
+                           exit=False)
+        assert prog.success, stream.getvalue()
+        return stream.getvalue()
+
+
+class TestProfile(ProfileTestBase):
+
+    def functions(self):
+        stats = pstats.Stats(self.stats_file)
+        return [name for filename, line, name in stats.stats.keys()]
+
+    def test_profile_per_test(self):
+        profile_dir = os.path.join(self.dir, 'tests')
+        output = self.run_profile('--profile-per=test',
+                                  '--profile-dir=%s' % profile_dir,
+                                  os.path.join(support, 'durations'))
+        assert 'function calls' in output
+        self.assertEqual(sorted(os.listdir(profile_dir)), [
+            'test_timed.TestClass.test_method.prof',
+            'test_timed.test_fast.prof',
+            'test_timed.test_slow.prof'])
+        slow = pstats.Stats(os.path.join(profile_dir,
+                                         'test_timed.test_slow.prof'))
+        names = [name for filename, line, name in slow.stats.keys()]
+        assert 'test_slow' in names
+        assert 'test_fast' not in names
+        functions = self.functions()
+        assert 'test_slow' in functions
+        assert 'test_fast' in functions
+        # fixtures run outside of the tests
+        assert 'setup_module' not in functions
+
+    def test_profile_workers(self):
+        try:
+            import multiprocessing
+        except ImportError:
+            raise SkipTest("multiprocessing module not available")
+        self.run_profile('--processes=2',
+                         os.path.join(support, 'durations'))
+        functions = self.functions()
+        # run in the workers and merged by the main process
+        assert 'setup_module' in functions
+        assert 'test_slow' in functions
+        assert 'test_method' in functions
+
+
+class TestSampling(ProfileTestBase):
+
+    def setUp(self):
+        ProfileTestBase.setUp(self)
+        if not hasattr(signal, 'setitimer'):
+            raise SkipTest('sampling not available; skipping')
+        self.collapsed = os.path.join(self.dir, 'stacks.txt')
+
+    def stacks(self):
+        stacks = {}
+        for line in open(self.collapsed):
+            stack, count = line.rsplit(' ', 1)
+            stacks[stack] = int(count)
+        return stacks
+
+    def test_samples_attributed_to_tests(self):
+        output = self.run_profile('--profile-sample',
+                                  '--profile-sample-interval=1',
+                                  '--profile-collapsed=%s' % self.collapsed,
+                                  os.path.join(support, 'sampling'))
+        print output
+        assert 'Samples  Percent  Test' in output
+        stacks = self.stacks()
+        busy = [s for s in stacks if s.startswith('test_busy:test_busy;')]
+        assert busy
+        assert [s for s in busy if s.split(';')[-1].startswith('spin (')]
+        assert sum([stacks[s] for s in busy]) > sum(stacks.values()) / 2
+        assert not os.path.exists(self.stats_file)
+
+    def test_samples_from_workers(self):
+        try:
+            import multiprocessing
+        except ImportError:
+            raise SkipTest("multiprocessing module not available")
+        self.run_profile('--processes=2', '--profile-sample',
+                         '--profile-sample-interval=1',
+                         '--profile-collapsed=%s' % self.collapsed,
+                         os.path.join(support, 'sampling'))
+        busy = [s for s in self.stacks()
+                if s.startswith('test_busy:test_busy;')]
+        assert busy
+
+
+if __name__ == '__main__':
+    unittest.main()
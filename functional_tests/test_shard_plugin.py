@@ -0,0 +1,78 @@
+import os
+import pickle
+import re
+import shutil
+import tempfile
+import unittest
+from cStringIO import StringIO
+from nose.config import Config
+from nose.core import TestProgram, TextTestRunner
+from nose.plugins.manager import PluginManager
+from nose.plugins.shard import Shard
+
+support = os.path.join(os.path.dirname(__file__), 'support', 'shard')
+
+
+def run(*args):
+    """Run the shard support tests with args, and return the names of
+    the tests that ran.
+    """
+    stream = StringIO()
+    config = Config(plugins=PluginManager(plugins=[Shard()]), stream=stream)
+    TestProgram(argv=['nosetests', '-v'] + list(args) + [support],
+                testRunner=TextTestRunner(stream=stream, verbosity=2,
+                                          config=config),
+                config=config, exit=False)
+    return re.findall(r'^test_s\d\.(test_s\d) \.\.\. ok$', stream.getvalue(),
+                      re.M)
+
+
+class TestShardPlugin(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def shards(self, count, *args):
+        return [run('--shard-count=%s' % count, '--shard-index=%s' % i,
+                    *args)
+                for i in range(count)]
+
+    def test_shards_partition_tests(self):
+        shards = self.shards(3)
+        ran = []
+        for names in shards:
+            ran.extend(names)
+        ran.sort()
+        self.assertEqual(ran, ['test_s%s' % i for i in range(1, 7)])
+        # the same shard runs the same tests every time
+        self.assertEqual(run('--shard-count=3', '--shard-index=1'), shards[1])
+
+    def test_timings_saved_and_balanced(self):
+        saved = [os.path.join(self.tmp, 'shard%s.times' % i)
+                 for i in range(2)]
+        for i in range(2):
+            run('--shard-count=2', '--shard-index=%s' % i,
+                '--shard-save-timings=%s' % saved[i])
+        timings = {}
+        for filename in saved:
+            timings.update(pickle.load(open(filename, 'rb')))
+        self.assertEqual(len(timings), 6)
+
+        # make one file look slow: it gets a shard to itself, and the
+        # other five files go to the other shard
+        slow = sorted(timings)[0]
+        for key in timings:
+            timings[key] = 1.0
+        timings[slow] = 10.0
+        merged = os.path.join(self.tmp, 'merged.times')
+        pickle.dump(timings, open(merged, 'wb'))
+        shards = self.shards(2, '--shard-timings=%s' % merged)
+        self.assertEqual(sorted([len(names) for names in shards]), [1, 5])
+        self.assertEqual(shards[0], [os.path.basename(slow)[:-3]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -150,8 +150,12 @@ class Config(object):
       self.testMatch = re.compile(env.get('NOSE_TESTMATCH', r'(?:\b|_)[Tt]est'))
       self.addPaths = not env.get('NOSE_NOPATH', False)
       self.configSection = 'nosetests'
+      self.compileWorkers = int(env.get('NOSE_COMPILE_WORKERS', 0))
       self.debug = env.get('NOSE_DEBUG')
       self.debugLog = env.get('NOSE_DEBUG_LOG')
+      self.discoveryCache = env.get('NOSE_DISCOVERY_CACHE')
+      self.durations = env.get('NOSE_DURATIONS')
+      self.durationsFile = env.get('NOSE_DURATIONS_FILE')
       self.exclude = None
       self.getTestCaseNamesCompat = False
       self.includeExe = env.get('NOSE_INCLUDE_EXE',
@@ -184,8 +188,14 @@ class Config(object):
         self.testMatch = re.compile(self.testMatchPat)
         self.addPaths = not env.get('NOSE_NOPATH', False)
         self.configSection = 'nosetests'
+        self.compileWorkers = int(env.get('NOSE_COMPILE_WORKERS', 0))
         self.debug = env.get('NOSE_DEBUG')
         self.debugLog = env.get('NOSE_DEBUG_LOG')
+        self.discoveryCache = env.get('NOSE_DISCOVERY_CACHE')
+        self.durations = env.get('NOSE_DURATIONS')
+        if self.durations is not None:
+            self.durations = int(self.durations)
+        self.durationsFile = env.get('NOSE_DURATIONS_FILE')
         self.exclude = None
         self.getTestCaseNamesCompat = False
         self.includeExe = env.get('NOSE_INCLUDE_EXE',
@@ -315,6 +325,10 @@ class Config(object):
         self.debugLog = options.debugLog
         self.loggingConfig = options.loggingConfig
         self.firstPackageWins = options.firstPackageWins
+        self.discoveryCache = options.discoveryCache
+        self.compileWorkers = options.compileWorkers
+        self.durations = options.durations
+        self.durationsFile = options.durationsFile
         self.configureLogging()
 
         if not options.byteCompile:
@@ -580,6 +594,32 @@ class Config(object):
             help="nose's importer will normally evict a package from sys."
             "modules if it sees a package with the same name in a different "
             "location. Set this option to disable that behavior.")
+        parser.add_option(
+            "--discovery-cache", action="store", dest="discoveryCache",
+            default=self.discoveryCache, metavar="FILE",
+            help="Cache the results of test directory scans in this file. "
+            "On later runs, directories that have not changed are not "
+            "scanned again. A relative path is taken to be relative to "
+            "the working directory. [NOSE_DISCOVERY_CACHE]")
+        parser.add_option(
+            "--compile-workers", action="store", type="int",
+            dest="compileWorkers", default=self.compileWorkers, metavar="N",
+            help="Before collecting tests from a directory, byte-compile "
+            "the test modules and packages in it whose bytecode is missing "
+            "or out of date, using a pool of N worker processes. A negative value "
+            "uses one worker per CPU. Default is 0, which compiles each "
+            "module as it is imported. [NOSE_COMPILE_WORKERS]")
+        parser.add_option(
+            "--durations", action="store", type="int", dest="durations",
+            default=self.durations, metavar="N",
+            help="Report the N slowest tests and fixture contexts, and the "
+            "distribution of test durations, at the end of the run. Use 0 "
+            "to report every test. [NOSE_DURATIONS]")
+        parser.add_option(
+            "--durations-file", action="store", dest="durationsFile",
+            default=self.durationsFile, metavar="FILE",
+            help="Write the duration of every test and fixture context to "
+            "this file as JSON. [NOSE_DURATIONS_FILE]")
         parser.add_option(
             "--no-byte-compile",
             action="store_false", default=True, dest="byteCompile",
@@ -0,0 +1,188 @@
+"""
+Discovery Cache
+---------------
+
+Test discovery walks the working directory, listing each directory and
+asking the selector about every entry in it. In large trees that walk can
+take longer than running the tests that it finds. A DiscoveryCache stores,
+for each directory scanned by :class:`nose.loader.TestLoader`, the list of
+entries that the selector wanted, so that a later run can replay that list
+instead of re-examining a directory that has not changed.
+
+A cached directory is considered unchanged when its modification time and
+the modification times of all of its subdirectories match the recorded
+values. Adding, removing or renaming an entry updates a directory's
+modification time, and so does adding or removing the ``__init__.py`` that
+makes a subdirectory a package. Changes that do not touch directory
+modification times, such as toggling the executable bit on a file, are not
+noticed; remove the cache file to force a full scan.
+
+The cache is also keyed on the selector configuration (testMatch, include,
+exclude, ignoreFiles, the exe setting and the enabled plugins). If any of
+those differ from the run that wrote the cache, the cache is discarded. A
+plugin whose choice of files depends on its own options must set a
+``discoveryKey`` attribute, which becomes part of the key; the doctest
+plugin uses its extensions, and the coverage plugin whether coverage is
+inclusive. Options of plugins that don't set one are not part of the key.
+
+The cache is saved when the loader finishes with the top-level directory,
+including when the caller stops loading tests from it early. Only
+directories that were scanned completely are saved.
+"""
+import logging
+import os
+import time
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+log = logging.getLogger(__name__)
+
+__all__ = ['DiscoveryCache', 'cache_key']
+
+
+def cache_key(config):
+    """Return a value that identifies the selector configuration of
+    config. Directory scans saved under one key are not valid under
+    another.
+    """
+    def patterns(regexes):
+        return [getattr(r, 'pattern', r) for r in regexes or ()]
+    plugins = [(getattr(p, 'name', p.__class__.__name__),
+                getattr(p, 'discoveryKey', None))
+               for p in getattr(config.plugins, 'plugins', ())]
+    plugins.sort()
+    return repr((getattr(config.testMatch, 'pattern', config.testMatch),
+                 patterns(config.include),
+                 patterns(config.exclude),
+                 patterns(config.ignoreFiles),
+                 bool(config.includeExe),
+                 tuple(config.srcDirs or ()),
+                 plugins))
+
+
+class DiscoveryCache(object):
+    """Persistent record of directory scans, stored in a pickle file.
+
+    Each record maps a directory path to the directory's modification
+    time, the modification times of its subdirectories and the list of
+    wanted entries found in it.
+    """
+    version = 1
+    # directories modified this recently are not cached, since a further
+    # change within the filesystem's timestamp resolution would go unseen
+    racy = 1.0
+
+    def __init__(self, filename, key):
+        self.filename = filename
+        self.key = key
+        self.dirs = {}
+        self.dirty = False
+        self.load()
+
+    def load(self):
+        """Load saved directory records, if the cache file exists and was
+        written with the same key.
+        """
+        try:
+            fh = open(self.filename, 'rb')
+        except IOError:
+            log.debug('No discovery cache at %s', self.filename)
+            return
+        try:
+            try:
+                data = pickle.load(fh)
+            except (KeyboardInterrupt, SystemExit):
+                raise
+            except:
+                log.debug('Unable to read discovery cache %s', self.filename,
+                          exc_info=True)
+                return
+        finally:
+            fh.close()
+        if not isinstance(data, dict) \
+               or data.get('version') != self.version \
+               or data.get('key') != self.key:
+            log.debug('Discovery cache %s is stale; ignoring', self.filename)
+            return
+        self.dirs = data['dirs']
+        log.debug('Loaded %s directories from discovery cache %s',
+                  len(self.dirs), self.filename)
+
+    def save(self):
+        """Save directory records, if any have changed since loading. The
+        file is written under a temporary name and renamed into place so
+        that concurrent runs never see a partial cache.
+        """
+        if not self.dirty:
+            return
+        tmp = '%s.%s.tmp' % (self.filename, os.getpid())
+        try:
+            fh = open(tmp, 'wb')
+            try:
+                pickle.dump({'version': self.version,
+                             'key': self.key,
+                             'dirs': self.dirs}, fh, -1)
+            finally:
+                fh.close()
+            try:
+                os.rename(tmp, self.filename)
+            except OSError:
+                # windows will not rename over an existing file
+                os.remove(self.filename)
+                os.rename(tmp, self.filename)
+        except (IOError, OSError), e:
+            log.debug('Unable to write discovery cache %s: %s',
+                      self.filename, e)
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return
+        self.dirty = False
+        log.debug('Saved %s directories to discovery cache %s',
+                  len(self.dirs), self.filename)
+
+    def get(self, path):
+        """Return the list of wanted entries recorded for the directory at
+        path, or None if the directory has no record or has changed since
+        the record was made.
+        """
+        record = self.dirs.get(path)
+        if record is None:
+            return None
+        mtime, subdirs, entries = record
+        try:
+            if _mtime(path) != mtime:
+                return None
+            for subdir, sub_mtime in subdirs:
+                if _mtime(subdir) != sub_mtime:
+                    return None
+        except OSError:
+            return None
+        log.debug('Discovery cache hit for %s', path)
+        return entries
+
+    def put(self, path, subdirs, entries):
+        """Record the wanted entries for the directory at path. subdirs is
+        the list of subdirectory paths examined during the scan.
+        """
+        now = time.time()
+        try:
+            mtime = _mtime(path)
+            sub_mtimes = [(subdir, _mtime(subdir)) for subdir in subdirs]
+        except OSError:
+            return
+        if now - max([mtime] + [m for s, m in sub_mtimes]) < self.racy:
+            log.debug('%s modified too recently to cache', path)
+            if self.dirs.pop(path, None) is not None:
+                self.dirty = True
+            return
+        self.dirs[path] = (mtime, sub_mtimes, entries)
+        self.dirty = True
+
+
+def _mtime(path):
+    return os.stat(path).st_mtime
@@ -0,0 +1,203 @@
+"""
+Test Durations
+--------------
+
+A Durations instance records how long each test and each fixture context
+took to run, for the report printed by ``--durations`` and the JSON file
+written by ``--durations-file``.
+
+A test's duration is the time from the start of the test to its end, and
+includes the test's own setUp and tearDown. A context's duration is the
+time spent running the setup and teardown fixtures of a package, module
+or class; the tests run within the context are not included. Contexts
+without fixtures are not recorded.
+
+The report lists the slowest tests and contexts, followed by percentiles
+of the test durations and a histogram of them::
+
+    ======================================================================
+    Slowest 3 tests:
+       2.104s  test_db.TestQueries.test_join
+       0.733s  test_db.TestQueries.test_scan
+       0.128s  test_api.test_login
+    Slowest 2 fixture contexts:
+       4.920s  test_db (setup 4.871s, teardown 0.049s)
+       0.051s  test_api.TestSession (setup 0.051s, teardown 0.000s)
+    Test durations (1021 tests, 9.313s):
+      p50 0.001s  p90 0.006s  p95 0.011s  p99 0.294s  max 2.104s
+          < 1ms   612 ##########################################
+         < 10ms   320 ######################
+        < 100ms    79 #####
+           < 1s     8 #
+          < 10s     2 #
+         >= 10s     0
+
+The JSON file holds an object with a list of ``tests`` and a list of
+``contexts``, each entry giving an ``id`` and a ``time`` in seconds (and
+for contexts, the ``setup`` and ``teardown`` times that make it up), and
+the ``percentiles`` of the test durations, keyed ``p50`` to ``p99`` and
+``max``. Comparing the files from successive runs shows which tests are
+getting slower.
+"""
+import logging
+from inspect import isclass
+
+log = logging.getLogger(__name__)
+
+__all__ = ['Durations', 'context_name']
+
+PERCENTILES = (50, 90, 95, 99)
+# upper bounds of the histogram buckets, in seconds
+BUCKETS = ((0.001, '< 1ms'), (0.01, '< 10ms'), (0.1, '< 100ms'),
+           (1.0, '< 1s'), (10.0, '< 10s'), (None, '>= 10s'))
+BAR_WIDTH = 42
+
+
+def context_name(context):
+    """Return the dotted name of a fixture context (a package, module or
+    class).
+    """
+    if isclass(context):
+        return "%s.%s" % (context.__module__, context.__name__)
+    return getattr(context, '__name__', str(context))
+
+
+class Durations(object):
+    """Durations of the tests and fixture contexts in a test run.
+
+    Each test duration is stored as a (seconds, id) tuple, and each
+    context duration as a (seconds, id, setup seconds, teardown seconds)
+    tuple, in the order that the tests and contexts finished.
+    """
+    def __init__(self):
+        self.tests = []
+        self.contexts = []
+
+    def addTest(self, test, elapsed):
+        """Record that test took elapsed seconds.
+        """
+        self.tests.append((elapsed, test.id()))
+
+    def addContext(self, context, setup, teardown):
+        """Record that the setup and teardown fixtures of context took setup
+        and teardown seconds.
+        """
+        self.contexts.append((setup + teardown, context_name(context),
+                              setup, teardown))
+
+    def update(self, tests, contexts):
+        """Add durations recorded by another Durations instance, such as
+        one in a multiprocess worker.
+        """
+        self.tests.extend(tests)
+        self.contexts.extend(contexts)
+
+    def slowest(self, durations, count=None):
+        """Return durations, slowest first, limited to count items if
+        count is given and not 0.
+        """
+        durations = sorted(durations, reverse=True)
+        if count:
+            durations = durations[:count]
+        return durations
+
+    def percentiles(self):
+        """Return a list of (percentile, seconds) for the test durations,
+        using the nearest-rank method.
+
+        >>> d = Durations()
+        >>> d.tests = [(float(n), 'test_%s' % n) for n in range(1, 101)]
+        >>> d.percentiles()
+        [(50, 50.0), (90, 90.0), (95, 95.0), (99, 99.0), (100, 100.0)]
+        """
+        times = sorted([t for t, name in self.tests])
+        if not times:
+            return []
+        result = []
+        for pct in PERCENTILES + (100,):
+            rank = max(-(-pct * len(times) // 100), 1)
+            result.append((pct, times[rank - 1]))
+        return result
+
+    def histogram(self):
+        """Return a list of (label, count) for the test durations, with one
+        item for each of the buckets in BUCKETS.
+        """
+        counts = [0] * len(BUCKETS)
+        for elapsed, name in self.tests:
+            for ix, (limit, label) in enumerate(BUCKETS):
+                if limit is None or elapsed < limit:
+                    counts[ix] += 1
+                    break
+        return [(label, counts[ix]) for ix, (limit, label)
+                in enumerate(BUCKETS)]
+
+    def report(self, stream, count, separator='=' * 70):
+        """Print the count slowest tests and fixture contexts (all of them
+        if count is 0), and the distribution of test durations.
+        """
+        stream.writeln(separator)
+        for title, durations in (('tests', self.tests),
+                                 ('fixture contexts', self.contexts)):
+            if not durations:
+                continue
+            slowest = self.slowest(durations, count)
+            if len(slowest) < len(durations):
+                stream.writeln("Slowest %s %s:" % (len(slowest), title))
+            else:
+                stream.writeln("All %s %s, slowest first:" % (
+                    len(slowest), title))
+            for item in slowest:
+                line = "%8.3fs  %s" % item[:2]
+                if len(item) > 2:
+                    line += " (setup %.3fs, teardown %.3fs)" % item[2:]
+                stream.writeln(line)
+        if not self.tests:
+            stream.writeln("No test durations recorded")
+            return
+        stream.writeln("Test durations (%s tests, %.3fs):" % (
+            len(self.tests), sum([t for t, name in self.tests])))
+        stream.writeln("  " + "  ".join(
+            ["%s %.3fs" % (_label(pct), elapsed)
+             for pct, elapsed in self.percentiles()]))
+        histogram = self.histogram()
+        most = max([n for label, n in histogram])
+        for label, n in histogram:
+            bar = '#' * int(round(float(n) / most * BAR_WIDTH))
+            if n and not bar:
+                bar = '#'
+            stream.writeln(("%11s %5d %s" % (label, n, bar)).rstrip())
+
+    def save(self, filename):
+        """Write all durations to filename as JSON.
+        """
+        try:
+            import json
+        except ImportError:
+            import simplejson as json
+        data = {'tests': [{'id': name, 'time': elapsed}
+                          for elapsed, name in self.tests],
+                'contexts': [{'id': name, 'time': elapsed, 'setup': setup,
+                              'teardown': teardown}
+                             for elapsed, name, setup, teardown
+                             in self.contexts],
+                'percentiles': dict([(_label(pct), elapsed)
+                                     for pct, elapsed in self.percentiles()])}
+        try:
+            fh = open(filename, 'w')
+        except IOError, e:
+            log.warn("Unable to write test durations to %s: %s",
+                     filename, e)
+            return
+        try:
+            json.dump(data, fh, indent=1)
+        finally:
+            fh.close()
+        log.debug("Saved durations of %s tests to %s", len(self.tests),
+                  filename)
+
+
+def _label(pct):
+    if pct == 100:
+        return 'max'
+    return 'p%s' % pct
@@ -3,6 +3,12 @@ sys.path), and uses a per-path cache in addition to sys.modules. This is
 necessary because test modules in different directories frequently have the
 same names, which means that the first loaded would mask the rest when using
 the builtin importer.
+
+The per-path cache remembers, for each name imported from each directory,
+the module that was found there. The next import of that name from that
+directory uses the module in sys.modules without looking for the file
+again, provided sys.modules still holds the same module object and the
+directory has not been modified since.
 """
 import logging
 import os
@@ -30,6 +36,8 @@ class Importer(object):
         if config is None:
             config = Config()
         self.config = config
+        # {(name, search path): (directory mtimes, module)}
+        self._found = {}
 
     def importFromPath(self, path, fqname):
         """Import a dotted-name package whose tail is at path. In other words,
@@ -53,8 +61,6 @@ class Importer(object):
         dir = os.path.normpath(os.path.abspath(dir))
         log.debug("Import %s from %s", fqname, dir)
 
-        # FIXME reimplement local per-dir cache?
-
         # special case for __main__
         if fqname == '__main__':
             return sys.modules[fqname]
@@ -72,6 +78,16 @@ class Importer(object):
                 part_fqname = part
             else:
                 part_fqname = "%s.%s" % (part_fqname, part)
+            key = (part_fqname, tuple(path))
+            mod = self._cached(key, sys.modules.get(part_fqname))
+            if mod is not None:
+                log.debug("%s already imported from %s", part_fqname, path)
+                if parent:
+                    setattr(parent, part, mod)
+                if hasattr(mod, '__path__'):
+                    path = mod.__path__
+                parent = mod
+                continue
             try:
                 acquire_lock()
                 log.debug("find module part %s (%s) in %s",
@@ -96,6 +112,9 @@ class Importer(object):
                 if fh:
                     fh.close()
                 release_lock()
+            mtimes = _mtimes(key[1])
+            if mtimes is not None:
+                self._found[key] = (mtimes, mod)
             if parent:
                 setattr(parent, part, mod)
             if hasattr(mod, '__path__'):
@@ -103,6 +122,21 @@ class Importer(object):
             parent = mod
         return mod
 
+    def _cached(self, key, mod):
+        """Return mod, if it is the module found for key by an earlier
+        import, and the directories searched have not changed since.
+        """
+        if mod is None:
+            return None
+        try:
+            mtimes, found = self._found[key]
+        except KeyError:
+            return None
+        if found is not mod or _mtimes(key[1]) != mtimes:
+            del self._found[key]
+            return None
+        return mod
+
     def _dirname_if_file(self, filename):
         # We only take the dirname if we have a path to a non-dir,
         # because taking the dirname of a symlink to a directory does not
@@ -133,6 +167,13 @@ class Importer(object):
         return False
 
 
+def _mtimes(dirs):
+    try:
+        return tuple([os.stat(d).st_mtime for d in dirs])
+    except (OSError, TypeError):
+        return None
+
+
 def add_path(path, config=None):
     """Ensure that the path, or the root of the current package (if
     path is in a package), is in sys.path.
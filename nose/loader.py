@@ -18,7 +18,9 @@ from nose.pyversion import unbound_method, ismethod
 from nose.case import FunctionTestCase, MethodTestCase
 from nose.failure import Failure
 from nose.config import Config
+from nose.discovery import DiscoveryCache, cache_key
 from nose.importer import Importer, add_path, remove_path
+from nose.precompile import precompile
 from nose.selector import defaultSelector, TestAddress
 from nose.util import func_lineno, getpackage, isclass, isgenerator, \
     ispackage, regex_last_key, resolve_name, src, transplant_func, \
@@ -95,6 +97,22 @@ class TestLoader(unittest.TestLoader):
         self.suiteClass = ContextSuiteFactory(config=config)
 
         self._visitedPaths = set([])
+        self._dirDepth = 0
+        self.discoveryCache = None
+        if getattr(config, 'discoveryCache', None):
+            cache_file = os.path.expanduser(config.discoveryCache)
+            if not os.path.isabs(cache_file):
+                cache_file = op_join(self.workingDir, cache_file)
+            self.discoveryCache = DiscoveryCache(cache_file,
+                                                 cache_key(config))
+        # workers of the multiprocess plugin load the files that their
+        # parent process already compiled
+        self.compileWorkers = 0
+        if not getattr(config, 'worker', False):
+            self.compileWorkers = getattr(config, 'compileWorkers', 0) or 0
+        # directory entries found while looking for files to compile,
+        # for loadTestsFromDir to use
+        self._scanned = {}
 
         unittest.TestLoader.__init__(self)
 
@@ -146,8 +164,109 @@ class TestLoader(unittest.TestLoader):
         if self.config.addPaths:
             paths_added = add_path(path, self.config)
 
+        if self.compileWorkers and not self._dirDepth:
+            precompile(self._sourceFiles(path), self.compileWorkers)
+        self._dirDepth += 1
+        try:
+            entries = self._scanned.pop(path, None)
+            if entries is None and self.discoveryCache is not None:
+                entries = self.discoveryCache.get(path)
+            if entries is None:
+                entries = self._wantedEntries(path)
+            for entry, entry_path, is_file, is_package in entries:
+                # Python 3.3 now implements PEP 420: Implicit Namespace
+                # Packages. As a result, it's now possible that parent paths
+                # that have a segment with the same basename as our package
+                # ends up in module.__path__.  So we have to keep track of
+                # what we've visited, and not-revisit them again.
+                if not self._haveVisited(entry_path):
+                    self._addVisitedPath(entry_path)
+                    if is_file:
+                        plugins.beforeContext()
+                        if entry.endswith('.py'):
+                            yield self.loadTestsFromName(
+                                entry_path, discovered=True)
+                        else:
+                            yield self.loadTestsFromFile(entry_path)
+                        plugins.afterContext()
+                    elif is_package:
+                        # Load the entry as a package: given the full path,
+                        # loadTestsFromName() will figure it out
+                        yield self.loadTestsFromName(
+                            entry_path, discovered=True)
+                    else:
+                        # Another test dir in this one: recurse lazily
+                        yield self.suiteClass(
+                            lambda: self.loadTestsFromDir(entry_path))
+            tests = []
+            for test in plugins.loadTestsFromDir(path):
+                tests.append(test)
+            # TODO: is this try/except needed?
+            try:
+                if tests:
+                    yield self.suiteClass(tests)
+            except (KeyboardInterrupt, SystemExit):
+                raise
+            except:
+                yield self.suiteClass([Failure(*sys.exc_info())])
+        finally:
+            # also reached when the caller stops iterating early; only
+            # directories that were scanned completely are in the cache
+            self._dirDepth -= 1
+            if not self._dirDepth:
+                # entries scanned for compiling but not loaded, such as
+                # those of a package whose __path__ names its directory
+                # differently, would be stale by the next load
+                self._scanned.clear()
+                if self.discoveryCache is not None:
+                    self.discoveryCache.save()
+
+        # pop paths
+        if self.config.addPaths:
+            for p in paths_added:
+              remove_path(p)
+        plugins.afterDirectory(path)
+
+    def _sourceFiles(self, path):
+        """Return the python source files of the test modules and packages
+        that loading tests from the directory at path will import, as far
+        as they can be found without importing anything. The wanted entries
+        of each directory are kept for loadTestsFromDir.
+        """
+        sources = []
+        dirs = [path]
+        while dirs:
+            dirpath = dirs.pop(0)
+            entries = None
+            if self.discoveryCache is not None:
+                entries = self.discoveryCache.get(dirpath)
+            if entries is None:
+                entries = list(self._wantedEntries(dirpath))
+            self._scanned[dirpath] = entries
+            for entry, entry_path, is_file, is_package in entries:
+                if is_file:
+                    if entry.endswith('.py'):
+                        sources.append(entry_path)
+                    continue
+                if is_package:
+                    init = op_join(entry_path, '__init__.py')
+                    if op_isfile(init):
+                        sources.append(init)
+                dirs.append(entry_path)
+        return sources
+
+    def _wantedEntries(self, path):
+        """Examine the entries in the directory at path, yielding
+        (entry, entry_path, is_file, is_package) for each entry that the
+        selector wants. Selection happens as the caller iterates, so each
+        entry is examined just before it is loaded. If a discovery cache
+        is in use, the wanted entries are recorded once the whole
+        directory has been examined.
+        """
         entries = os.listdir(path)
         sort_list(entries, regex_last_key(self.config.testMatch))
+        subdirs = []
+        wanted_entries = []
         for entry in entries:
             # this hard-coded initial-dot test will be removed:
             # http://code.google.com/p/python-nose/issues/detail?id=82
@@ -159,59 +278,21 @@ class TestLoader(unittest.TestLoader):
             is_file = op_isfile(entry_path)
             wanted = False
             if is_file:
-                is_dir = False
                 wanted = self.selector.wantFile(entry_path)
-            else:
-                is_dir = op_isdir(entry_path)
-                if is_dir:
-                    # this hard-coded initial-underscore test will be removed:
-                    # http://code.google.com/p/python-nose/issues/detail?id=82
-                    if entry.startswith('_'):
-                        continue
-                    wanted = self.selector.wantDirectory(entry_path)
-            is_package = ispackage(entry_path)
-
-            # Python 3.3 now implements PEP 420: Implicit Namespace Packages.
-            # As a result, it's now possible that parent paths that have a
-            # segment with the same basename as our package ends up
-            # in module.__path__.  So we have to keep track of what we've
-            # visited, and not-revisit them again.
-            if wanted and not self._haveVisited(entry_path):
-                self._addVisitedPath(entry_path)
-                if is_file:
-                    plugins.beforeContext()
-                    if entry.endswith('.py'):
-                        yield self.loadTestsFromName(
-                            entry_path, discovered=True)
-                    else:
-                        yield self.loadTestsFromFile(entry_path)
-                    plugins.afterContext()
-                elif is_package:
-                    # Load the entry as a package: given the full path,
-                    # loadTestsFromName() will figure it out
-                    yield self.loadTestsFromName(
-                        entry_path, discovered=True)
-                else:
-                    # Another test dir in this one: recurse lazily
-                    yield self.suiteClass(
-                        lambda: self.loadTestsFromDir(entry_path))
-        tests = []
-        for test in plugins.loadTestsFromDir(path):
-            tests.append(test)
-        # TODO: is this try/except needed?
-        try:
-            if tests:
-                yield self.suiteClass(tests)
-        except (KeyboardInterrupt, SystemExit):
-            raise
-        except:
-            yield self.suiteClass([Failure(*sys.exc_info())])
-
-        # pop paths
-        if self.config.addPaths:
-            for p in paths_added:
-              remove_path(p)
-        plugins.afterDirectory(path)
+            elif op_isdir(entry_path):
+                subdirs.append(entry_path)
+                # this hard-coded initial-underscore test will be removed:
+                # http://code.google.com/p/python-nose/issues/detail?id=82
+                if entry.startswith('_'):
+                    continue
+                wanted = self.selector.wantDirectory(entry_path)
+            if wanted:
+                is_package = ispackage(entry_path)
+                item = (entry, entry_path, is_file, is_package)
+                wanted_entries.append(item)
+                yield item
+        if self.discoveryCache is not None:
+            self.discoveryCache.put(path, subdirs, wanted_entries)
 
     def loadTestsFromFile(self, filename):
         """Load tests from a non-module file. Default is to raise a
@@ -139,6 +139,20 @@ class IPluginInterface(object):
     add_options = addOptions
     add_options.deprecated = True
 
+    def addContextDuration(self, context, setup, teardown):
+        """Called after a context that has setup or teardown fixtures has
+        been torn down, with the time taken by its fixtures.
+
+        :param context: the context that has been torn down. May be a
+             module or class.
+        :param setup: seconds taken by the context's setup fixture
+        :type setup: float
+        :param teardown: seconds taken by the context's teardown fixture
+        :type teardown: float
+        """
+        pass
+    addContextDuration._new = True
+
     def addDeprecated(self, test):
         """Called when a deprecated test is seen. DO NOT return a value
         unless you want to stop other plugins from seeing the deprecated
@@ -19,6 +19,9 @@ builtins = (
     ('nose.plugins.xunit', 'Xunit'),
     ('nose.plugins.allmodules', 'AllModules'),
     ('nose.plugins.collect', 'CollectOnly'),
+    ('nose.plugins.shard', 'Shard'),
+    ('nose.plugins.hooktiming', 'HookTiming'),
+    ('nose.plugins.impact', 'Impact'),
     )
 
 for module, cls in builtins:
@@ -7,11 +7,32 @@ the options ``-s`` or ``--nocapture``.
 :Options:
   ``--nocapture``
     Don't capture stdout (any stdout output will be printed immediately)
+  ``--capture-fd``
+    Capture output written to the stdout file descriptor, as well as output
+    written to ``sys.stdout``
+  ``--capture-max-memory=BYTES``
+    Keep no more than BYTES of each test's output in memory
 
+By default output is captured by replacing ``sys.stdout``, so output that
+bypasses ``sys.stdout`` is not captured: output written by C extensions,
+and by subprocesses that inherit the stdout file descriptor. With
+``--capture-fd``, the stdout file descriptor itself is redirected to a
+temporary file for each test, and output written to ``sys.stdout`` goes to
+the same file. Output buffered by a C library is captured only if it is
+flushed before the test ends.
+
+Captured output is normally held in memory until the test ends. A test that
+prints a great deal can make the test process grow, and with
+``--capture-max-memory``, once a test's output passes the given size it is
+moved to a temporary file instead. Output captured with ``--capture-fd`` is
+never held in memory. In either case the output is only read back from the
+file if it's needed to report an error or failure.
 """
 import logging
+import mmap
 import os
 import sys
+import tempfile
 from nose.plugins.base import Plugin
 from nose.pyversion import exc_to_unicode, force_unicode
 from nose.util import ln
@@ -32,9 +53,13 @@ class Capture(Plugin):
     name = 'capture'
     score = 1600
 
+    captureFd = False
+    maxMemory = None
+
     def __init__(self):
         self.stdout = []
         self._buf = None
+        self._fdBuffers = []
 
     def options(self, parser, env):
         """Register commandline options
@@ -44,6 +69,18 @@ class Capture(Plugin):
             default=not env.get(self.env_opt), dest="capture",
             help="Don't capture stdout (any stdout output "
             "will be printed immediately) [NOSE_NOCAPTURE]")
+        parser.add_option(
+            "--capture-fd", action="store_true",
+            default=env.get('NOSE_CAPTURE_FD'), dest="captureFd",
+            help="Capture output written to the stdout file descriptor, "
+            "such as output from C extensions and subprocesses, as well "
+            "as output written to sys.stdout. [NOSE_CAPTURE_FD]")
+        parser.add_option(
+            "--capture-max-memory", action="store", type="int",
+            default=env.get('NOSE_CAPTURE_MAX_MEMORY'), dest="captureMaxMemory",
+            metavar="BYTES",
+            help="Move a test's captured output to a temporary file once it "
+            "is larger than this many bytes. [NOSE_CAPTURE_MAX_MEMORY]")
 
     def configure(self, options, conf):
         """Configure plugin. Plugin is enabled by default.
@@ -51,6 +88,10 @@ class Capture(Plugin):
         self.conf = conf
         if not options.capture:
             self.enabled = False
+        self.captureFd = bool(getattr(options, 'captureFd', False))
+        self.maxMemory = getattr(options, 'captureMaxMemory', None)
+        if self.maxMemory is not None:
+            self.maxMemory = int(self.maxMemory)
 
     def afterTest(self, test):
         """Clear capture buffer.
@@ -94,7 +135,13 @@ class Capture(Plugin):
 
     def start(self):
         self.stdout.append(sys.stdout)
-        self._buf = StringIO()
+        if self.captureFd:
+            self._buf = FdBuffer()
+            self._fdBuffers.append(self._buf)
+        elif self.maxMemory is not None:
+            self._buf = SpoolBuffer(self.maxMemory)
+        else:
+            self._buf = StringIO()
         # Python 3's StringIO objects don't support setting encoding or errors
         # directly and they're already set to None.  So if the attributes
         # already exist, skip adding them.
@@ -109,6 +156,8 @@ class Capture(Plugin):
     def end(self):
         if self.stdout:
             sys.stdout = self.stdout.pop()
+            if self._fdBuffers:
+                self._fdBuffers.pop().restore()
 
     def finalize(self, result):
         """Restore stdout.
@@ -122,3 +171,103 @@ class Capture(Plugin):
 
     buffer = property(_get_buffer, None, None,
                       """Captured stdout output.""")
+
+
+class SpoolBuffer(object):
+    """Capture buffer that holds output in memory until there is more than
+    maxMemory bytes of it, then moves it to a temporary file.
+    """
+
+    def __init__(self, maxMemory):
+        self.maxMemory = maxMemory
+        self._chunks = []
+        self._size = 0
+        self._file = None
+
+    def write(self, data):
+        if self._file is not None:
+            self._file.write(_bytes(data))
+            return
+        self._chunks.append(data)
+        self._size += len(data)
+        if self._size > self.maxMemory:
+            self._file = tempfile.TemporaryFile()
+            for chunk in self._chunks:
+                self._file.write(_bytes(chunk))
+            self._chunks = None
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+    def getvalue(self):
+        if self._file is None:
+            return ''.join(self._chunks)
+        self._file.flush()
+        return _read(self._file)
+
+
+class FdBuffer(object):
+    """Capture buffer that redirects the stdout file descriptor to a
+    temporary file until restore() is called. Output written to the buffer
+    goes to the same file.
+    """
+    fd = 1
+
+    def __init__(self):
+        sys.stdout.flush()
+        self._file = tempfile.TemporaryFile()
+        self._saved = os.dup(self.fd)
+        os.dup2(self._file.fileno(), self.fd)
+
+    def restore(self):
+        if self._saved is not None:
+            os.dup2(self._saved, self.fd)
+            os.close(self._saved)
+            self._saved = None
+
+    def write(self, data):
+        data = _bytes(data)
+        while data:
+            data = data[os.write(self._file.fileno(), data):]
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def getvalue(self):
+        return _read(self._file)
+
+
+def _bytes(data):
+    if isinstance(data, unicode):
+        return data.encode('utf-8')
+    return data
+
+
+def _read(fh):
+    """Read all of the file fh, without moving its file position.
+    """
+    size = os.fstat(fh.fileno()).st_size
+    if not size:
+        return ''
+    view = mmap.mmap(fh.fileno(), size, access=mmap.ACCESS_READ)
+    try:
+        return view[:]
+    finally:
+        view.close()
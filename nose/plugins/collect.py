@@ -9,10 +9,26 @@ run individual tests by index number.
 
 This plugin is also useful for counting tests in a test suite, and making
 people watching your demo think all of your tests pass.
+
+To feed a list of tests to other tools, use ``--test-index=FILE`` (or
+``--test-index=-`` for standard output). This writes one line of JSON
+per test as it is loaded, for example::
+
+    {"call": "test_add", "file": "/src/tests/test_math.py", "id": "test_math.test_add", "module": "test_math"}
+
+and doesn't build test suites, set up a result or runner, or print the
+usual test output at all. Test generators are not called, so each generator
+is listed once, with ``"generator": true``. Tests that could not be loaded
+are listed with an ``"error"`` describing the problem, and make the run
+fail.
 """
+from inspect import isfunction, ismethod
 from nose.plugins.base import Plugin
 from nose.case import Test
+from nose.failure import Failure
+from nose.util import test_address
 import logging
+import sys
 import unittest
 
 log = logging.getLogger(__name__)
@@ -34,19 +50,48 @@ class CollectOnly(Plugin):
                           default=env.get('NOSE_COLLECT_ONLY'),
                           help="Enable collect-only: %s [COLLECT_ONLY]" %
                           (self.help()))
+        parser.add_option('--test-index', action='store',
+                          dest='collect_index', metavar='FILE',
+                          default=env.get('NOSE_TEST_INDEX'),
+                          help="Don't run tests, but write the address of "
+                          "each test to FILE (- for standard output) as a "
+                          "line of JSON. [NOSE_TEST_INDEX]")
+
+    def configure(self, options, conf):
+        """Configure plugin.
+        """
+        Plugin.configure(self, options, conf)
+        self.index = getattr(options, 'collect_index', None)
+        if self.index:
+            self.enabled = True
+        # the output capture plugin replaces sys.stdout before the runner
+        # starts
+        self.stdout = sys.stdout
 
     def prepareTestLoader(self, loader):
         """Install collect-only suite class in TestLoader.
         """
         # Disable context awareness
         log.debug("Preparing test loader")
-        loader.suiteClass = TestSuiteFactory(self.conf)
+        if self.index:
+            loader.suiteClass = IndexSuite
+        else:
+            loader.suiteClass = TestSuiteFactory(self.conf)
+
+    def prepareTestRunner(self, runner):
+        """Replace the test runner with one that writes the test index.
+        """
+        if self.index:
+            return IndexRunner(self.index, getattr(runner, 'stream', None),
+                               self.stdout)
 
     def prepareTestCase(self, test):
         """Replace actual test with dummy that always passes.
         """
         # Return something that always passes
         log.debug("Preparing test case %s", test)
+        if self.index:
+            return
         if not isinstance(test, Test):
             return
         def run(result):
@@ -92,3 +137,103 @@ class TestSuite(unittest.TestSuite):
         else:
             self._tests.append(Test(test, config=self.conf))
 
+
+
+class IndexSuite(object):
+    """
+    Lazy stand-in for a test suite, used when writing a test index. Holds
+    the tests passed to it without examining them.
+    """
+    def __init__(self, tests=(), context=None, **kw):
+        self.tests = tests
+        self.context = context
+
+    def __iter__(self):
+        tests = self.tests
+        if callable(tests):
+            tests = tests()
+        return iter(tests)
+
+    def isGenerator(self):
+        return isfunction(self.context) or ismethod(self.context)
+
+
+class IndexResult(object):
+    """
+    Counts the tests written to an index, and the tests that could not be
+    loaded.
+    """
+    def __init__(self):
+        self.testsRun = 0
+        self.errors = []
+
+    def wasSuccessful(self):
+        return not self.errors
+
+
+class IndexRunner(object):
+    """
+    Test runner that writes each test that the loader finds to a file as
+    a line of JSON, without running anything. A filename of - means
+    stdout, which is sys.stdout unless given.
+    """
+    def __init__(self, filename, stream=None, stdout=None):
+        self.filename = filename
+        self.stream = stream
+        self.stdout = stdout
+
+    def run(self, test):
+        try:
+            import json
+        except ImportError:
+            import simplejson as json
+        if self.filename == '-':
+            out = self.stdout or sys.stdout
+        else:
+            out = open(self.filename, 'w')
+        result = IndexResult()
+        try:
+            for record in self.records(test, result):
+                out.write(json.dumps(record, sort_keys=True) + "\n")
+        finally:
+            if self.filename == '-':
+                out.flush()
+            else:
+                out.close()
+        if self.stream is not None:
+            self.stream.writeln("Indexed %s tests" % result.testsRun)
+        return result
+
+    def records(self, test, result):
+        if isinstance(test, IndexSuite) and test.isGenerator():
+            record = self.record(test.context)
+            record['generator'] = True
+        elif isinstance(test, (IndexSuite, unittest.TestSuite)):
+            for t in test:
+                for record in self.records(t, result):
+                    yield record
+            return
+        else:
+            record = self.record(test)
+        result.testsRun += 1
+        if isinstance(test, Failure):
+            record['error'] = str(test)
+            result.errors.append((test, record['error']))
+        yield record
+
+    def record(self, test):
+        try:
+            address = test_address(test)
+        except TypeError:
+            address = None
+        record = {}
+        if address is not None:
+            record['file'], record['module'], record['call'] = address
+        if isinstance(test, unittest.TestCase) and not isinstance(test,
+                                                                 Failure):
+            record['id'] = test.id()
+        elif address is not None:
+            record['id'] = '.'.join([part for part in address[1:] if part])
+        else:
+            record['id'] = None
+        return record
@@ -132,6 +132,9 @@ class Coverage(Plugin):
             for pkgs in [tolist(x) for x in cover_packages]:
                 self.coverPackages.extend(pkgs)
         self.coverInclusive = options.cover_inclusive
+        # wantFile wants every python file when coverage is inclusive
+        self.discoveryKey = (bool(self.coverInclusive),
+                             tuple(self.coverPackages))
         if self.coverPackages:
             log.info("Coverage report will include only packages: %s",
                      self.coverPackages)
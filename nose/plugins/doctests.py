@@ -189,6 +189,8 @@ class Doctest(Plugin):
         self.doctest_result_var = options.doctest_result_var
         self.doctest_tests = options.doctest_tests
         self.extension = tolist(options.doctestExtension)
+        # wantFile wants files with these extensions
+        self.discoveryKey = tuple(self.extension or ())
         self.fixtures = options.doctestFixtures
         self.finder = doctest.DocTestFinder()
         self.optionflags = 0
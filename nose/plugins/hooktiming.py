@@ -0,0 +1,117 @@
+"""
+This plugin measures how much time each of the other plugins spends
+handling plugin calls, so that when a test run is slow, you can tell
+whether the time goes to the tests or to plugins such as xunit, logcapture
+or coverage. Turn it on with ``--with-hook-timing``.
+
+At the end of the run, the plugin prints a table with one row for each
+plugin and call, slowest first, giving the number of calls, the total and
+longest time taken by one call, and the mean time per call::
+
+    Plugin             Call                      Calls   Total(s)    Max(s)  Mean(ms)
+    logcapture         beforeTest                 1034      0.412     0.004     0.398
+    xunit              addSuccess                 1021      0.187     0.001     0.183
+    ...
+
+Use ``--hook-timing-rows`` to change the number of rows printed, and
+``--hook-timing-file=FILE`` to also write every row to FILE as JSON.
+
+Plugin calls are timed only in the main nose process, so calls made in
+worker processes of the multiprocess plugin are not counted.
+"""
+import logging
+from nose.plugins.base import Plugin
+from nose.plugins.manager import TimingPluginProxy
+
+log = logging.getLogger(__name__)
+
+
+class HookTiming(Plugin):
+    """
+    Report the time spent in each plugin call.
+    """
+    name = 'hook-timing'
+    # configure before other plugins make plugin calls of their own
+    score = 5000
+
+    def options(self, parser, env):
+        """Register commandline options.
+        """
+        Plugin.options(self, parser, env)
+        parser.add_option('--hook-timing-rows', action='store', type='int',
+                          dest='hookTimingRows',
+                          default=int(env.get('NOSE_HOOK_TIMING_ROWS', 20)),
+                          metavar='NUM',
+                          help="Number of plugin calls to list in the "
+                          "hook timing report. 0 lists all of them. "
+                          "Default is 20. [NOSE_HOOK_TIMING_ROWS]")
+        parser.add_option('--hook-timing-file', action='store',
+                          dest='hookTimingFile',
+                          default=env.get('NOSE_HOOK_TIMING_FILE'),
+                          metavar='FILE',
+                          help="Also write the time spent in each plugin "
+                          "call to this file, as JSON. "
+                          "[NOSE_HOOK_TIMING_FILE]")
+
+    def configure(self, options, conf):
+        """Configure plugin.
+        """
+        Plugin.configure(self, options, conf)
+        if not self.enabled:
+            return
+        self.rows = options.hookTimingRows
+        self.filename = options.hookTimingFile
+        self.times = {}
+        if not hasattr(conf.plugins, 'proxyClass'):
+            log.warn("%s can't time plugin calls", conf.plugins)
+            return
+
+        class Proxy(TimingPluginProxy):
+            times = self.times
+        conf.plugins.proxyClass = Proxy
+
+    def rowsByTime(self):
+        """Return a list of (plugin, call, calls, total, max) for each
+        plugin call made, slowest first.
+        """
+        rows = [(total, plugin, call, calls, longest)
+                for (plugin, call), (calls, total, longest)
+                in self.times.items() if calls]
+        rows.sort()
+        rows.reverse()
+        return [(plugin, call, calls, total, longest)
+                for total, plugin, call, calls, longest in rows]
+
+    def report(self, stream):
+        """Print the slowest plugin calls, and save all of them if
+        requested.
+        """
+        rows = self.rowsByTime()
+        if self.filename:
+            self.save(rows)
+        if self.rows:
+            rows = rows[:self.rows]
+        stream.writeln("%-18s %-22s %8s %10s %9s %9s" % (
+            'Plugin', 'Call', 'Calls', 'Total(s)', 'Max(s)', 'Mean(ms)'))
+        for plugin, call, calls, total, longest in rows:
+            stream.writeln("%-18s %-22s %8d %10.3f %9.3f %9.3f" % (
+                plugin, call, calls, total, longest, total / calls * 1000))
+
+    def save(self, rows):
+        try:
+            import json
+        except ImportError:
+            import simplejson as json
+        records = [{'plugin': plugin, 'call': call, 'calls': calls,
+                    'total': total, 'max': longest}
+                   for plugin, call, calls, total, longest in rows]
+        try:
+            fh = open(self.filename, 'w')
+        except IOError, e:
+            log.warn("Unable to write hook timings to %s: %s",
+                     self.filename, e)
+            return
+        try:
+            json.dump(records, fh, indent=1)
+        finally:
+            fh.close()
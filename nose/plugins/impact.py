@@ -0,0 +1,457 @@
+"""
+This plugin runs only the tests affected by a change. First record which
+source files each test runs code from, in an index saved in the working
+directory::
+
+    nosetests --impact-record
+
+Then, after changing some files, run only the tests that ran code from
+one of them, by naming the changed files, or by naming a git revision to
+take the changed files from ``git diff``::
+
+    nosetests --impact-changed=mypkg/models.py,mypkg/views.py
+    nosetests --impact-since=origin/master --impact-record
+
+Adding ``--impact-record`` to a selective run updates the index entries of
+the tests that ran, so the index stays current without a full run.
+
+A test depends on every file, under the working directory, that holds a
+function or method called while the test ran, including its setUp and
+tearDown, the setup fixtures of the modules, classes and packages that
+contain it, and the test file itself. Code run when a module is imported,
+including the bodies of the classes it defines, is not recorded, so a
+change to a module that only defines constants or other data does not
+select the tests that use it; nor does a change to a data or
+configuration file. Run the full suite from time to time, such as
+on every merge, to catch what the index misses.
+
+These tests always run, whether the index lists them or not:
+
+* all of the tests in a changed test file, which covers tests added since
+  the index was recorded
+* all of the tests in a test file that is missing from the index, such as
+  a test file added since the index was recorded
+
+Test files that have been deleted since the index was recorded are left
+out, even if they are among the changed files, and their tests are dropped
+from the index the next time it is saved.
+
+If there is no index yet, every test runs. Selection applies to the
+directories named on the command line (the working directory by default);
+tests named by file, module or test name are always loaded as usual.
+Finding the test files that are missing from the index means looking
+through those directories, choosing test directories and files the way
+collection does, on every selective run.
+
+Files are recorded by tracing each function call, which slows down tests
+that make a great many calls; the tracing is only active while recording.
+Recording replaces any trace function that is already installed, so it
+cannot be combined with the coverage plugin or a debugger. Tests run by
+the workers of the multiprocess plugin are recorded too.
+"""
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from inspect import CO_OPTIMIZED
+from nose.plugins.base import Plugin
+from nose.selector import defaultSelector
+from nose.util import src, tolist
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+log = logging.getLogger(__name__)
+
+
+class Impact(Plugin):
+    """
+    Record which files each test depends on, and run only the tests that
+    depend on changed files.
+    """
+    name = 'impact'
+    version = 1
+    spool = None
+
+    def options(self, parser, env):
+        """Register commandline options.
+        """
+        parser.add_option('--impact-record', action='store_true',
+                          dest='impactRecord',
+                          default=env.get('NOSE_IMPACT_RECORD'),
+                          help="Record the files each test depends on in "
+                          "the test impact index. [NOSE_IMPACT_RECORD]")
+        parser.add_option('--impact-changed', action='append',
+                          dest='impactChanged',
+                          default=tolist(env.get('NOSE_IMPACT_CHANGED')),
+                          metavar='FILES',
+                          help="Run only the tests that depend on these "
+                          "changed files (a comma-separated list; the "
+                          "option may be given more than once). "
+                          "[NOSE_IMPACT_CHANGED]")
+        parser.add_option('--impact-since', action='store',
+                          dest='impactSince',
+                          default=env.get('NOSE_IMPACT_SINCE'),
+                          metavar='REV',
+                          help="Run only the tests that depend on files "
+                          "changed since this git revision, including "
+                          "uncommitted and untracked files. "
+                          "[NOSE_IMPACT_SINCE]")
+        parser.add_option('--impact-file', action='store',
+                          dest='impactFile',
+                          default=env.get('NOSE_IMPACT_FILE', '.noseimpact'),
+                          metavar='FILE',
+                          help="Store the test impact index in this file. "
+                          "Default is .noseimpact in the working "
+                          "directory. [NOSE_IMPACT_FILE]")
+
+    def configure(self, options, conf):
+        """Configure plugin.
+        """
+        self.conf = conf
+        self.record = bool(getattr(options, 'impactRecord', False))
+        changed = []
+        for names in getattr(options, 'impactChanged', None) or ():
+            changed.extend(tolist(names))
+        since = getattr(options, 'impactSince', None)
+        self.selecting = bool(changed or since)
+        self.enabled = self.record or self.selecting
+        if not self.enabled:
+            return
+        self.indexFile = os.path.join(
+            conf.workingDir,
+            os.path.expanduser(getattr(options, 'impactFile', None)
+                               or '.noseimpact'))
+        self.tests = {}
+        self._keys = {}
+        if conf.worker:
+            # workers record; the main process selects and saves
+            self.selecting = False
+            return
+        self.changed = set([self.key(os.path.join(conf.workingDir, name))
+                            for name in changed])
+        if since:
+            found = self.gitChanges(since)
+            if found is None:
+                self.selecting = False
+            else:
+                self.changed.update(found)
+        log.debug("Changed files: %s", sorted(self.changed))
+
+    def key(self, path):
+        """Return the key identifying the file at path in the index: its
+        path relative to the working directory, with / separators.
+        """
+        path = os.path.abspath(path)
+        prefix = os.path.join(self.conf.workingDir, '')
+        if path.startswith(prefix):
+            path = path[len(prefix):]
+        return path.replace(os.sep, '/')
+
+    def gitChanges(self, since):
+        """Return the keys of the files that differ from revision since in
+        the git work tree containing the working directory, plus untracked
+        files, or None if git fails.
+        """
+        import subprocess
+        def git(*args):
+            proc = subprocess.Popen(('git',) + args, cwd=self.conf.workingDir,
+                                    stdout=subprocess.PIPE,
+                                    stderr=subprocess.PIPE)
+            out, err = proc.communicate()
+            if proc.returncode:
+                raise OSError(err.strip() or "git exited with status %s"
+                              % proc.returncode)
+            return [line for line in out.decode('utf-8').splitlines()
+                    if line]
+        try:
+            top = git('rev-parse', '--show-toplevel')[0]
+            files = git('diff', '--name-only', '--no-renames', since, '--')
+            files.extend(git('ls-files', '--others', '--exclude-standard',
+                             '--full-name'))
+        except (OSError, IndexError), e:
+            log.warn("Unable to list files changed since %s (%s); "
+                     "running all tests", since, e)
+            return None
+        return set([self.key(os.path.join(top, name)) for name in files])
+
+    def isWorker(self):
+        return bool(getattr(self.conf, 'worker', False))
+
+    def begin(self):
+        """Start recording, and in the main process of a multiprocess run,
+        make a directory for the workers to record to.
+        """
+        if not self.record:
+            return
+        if not self.isWorker() and getattr(self.conf,
+                                           'multiprocess_workers', 0):
+            self.spool = tempfile.mkdtemp(prefix='nose-impact-')
+            self.conf.impactSpool = self.spool
+            return
+        self.touched = {}
+        self.outer = None
+        self.stack = []
+        if sys.gettrace() is not None:
+            log.warn("Replacing the installed trace function to record test "
+                     "impact")
+        sys.settrace(self._trace)
+        threading.settrace(self._trace)
+
+    def _trace(self, frame, event, arg):
+        # only called for new frames; returning None turns off line
+        # tracing. Module and class bodies, the code objects that are not
+        # optimized, are skipped, since they run at import time, whichever
+        # test happens to be running.
+        code = frame.f_code
+        if code.co_flags & CO_OPTIMIZED:
+            self.touched[code.co_filename] = True
+
+    def startContext(self, context):
+        if not self.record or self.spool:
+            return
+        self.stack.append(self.touched)
+        self.touched = {}
+
+    def stopContext(self, context):
+        if not self.record or self.spool:
+            return
+        if self.stack:
+            self.touched = self.stack.pop()
+
+    def beforeTest(self, test):
+        if not self.record or self.spool:
+            return
+        self.outer = self.touched
+        self.touched = {}
+
+    def afterTest(self, test):
+        if not self.record or self.spool or self.outer is None:
+            return
+        touched = self.touched
+        self.touched, self.outer, outer = self.outer, None, self.outer
+        name = self.testName(test)
+        if name is None:
+            return
+        files = set()
+        for filenames in [touched, outer] + self.stack:
+            for filename in filenames:
+                key = self.fileKey(filename)
+                if key is not None:
+                    files.add(key)
+        files.add(name.split(':')[0])
+        files = frozenset(files)
+        spool = getattr(self.conf, 'impactSpool', None)
+        if self.isWorker() and spool:
+            fh = open(os.path.join(spool, '%s.impact' % os.getpid()), 'ab')
+            try:
+                pickle.dump((name, files), fh, -1)
+            finally:
+                fh.close()
+        else:
+            self.tests[name] = self.tests.get(name, frozenset()) | files
+
+    def fileKey(self, filename):
+        """Return the index key for a code filename, or None if the file is
+        not under the working directory.
+        """
+        try:
+            return self._keys[filename]
+        except KeyError:
+            pass
+        key = self.key(src(filename))
+        if os.path.isabs(key) or key.startswith('../') or key.startswith('<'):
+            key = None
+        self._keys[filename] = key
+        return key
+
+    def testName(self, test):
+        """Return the name by which the index knows test, in the form
+        path/to/file.py:Class.method, or None if it has no address.
+        """
+        try:
+            filename, module, call = test.address()
+        except (AttributeError, TypeError, ValueError):
+            return None
+        if filename is None:
+            return None
+        name = self.key(src(filename))
+        if call:
+            name = '%s:%s' % (name, call)
+        return name
+
+    def loadTestsFromNames(self, names, module=None):
+        """Replace each directory in names with the affected tests in it.
+        """
+        if not self.selecting or module is not None:
+            return None
+        index = self.loadIndex()
+        if index is None:
+            log.warn("No test impact index in %s; running all tests",
+                     self.indexFile)
+            return None
+        selected = self.affected(index)
+        indexed = set([name.split(':')[0] for name in index])
+        translated = []
+        for name in names:
+            path = os.path.join(self.conf.workingDir, name)
+            if not os.path.isdir(path):
+                translated.append(name)
+                continue
+            if os.path.abspath(path) == self.conf.workingDir:
+                prefix = ''
+            else:
+                prefix = self.key(path) + '/'
+            tests = [test for test in selected if test.startswith(prefix)]
+            for key in self.testFiles(path):
+                if key not in indexed and key not in tests:
+                    tests.append(key)
+            for test in tests:
+                translated.append(os.path.join(
+                    self.conf.workingDir, test.replace('/', os.sep)))
+        log.debug("Running tests affected by %s changed files: %s",
+                  len(self.changed), translated)
+        return (None, translated)
+
+    def testFiles(self, path):
+        """Return the keys of the python test files that collection would
+        find in the directory tree at path.
+        """
+        selector = defaultSelector(self.conf)
+        found = []
+        for dirpath, dirnames, filenames in os.walk(path):
+            dirnames[:] = [
+                name for name in sorted(dirnames)
+                if not name.startswith('.') and not name.startswith('_')
+                and selector.wantDirectory(os.path.join(dirpath, name))]
+            for name in sorted(filenames):
+                filename = os.path.join(dirpath, name)
+                if name.endswith('.py') and selector.wantFile(filename):
+                    found.append(self.key(filename))
+        return found
+
+    def affected(self, index):
+        """Return the sorted names of the tests in index that depend on a
+        changed file, with whole test files in place of their tests where
+        the file changed. Test files that are not in the index are added
+        by loadTestsFromNames.
+        """
+        testFiles = {}
+        for name, files in index.items():
+            testFiles.setdefault(name.split(':')[0], []).append(name)
+        wholeFiles = set()
+        for key in self.changed:
+            # a changed file may have been deleted
+            if not self.exists(key):
+                continue
+            if key in testFiles:
+                wholeFiles.add(key)
+            elif key.endswith('.py') \
+                and self.conf.testMatch.search(os.path.basename(key)):
+                wholeFiles.add(key)
+        selected = set(wholeFiles)
+        for name, files in index.items():
+            if name.split(':')[0] not in wholeFiles \
+                   and not files.isdisjoint(self.changed):
+                selected.add(name)
+        return sorted(selected)
+
+    def exists(self, key):
+        """Return True if the file with this index key exists.
+        """
+        return os.path.exists(os.path.join(self.conf.workingDir,
+                                           key.replace('/', os.sep)))
+
+    def loadIndex(self):
+        """Return the saved dict of {test name: files}, or None if there is
+        no usable index. The tests of test files that no longer exist are
+        left out, and so are dropped from the index when it is next saved.
+        """
+        try:
+            fh = open(self.indexFile, 'rb')
+        except IOError:
+            return None
+        try:
+            try:
+                data = pickle.load(fh)
+            except (KeyboardInterrupt, SystemExit):
+                raise
+            except:
+                log.warn("Unable to read test impact index %s",
+                         self.indexFile, exc_info=True)
+                return None
+        finally:
+            fh.close()
+        if not isinstance(data, dict) or data.get('version') != self.version:
+            log.debug("Test impact index %s is stale; ignoring",
+                      self.indexFile)
+            return None
+        tests = {}
+        found = {}
+        for name, files in data['tests'].items():
+            path = name.split(':')[0]
+            if path not in found:
+                found[path] = self.exists(path)
+            if found[path]:
+                tests[name] = files
+        return tests
+
+    def finalize(self, result):
+        """Stop recording and save the index, merged with what the workers
+        recorded.
+        """
+        if not self.record or self.isWorker():
+            return
+        if self.spool:
+            self._mergeWorkers()
+        else:
+            sys.settrace(None)
+            threading.settrace(None)
+        self.saveIndex()
+
+    def _mergeWorkers(self):
+        for listing in os.listdir(self.spool):
+            fh = open(os.path.join(self.spool, listing), 'rb')
+            try:
+                while True:
+                    try:
+                        name, files = pickle.load(fh)
+                    except EOFError:
+                        break
+                    self.tests[name] = self.tests.get(name, frozenset()) \
+                                       | files
+            finally:
+                fh.close()
+        shutil.rmtree(self.spool, ignore_errors=True)
+        self.spool = None
+
+    def saveIndex(self):
+        """Save the recorded tests into the index, keeping the entries of
+        tests that did not run. The file is written under a temporary name
+        and renamed into place.
+        """
+        tests = self.loadIndex() or {}
+        tests.update(self.tests)
+        tmp = '%s.%s.tmp' % (self.indexFile, os.getpid())
+        try:
+            fh = open(tmp, 'wb')
+            try:
+                pickle.dump({'version': self.version, 'tests': tests}, fh, -1)
+            finally:
+                fh.close()
+            try:
+                os.rename(tmp, self.indexFile)
+            except OSError:
+                # windows will not rename over an existing file
+                os.remove(self.indexFile)
+                os.rename(tmp, self.indexFile)
+        except (IOError, OSError), e:
+            log.warn("Unable to save test impact index %s: %s",
+                     self.indexFile, e)
+            return
+        log.debug("Saved %s tests (%s recorded) to test impact index %s",
+                  len(tests), len(self.tests), self.indexFile)
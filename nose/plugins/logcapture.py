@@ -13,11 +13,41 @@ or myapp.foo.bar logger will be logged.
 
 You can remove other installed logging handlers with the
 ``--logging-clear-handlers`` option.
+
+Normally every statement logged during a test is formatted as it is logged,
+and kept until the test ends. When code under test logs a great deal, that
+can take longer than the test itself. With ``--logging-max-records=N``,
+only the last N statements logged during each test are kept, and they are
+not formatted unless the test fails or raises an error. Since formatting is
+put off, a statement shows the values its arguments have when the test
+ends, rather than when it was logged, if those values have changed.
+
+A few very large statements can take up a lot of memory however many there
+are. With ``--logging-max-bytes=M``, alone or along with
+``--logging-max-records``, the oldest statements are dropped once the ones
+kept add up to more than M bytes, though the last statement is always kept.
+The size of a statement is estimated, without formatting it, from the
+lengths of its message and arguments, or for arguments that are not
+strings, the size of the object itself, not counting the objects it refers
+to.
+
+With ``--logging-switch-off-excluded``, loggers that ``--logging-filter``
+excludes, along with all of their descendants, are switched off while each
+test runs if the capture handler is the only handler their statements would
+reach and none of their descendants has a handler of its own, so that
+logging to them costs next to nothing. Their levels are raised above
+CRITICAL, and restored when the test ends. The loggers are only looked
+through again when new loggers have been created. Since the levels are
+raised before the test starts, a handler that the test itself adds to one
+of these loggers receives nothing, and the logger's ``isEnabledFor()`` and
+``getEffectiveLevel()`` tell code under test that it is switched off.
 """
 
 import logging
 from logging import Handler
+import sys
 import threading
+from collections import deque
 
 from nose.plugins.base import Plugin
 from nose.util import anyp, ln, safe_str
@@ -30,8 +60,13 @@ except ImportError:
 log = logging.getLogger(__name__)
 
 class FilterSet(object):
+    # forget cached decisions once there are this many logger names
+    maxDecisions = 10000
+
     def __init__(self, filter_components):
         self.inclusive, self.exclusive = self._partition(filter_components)
+        self._decisions = {}
+        self._trees = {}
 
     # @staticmethod
     def _partition(components):
@@ -49,7 +84,34 @@ class FilterSet(object):
         if not self:
             # nothing to filter
             return True
-        return self._allow(record) and not self._deny(record)
+        try:
+            return self._decisions[record]
+        except KeyError:
+            allowed = self._allow(record) and not self._deny(record)
+            if len(self._decisions) >= self.maxDecisions:
+                self._decisions.clear()
+            self._decisions[record] = allowed
+            return allowed
+
+    def excludes_tree(self, name):
+        """returns whether the logger called `name` and all of its
+        descendants are filtered out"""
+        try:
+            return self._trees[name]
+        except KeyError:
+            excluded = self._excludes_tree(name)
+            if len(self._trees) >= self.maxDecisions:
+                self._trees.clear()
+            self._trees[name] = excluded
+            return excluded
+
+    def _excludes_tree(self, name):
+        if self._deny(name):
+            return True
+        if not self.inclusive or self._allow(name):
+            return False
+        prefix = name + '.'
+        return not [key for key in self.inclusive if key.startswith(prefix)]
 
     # @staticmethod
     def _any_match(matchers, record):
@@ -71,22 +133,93 @@ class FilterSet(object):
         return self._any_match(self.exclusive, record)
 
 
+def _size(obj):
+    if isinstance(obj, basestring):
+        return len(obj)
+    return sys.getsizeof(obj, 0)
+
+
+def recordSize(record):
+    """Estimate the number of bytes held by record's message and
+    arguments, without formatting them.
+    """
+    size = _size(record.msg)
+    args = record.args
+    if isinstance(args, dict):
+        args = args.values()
+    for arg in args or ():
+        size += _size(arg)
+    if record.exc_text:
+        size += len(record.exc_text)
+    return size
+
+
 class MyMemoryHandler(Handler):
-    def __init__(self, logformat, logdatefmt, filters):
+    def __init__(self, logformat, logdatefmt, filters, maxRecords=None,
+                 maxBytes=None):
         Handler.__init__(self)
         fmt = logging.Formatter(logformat, logdatefmt)
         self.setFormatter(fmt)
         self.filterset = FilterSet(filters)
-        self.buffer = []
+        self.maxRecords = maxRecords
+        self.maxBytes = maxBytes
+        # records are kept unformatted if either bound is set
+        self.lazy = maxRecords is not None or maxBytes is not None
+        self.truncate()
     def emit(self, record):
-        self.buffer.append(self.format(record))
+        if not self.lazy:
+            self.buffer.append(self.format(record))
+            return
+        if record.exc_info:
+            # don't keep the traceback's frames alive
+            record.exc_text = self.formatter.formatException(record.exc_info)
+            record.exc_info = None
+        self.emitted += 1
+        if self.maxBytes is None:
+            self.buffer.append(record)
+            return
+        if len(self.buffer) == self.maxRecords:
+            # the deque is about to drop its oldest record
+            self.size -= self.sizes[0]
+        size = recordSize(record)
+        self.buffer.append(record)
+        self.sizes.append(size)
+        self.size += size
+        while self.size > self.maxBytes and len(self.buffer) > 1:
+            self.buffer.popleft()
+            self.size -= self.sizes.popleft()
     def flush(self):
         pass # do nothing
     def truncate(self):
-        self.buffer = []
+        if not self.lazy:
+            self.buffer = []
+        else:
+            self.buffer = deque(maxlen=self.maxRecords)
+            # the estimated size of each record kept, and their total
+            self.sizes = deque(maxlen=self.maxRecords)
+            self.size = 0
+        self.emitted = 0
+    def formatted(self):
+        """Return the captured statements, formatted."""
+        if not self.lazy:
+            return self.buffer
+        lines = []
+        dropped = self.emitted - len(self.buffer)
+        if dropped:
+            lines.append('(%s earlier log records not kept)' % dropped)
+        for record in self.buffer:
+            try:
+                lines.append(self.format(record))
+            except Exception, e:
+                lines.append('%s: %s: %r (unable to format: %s)' % (
+                    record.name, record.levelname, record.msg, e))
+        return lines
     def filter(self, record):
-        if self.filterset.allow(record.name):
+        if not self.filterset.allow(record.name):
+            return False
+        if self.filters:
             return Handler.filter(self, record)
+        return True
     def __getstate__(self):
         state = self.__dict__.copy()
         del state['lock']
@@ -111,6 +244,18 @@ class LogCapture(Plugin):
     logdatefmt = None
     clear = False
     filters = ['-nose']
+    maxRecords = None
+    maxBytes = None
+    switchOff = False
+    # above CRITICAL, so that loggers set to it log nothing
+    offLevel = logging.CRITICAL + 1
+
+    def __init__(self):
+        Plugin.__init__(self)
+        self._switchedOff = {}
+        # the excluded loggers, found when the number of loggers changes
+        self._excluded = []
+        self._loggerCount = None
 
     def options(self, parser, env):
         """Register commandline options.
@@ -157,6 +302,30 @@ class LogCapture(Plugin):
             "--logging-level", action="store",
             default='NOTSET', dest="logcapture_level",
             help="Set the log level to capture")
+        parser.add_option(
+            "--logging-max-records", action="store", type="int",
+            default=env.get('NOSE_LOGMAXRECORDS'),
+            dest="logcapture_max_records", metavar="N",
+            help="Keep only the last N statements logged during each test, "
+                 "and format them only if the test fails."
+                 " [NOSE_LOGMAXRECORDS]")
+        parser.add_option(
+            "--logging-max-bytes", action="store", type="int",
+            default=env.get('NOSE_LOGMAXBYTES'),
+            dest="logcapture_max_bytes", metavar="M",
+            help="Drop the oldest statements logged during each test once "
+                 "those kept add up to more than about M bytes, and format "
+                 "them only if the test fails."
+                 " [NOSE_LOGMAXBYTES]")
+        parser.add_option(
+            "--logging-switch-off-excluded", action="store_true",
+            default=env.get('NOSE_LOGSWITCHOFF'),
+            dest="logcapture_switch_off",
+            help="While each test runs, switch off the loggers that "
+                 "--logging-filter excludes when no other handler would "
+                 "receive their statements. Handlers added by the test "
+                 "itself to those loggers receive nothing."
+                 " [NOSE_LOGSWITCHOFF]")
 
     def configure(self, options, conf):
         """Configure plugin.
@@ -172,6 +341,14 @@ class LogCapture(Plugin):
         self.loglevel = options.logcapture_level
         if options.logcapture_filters:
             self.filters = options.logcapture_filters.split(',')
+        self.maxRecords = getattr(options, 'logcapture_max_records', None)
+        if self.maxRecords is not None:
+            self.maxRecords = int(self.maxRecords)
+        self.maxBytes = getattr(options, 'logcapture_max_bytes', None)
+        if self.maxBytes is not None:
+            self.maxBytes = int(self.maxBytes)
+        self.switchOff = bool(getattr(options, 'logcapture_switch_off',
+                                      False))
 
     def setupLoghandler(self):
         # setup our handler with root logger
@@ -205,6 +382,55 @@ class LogCapture(Plugin):
         loglevel = getattr(self, "loglevel", "NOTSET")
         root_logger.setLevel(getattr(logging, loglevel))
 
+    def switchOffExcluded(self):
+        """Raise the level of excluded loggers whose statements would only
+        reach our handler, so that they create no log records at all.
+        Loggers are only looked through again when new ones have been
+        created; the handlers of the excluded ones are checked each time,
+        since tests may add and remove handlers.
+        """
+        loggers = logging.Logger.manager.loggerDict
+        if len(loggers) != self._loggerCount:
+            filterset = self.handler.filterset
+            self._loggerCount = len(loggers)
+            self._excluded = [
+                logger for name, logger in list(loggers.items())
+                if isinstance(logger, logging.Logger)
+                and filterset.excludes_tree(name)]
+        if not self._excluded:
+            return
+        # a logger that inherits its level passes the raised level of an
+        # ancestor on to its own handlers, so the ancestors of any logger
+        # with a handler of its own stay on
+        keep = set()
+        for logger in self._excluded:
+            if not self._onlyOurs(logger, parents=False):
+                parent = logger.parent
+                while parent is not None and parent not in keep:
+                    keep.add(parent)
+                    parent = parent.parent
+        for logger in self._excluded:
+            if logger not in keep and self._onlyOurs(logger):
+                self._switchedOff[logger] = logger.level
+                logger.setLevel(self.offLevel)
+
+    def _onlyOurs(self, logger, parents=True):
+        while logger is not None:
+            for handler in logger.handlers:
+                if not isinstance(handler, MyMemoryHandler):
+                    return False
+            if not parents or not logger.propagate:
+                break
+            logger = logger.parent
+        return True
+
+    def switchOnExcluded(self):
+        """Restore the levels of the loggers switched off."""
+        for logger, level in self._switchedOff.items():
+            if logger.level == self.offLevel:
+                logger.setLevel(level)
+        self._switchedOff.clear()
+
     def begin(self):
         """Set up logging handler before test run begins.
         """
@@ -212,7 +438,9 @@ class LogCapture(Plugin):
 
     def start(self):
         self.handler = MyMemoryHandler(self.logformat, self.logdatefmt,
-                                       self.filters)
+                                       self.filters, self.maxRecords,
+                                       self.maxBytes)
+        self._loggerCount = None
         self.setupLoghandler()
 
     def end(self):
@@ -222,10 +450,13 @@ class LogCapture(Plugin):
         """Clear buffers and handlers before test.
         """
         self.setupLoghandler()
+        if self.switchOff:
+            self.switchOffExcluded()
 
     def afterTest(self, test):
         """Clear buffers after test.
         """
+        self.switchOnExcluded()
         self.handler.truncate()
 
     def formatFailure(self, test, err):
@@ -244,7 +475,7 @@ class LogCapture(Plugin):
         return (ec, self.addCaptureToErr(ev, records), tb)
 
     def formatLogRecords(self):
-        return map(safe_str, self.handler.buffer)
+        return map(safe_str, self.handler.formatted())
 
     def addCaptureToErr(self, ev, records):
         return '\n'.join([safe_str(ev), ln('>> begin captured logging <<')] + \
@@ -52,6 +52,7 @@ import inspect
 import logging
 import os
 import sys
+import time
 from itertools import chain as iterchain
 from warnings import warn
 import nose.config
@@ -70,7 +71,8 @@ except:
 
 
 __all__ = ['DefaultPluginManager', 'PluginManager', 'EntryPointPluginManager',
-           'BuiltinPluginManager', 'RestrictedPluginManager']
+           'BuiltinPluginManager', 'RestrictedPluginManager',
+           'TimingPluginProxy']
 
 log = logging.getLogger(__name__)
 
@@ -98,6 +100,26 @@ class PluginProxy(object):
     def __call__(self, *arg, **kw):
         return self.call(*arg, **kw)
 
+    def compile(self):
+        """Return a callable that behaves like this proxy, but that skips
+        the proxy where possible: a call that no plugin implements does
+        nothing, and a call that one plugin implements goes straight to
+        that plugin, unless the call is generative. Subclasses that must
+        see every call should return self.
+        """
+        generative = getattr(self.method, 'generative', False)
+        if self.call == self._loadTestsFromNames:
+            return self.call
+        if not self.plugins:
+            if generative:
+                return _emptyList
+            return _doNothing
+        if len(self.plugins) == 1 and not generative:
+            return self.plugins[0][1]
+        if self.call == self.simple:
+            return _firstResult(tuple([meth for p, meth in self.plugins]))
+        return self.call
+
     def addPlugin(self, plugin, call):
         """Add plugin to my list of plugins to call, if it has the attribute
         I'm bound to.
@@ -108,7 +130,14 @@ class PluginProxy(object):
                     len(inspect.getargspec(meth)[0]) == 2:
                 orig_meth = meth
                 meth = lambda module, path, **kwargs: orig_meth(module)
-            self.plugins.append((plugin, meth))
+            self.plugins.append((plugin, self.wrap(plugin, call, meth)))
+
+    def wrap(self, plugin, call, meth):
+        """Return the callable to use to call meth, plugin's
+        implementation of call. Subclasses may wrap meth to instrument
+        plugin calls.
+        """
+        return meth
 
     def makeCall(self, call):
         if call == 'loadTestsFromNames':
@@ -184,6 +213,61 @@ class PluginProxy(object):
         return suite, names
 
 
+def _doNothing(*arg, **kw):
+    pass
+
+
+def _emptyList(*arg, **kw):
+    return []
+
+
+def _firstResult(meths):
+    def simple(*arg, **kw):
+        for meth in meths:
+            result = meth(*arg, **kw)
+            if result is not None:
+                return result
+    return simple
+
+
+def _hooks(interface):
+    """Names of the plugin calls defined by interface.
+    """
+    return [name for name, value in inspect.getmembers(interface)
+            if not name.startswith('_') and callable(value)]
+
+
+class TimingPluginProxy(PluginProxy):
+    """Plugin proxy that records how many times each plugin's
+    implementation of a call is made, and the total and longest wall
+    time that it takes. Times include any plugin calls made by the
+    plugin while handling the call. For generative calls, only the time
+    taken to return the plugin's result is counted, not the time taken
+    to produce the items in it.
+
+    Results accumulate in the ``times`` dict, which maps (plugin name,
+    call) to a list of [calls, total seconds, longest seconds]. Subclass
+    and set ``times`` to collect results separately.
+    """
+    times = {}
+
+    def wrap(self, plugin, call, meth):
+        key = (getattr(plugin, 'name', None) or plugin.__class__.__name__,
+               call)
+        record = self.times.setdefault(key, [0, 0.0, 0.0])
+        def timed(*arg, **kw):
+            start = time.time()
+            try:
+                return meth(*arg, **kw)
+            finally:
+                elapsed = time.time() - start
+                record[0] += 1
+                record[1] += elapsed
+                if elapsed > record[2]:
+                    record[2] = elapsed
+        return timed
+
+
 class NoPlugins(object):
     """Null Plugin manager that has no plugins."""
     interface = IPluginInterface
@@ -233,6 +317,12 @@ class PluginManager(object):
 
     Note that the list of plugins *may not* be changed after the first plugin
     call.
+
+    When the plugins are configured, the manager compiles a dispatch table:
+    each plugin call is bound directly on the manager to the callable
+    returned by its proxy's ``compile()`` method, so that calls that no
+    enabled plugin implements cost nothing and calls implemented by one
+    plugin go straight to that plugin. Adding plugins discards the table.
     """
     proxyClass = PluginProxy
 
@@ -240,6 +330,7 @@ class PluginManager(object):
         self._plugins = []
         self._extraplugins = ()
         self._proxies = {}
+        self._compiled = ()
         if plugins:
             self.addPlugins(plugins)
         if proxyClass is not None:
@@ -259,6 +350,7 @@ class PluginManager(object):
     def addPlugin(self, plug):
         # allow, for instance, plugins loaded via entry points to
         # supplant builtin plugins.
+        self._discardCompiled()
         new_name = getattr(plug, 'name', object())
         self._plugins[:] = [p for p in self._plugins
                             if getattr(p, 'name', None) != new_name]
@@ -286,6 +378,33 @@ class PluginManager(object):
         self.plugins = enabled
         self.sort()
         log.debug("Plugins enabled: %s", enabled)
+        self.compile()
+
+    def compile(self):
+        """Compile the dispatch table for the current list of plugins.
+        """
+        self._discardCompiled()
+        compiled = []
+        counts = {_doNothing: 0, _emptyList: 0}
+        for call in _hooks(self.proxyClass.interface):
+            if hasattr(self.__class__, call):
+                # don't hide the manager's own methods
+                continue
+            proxy = self._proxies[call] = self.proxyClass(call, self._plugins)
+            fn = proxy.compile()
+            if fn in counts:
+                counts[fn] += 1
+            self.__dict__[call] = fn
+            compiled.append(call)
+        self._compiled = compiled
+        log.debug("Compiled %s plugin calls, %s with no plugins",
+                  len(compiled), counts[_doNothing] + counts[_emptyList])
+
+    def _discardCompiled(self):
+        for call in getattr(self, '_compiled', ()):
+            self.__dict__.pop(call, None)
+        self._compiled = ()
+        self._proxies = {}
 
     def loadPlugins(self):
         for plug in self._extraplugins:
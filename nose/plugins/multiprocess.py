@@ -47,6 +47,26 @@ initializes a shared database -- then set ``_multiprocess_shared_ = True`` in
 the context. These fixtures will then execute in the primary nose process, and
 tests in those contexts will be individually dispatched to run in parallel.
 
+Scheduling
+^^^^^^^^^^
+
+By default, all dispatched tests are put on a single queue, and each worker
+takes the next test from that queue when it is ready for more work. With many
+workers and many very fast tests, workers can spend more time waiting on the
+shared queue than running tests. Pass ``--process-scheduler=steal`` to give
+each worker its own queue instead. The collected tests are divided among the
+worker queues up front, and a worker that empties its own queue takes tests
+from the queues of the other workers. These queues are read and written by
+the workers directly, rather than through the manager process that holds the
+single queue, and a worker that runs out of tasks skips the queues of peers
+that have run out too.
+
+When a few slow tests are collected late, the whole run may wait on them
+while the other workers sit idle. Pass ``--process-durations-file=FILE`` to
+have the plugin record how long each dispatched test takes, and on later runs
+dispatch the slowest tests first. Tests with no recorded time are assumed to
+take the average time of the recorded tests.
+
 How results are collected and reported
 ======================================
 
@@ -58,6 +78,61 @@ results from the test run are combined into a consolidated result
 set. When results have been received for all dispatched tests, or all
 workers have died, the result summary is output as normal.
 
+Each worker normally sends results back after every test it runs. When a run
+consists of many very fast tests, pass ``--process-result-batch=N`` to have
+workers send the results of up to N tests at once. A worker always sends what
+it has before waiting for more work, and with
+``--process-result-interval=SECONDS`` it sends the batch at the end of the
+first test that finishes that long after the batch was started, even if the
+batch is not full. A batch is not sent while a test is running, so results
+wait for at least as long as the test in progress. Progress output arrives
+in bursts when batching is enabled. If a worker is killed because a test
+timed out, the tests whose results it had not yet sent are reported as
+errors.
+
+Timeouts
+^^^^^^^^
+
+A test that runs for longer than ``--process-timeout`` seconds is
+interrupted with a TimedOutException, and the worker goes on to its next
+test. Tests stuck in code that can't be interrupted, such as some
+extension modules, don't respond to that; if the worker has not moved on
+after a few seconds it is terminated, and then killed, the test is reported
+as an error and a new worker is started in its place. If the faulthandler_
+module is installed, a terminated worker prints the stack of the stuck test
+to stderr first.
+
+.. _faulthandler : http://pypi.python.org/pypi/faulthandler/
+
+Restarting workers
+^^^^^^^^^^^^^^^^^^
+
+Tests that leak memory can make long-lived worker processes grow without
+bound. ``--process-restartworker`` replaces each worker with a new process
+after every test, which keeps memory in check but pays the worker start up
+cost for every test. Pass ``--process-max-tasks-per-worker=N`` to replace a
+worker only after it has run N tests, or ``--process-max-rss=MB`` to replace a
+worker once its peak memory use reaches MB megabytes. Memory use is measured
+with the :mod:`resource` module, and so is not available on Windows.
+
+Starting workers
+^^^^^^^^^^^^^^^^
+
+Each worker process starts by setting up its own copy of the plugins, and
+then imports the test modules and the code under test as its tests need
+them. When that takes a long time, and especially when workers are
+restarted often, pass ``--process-prefork`` to have a template process do
+it once. The template is started after the tests have been collected; it
+configures the plugins, imports the modules named with
+``--process-preload=MODULES`` (a comma-separated list of module names, which
+implies ``--process-prefork``), and then forks every worker process,
+including the workers started in place of those that are restarted,
+retired or killed. Each worker begins with the template's plugins and
+modules already set up, and only calls the plugins' ``begin`` itself.
+Since a plugin is configured once for all of the workers, plugins that
+open files or connections when they are configured share them between
+workers. This mode is only available on platforms that can fork processes.
+
 Beware!
 =======
 
@@ -93,6 +168,8 @@ New Features in 1.1.0
 
 """
 
+import errno
+import heapq
 import logging
 import os
 import sys
@@ -101,7 +178,9 @@ import traceback
 import unittest
 import pickle
 import signal
+import threading
 import nose.case
+from nose.config import Config
 from nose.core import TextTestRunner
 from nose import failure
 from nose import loader
@@ -109,7 +188,7 @@ from nose.plugins.base import Plugin
 from nose.pyversion import bytes_
 from nose.result import TextTestResult
 from nose.suite import ContextSuite
-from nose.util import test_address
+from nose.util import test_address, tolist
 try:
     # 2.7+
     from unittest.runner import _WritelnDecorator
@@ -121,6 +200,10 @@ try:
     from cStringIO import StringIO
 except ImportError:
     import StringIO
+try:
+    import faulthandler
+except ImportError:
+    faulthandler = None
 
 # this is a list of plugin classes that will be checked for and created inside 
 # each worker process
@@ -138,9 +221,11 @@ class TimedOutException(KeyboardInterrupt):
         return repr(self.value)
 
 def _import_mp():
-    global Process, Queue, Pool, Event, Value, Array
+    global Process, Queue, Pool, Event, Value, Array, WorkerQueue, RawArray, \
+        Pipe
     try:
-        from multiprocessing import Manager, Process
+        from multiprocessing import Manager, Pipe, Process, RawArray
+        from multiprocessing import Queue as WorkerQueue
         #prevent the server process created in the manager which holds Python 
         #objects and allows other processes to manipulate them using proxies
         #to interrupt on SIGINT (keyboardinterrupt) so that the communication
@@ -177,6 +262,446 @@ class TestLet:
     def __str__(self):
         return self._str
 
+class TaskQueues(object):
+    """Task queues shared by the main process and its workers.
+
+    With a single queue, all workers take tasks from the same queue, in
+    the order the tasks were collected. With one queue per worker, the
+    collected tasks are partitioned among the queues in contiguous runs,
+    so that tests from the same module tend to go to the same worker. A
+    worker takes tasks from its own queue first; when that is empty, it
+    steals tasks from its peers' queues, and only then waits on its own
+    queue for more work or the signal to stop.
+
+    If idle is given, it is a shared array with a flag per queue. A worker
+    sets its flag when it finds its own queue empty, and clears it when it
+    puts a task on its queue or takes one from it; workers looking for
+    tasks to steal skip the queues whose flag is set, so that a worker
+    that runs out of tasks near the end of the run does not ask every
+    drained peer queue for work in turn.
+
+    In the main process, tasks are held until :meth:`dispatch` is
+    called. Each worker uses the view returned by :meth:`forWorker`.
+    """
+    def __init__(self, queues, ix=None, idle=None):
+        self.queues = queues
+        self.ix = ix
+        self.idle = idle
+        self.pending = []
+
+    def __getstate__(self):
+        # pending tasks are never sent to workers
+        return {'queues': self.queues, 'ix': self.ix, 'idle': self.idle,
+                'pending': []}
+
+    def forWorker(self, ix):
+        return TaskQueues(self.queues, ix, self.idle)
+
+    def dispatch(self, estimate=None):
+        """Put pending tasks on the queues.
+
+        If estimate is given, it is called with each task and must return
+        the expected run time of the task. Tasks are then dispatched
+        longest first, and each is put on the queue with the least total
+        expected run time so far. Tasks with equal estimates keep the
+        order in which they were collected.
+        """
+        count = len(self.pending)
+        nqueues = len(self.queues)
+        if estimate is None:
+            for i, queue in enumerate(self.queues):
+                for task in self.pending[i * count // nqueues:
+                                         (i + 1) * count // nqueues]:
+                    queue.put(task, block=False)
+        else:
+            loads = [(0.0, i) for i in range(nqueues)]
+            for task in sorted(self.pending, key=estimate, reverse=True):
+                load, i = heapq.heappop(loads)
+                self.queues[i].put(task, block=False)
+                heapq.heappush(loads, (load + estimate(task), i))
+        self.pending = []
+
+    def stop(self, ix):
+        """Tell worker ix to stop once it has finished its tasks.
+        """
+        self.queues[ix % len(self.queues)].put('STOP', block=False)
+
+    def empty(self):
+        if self.pending:
+            return False
+        for queue in self.queues:
+            if not queue.empty():
+                return False
+        return True
+
+    def put(self, task, block=True):
+        if self.ix is None:
+            self.pending.append(task)
+        else:
+            mine = self.ix % len(self.queues)
+            self.queues[mine].put(task, block)
+            if self.idle is not None:
+                self.idle[mine] = 0
+
+    def get(self, block=True, timeout=None):
+        nqueues = len(self.queues)
+        mine = self.ix % nqueues
+        own = self.queues[mine]
+        if nqueues == 1:
+            return own.get(block, timeout)
+        try:
+            return self._own(own.get(False))
+        except Empty:
+            if self.idle is not None:
+                self.idle[mine] = 1
+        for i in range(1, nqueues):
+            if self.idle is not None and self.idle[(self.ix + i) % nqueues]:
+                continue
+            peer = self.queues[(self.ix + i) % nqueues]
+            try:
+                task = peer.get(False)
+            except Empty:
+                continue
+            if task == 'STOP':
+                # only the peer itself may take its stop signal
+                peer.put(task)
+                continue
+            log.debug("Worker %s stole %s from worker %s",
+                      self.ix, task, (self.ix + i) % nqueues)
+            return task
+        return self._own(own.get(block, timeout))
+
+    def _own(self, task):
+        # a task taken from this worker's own queue
+        if self.idle is not None and task != 'STOP':
+            self.idle[self.ix % len(self.queues)] = 0
+        return task
+
+
+class TaskDurations(object):
+    """Wall times of tasks from previous runs, keyed by task address and
+    stored in a pickle file.
+
+    Tasks that have no recorded time are estimated to take the mean of
+    all recorded times, so that with no history at all, tasks are
+    dispatched in the order in which they were collected.
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self.durations = {}
+        self.mean = 0.0
+        self.load()
+
+    def load(self):
+        try:
+            fh = open(self.filename, 'rb')
+        except IOError:
+            log.debug('No task durations file %s', self.filename)
+            return
+        try:
+            try:
+                self.durations = pickle.load(fh)
+            except (KeyboardInterrupt, SystemExit):
+                raise
+            except:
+                log.debug('Unable to read task durations from %s',
+                          self.filename, exc_info=True)
+                self.durations = {}
+        finally:
+            fh.close()
+        if self.durations:
+            self.mean = sum(self.durations.values()) / len(self.durations)
+        log.debug('Loaded %s task durations from %s',
+                  len(self.durations), self.filename)
+
+    def save(self):
+        tmp = '%s.%s.tmp' % (self.filename, os.getpid())
+        try:
+            fh = open(tmp, 'wb')
+            try:
+                pickle.dump(self.durations, fh, -1)
+            finally:
+                fh.close()
+            try:
+                os.rename(tmp, self.filename)
+            except OSError:
+                # windows will not rename over an existing file
+                os.remove(self.filename)
+                os.rename(tmp, self.filename)
+        except (IOError, OSError), e:
+            log.warn('Unable to save task durations to %s: %s',
+                     self.filename, e)
+
+    def estimate(self, task):
+        return self.durations.get(task_address(task), self.mean)
+
+    def record(self, addr, seconds):
+        self.durations[addr] = seconds
+
+
+def max_rss():
+    """Return the peak resident set size of this process in megabytes, or
+    None if it can't be determined on this platform.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        # bytes on OS X, kilobytes elsewhere
+        return rss / (1024.0 * 1024.0)
+    return rss / 1024.0
+
+
+def task_address(task):
+    """Return the address used to track a (test address, arg) task.
+    """
+    test_addr, arg = task
+    if arg is not None:
+        test_addr += str(arg)
+    return test_addr
+
+
+class TaskSet(object):
+    """The addresses of tasks that have been dispatched but whose results
+    have not yet been received. An address may be dispatched more than
+    once, so the set keeps a count for each address. Implements the list
+    methods used to keep track of tasks, but removes tasks in constant
+    time.
+    """
+    def __init__(self):
+        self.counts = {}
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        for addr, count in self.counts.items():
+            for i in range(count):
+                yield addr
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def append(self, addr):
+        self.counts[addr] = self.counts.get(addr, 0) + 1
+        self.size += 1
+
+    def extend(self, addrs):
+        for addr in addrs:
+            self.append(addr)
+
+    def remove(self, addr):
+        count = self.counts.get(addr)
+        if not count:
+            raise ValueError("%s not in tasks" % addr)
+        if count == 1:
+            del self.counts[addr]
+        else:
+            self.counts[addr] = count - 1
+        self.size -= 1
+
+
+class ResultBatch(object):
+    """Results of the tasks run by a worker that have not yet been sent to
+    the main process.
+
+    All tasks in a batch report to the same result, so that the output,
+    failures and errors of many tasks travel back in one message. The
+    batch is sent when a task finishes and the batch then holds ``size``
+    tasks or was started ``interval`` or more seconds before, or when
+    :meth:`flush` is called.
+
+    If ``unsent`` is given, it is a shared value that holds the addresses
+    of the tasks in the batch, one per line, so that if the worker is
+    killed, the main process can find out which finished tasks it never
+    received.
+    """
+    def __init__(self, ix, resultQueue, makeResult, summarize, size=1,
+                 interval=0.0, unsent=None):
+        self.ix = ix
+        self.resultQueue = resultQueue
+        self.makeResult = makeResult
+        self.summarize = summarize
+        self.size = max(size, 1)
+        self.interval = interval
+        self.unsent = unsent
+        self.result = None
+        self.started = None
+        self.tasks = []
+
+    def getResult(self):
+        """Return the result that the next task should report to.
+        """
+        if self.result is None:
+            self.result = self.makeResult()
+            self.started = time.time()
+        return self.result
+
+    def add(self, test_addr, newtasks, elapsed):
+        """Record that the task at test_addr has finished.
+        """
+        self.getResult()
+        self.tasks.append((test_addr, newtasks, elapsed))
+        if (len(self.tasks) >= self.size
+            or time.time() - self.started >= self.interval):
+            self.flush()
+        elif self.unsent is not None:
+            self.unsent.value = bytes_(
+                '\n'.join([task[0] for task in self.tasks]))
+
+    def flush(self, retiring=False):
+        """Send the batch to the main process, if it holds any tasks. If
+        retiring is true, the worker will take no more tasks after this
+        batch, and the main process should replace it; the batch is sent
+        even if it is empty, so that the main process finds out.
+        """
+        if not self.tasks and not retiring:
+            return
+        tasks, result = self.tasks, self.getResult()
+        self.tasks, self.result = [], None
+        self.resultQueue.put((self.ix, tasks, self.summarize(result),
+                              retiring))
+        if self.unsent is not None and tasks:
+            self.unsent.value = bytes_('')
+
+
+class Watchdog(threading.Thread):
+    """Thread in the main process that enforces the process timeout.
+
+    The watchdog keeps a heap of the times at which the test each worker
+    is running could next time out. When a worker is still running the
+    same test at its deadline, it is sent SIGILL, which raises
+    TimedOutException in the test. If the worker has not moved on after
+    ``grace`` seconds, it is sent SIGTERM, and after another ``grace``
+    seconds, SIGKILL. The test that a killed worker was running is put on
+    the result queue with no result, so that the main process can fail
+    the test and replace the worker, along with the tests whose results
+    the worker was holding back in a batch, with no elapsed time.
+    """
+    signals = (signal.SIGILL, signal.SIGTERM,
+               getattr(signal, 'SIGKILL', signal.SIGTERM))
+
+    def __init__(self, workers, resultQueue, timeout, grace):
+        super(Watchdog, self).__init__(name='nose-watchdog')
+        self.daemon = True
+        self.workers = workers
+        self.resultQueue = resultQueue
+        self.timeout = timeout
+        self.grace = grace
+        self.stopped = threading.Event()
+        # held while reporting what a dead worker left unfinished, which
+        # the main process may also do
+        self.lock = threading.Lock()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+    def run(self):
+        now = time.time()
+        heap = [(now + self.timeout, ix, None)
+                for ix in range(len(self.workers))]
+        while heap and not self.stopped.is_set():
+            when, ix, pending = heap[0]
+            wait = when - time.time()
+            if wait > 0:
+                self.stopped.wait(wait)
+                continue
+            try:
+                when, pending = self.check(ix, pending)
+            except (IOError, EOFError):
+                # the manager process has gone away
+                log.debug("Watchdog lost contact with worker %s", ix)
+                break
+            heapq.heapreplace(heap, (when, ix, pending))
+
+    def reap(self, ix):
+        """Put the test that the dead worker ix was running, and the tests
+        whose results it had not sent, on the result queue with no result.
+        Returns True if there were any.
+        """
+        w = self.workers[ix]
+        self.lock.acquire()
+        try:
+            addr = bytes_(w.currentaddr.value, 'ascii')
+            lost = [(unsent, [], None) for unsent
+                    in bytes_(w.unsent.value, 'ascii').splitlines()]
+            if not addr and not lost:
+                return False
+            w.currentaddr.value = bytes_('')
+            w.unsent.value = bytes_('')
+        finally:
+            self.lock.release()
+        if addr:
+            log.error("Worker %s was killed while running %s", ix, addr)
+            lost.insert(0, (addr, [], time.time() - w.currentstart.value))
+        self.resultQueue.put((ix, lost, None, True))
+        return True
+
+    def check(self, ix, pending):
+        """Check on worker ix, and return when to check it next, and what
+        the worker should be found doing then. pending is None, or the
+        (pid, address, start time) of the test that the worker has been
+        signalled to stop, and the number of signals sent.
+        """
+        w = self.workers[ix]
+        now = time.time()
+        addr = bytes_(w.currentaddr.value, 'ascii')
+        if not addr:
+            # the next test can't time out any sooner than this
+            return now + self.timeout, None
+        current = (w.pid, addr, w.currentstart.value)
+        alive = w.is_alive()
+        if pending is None or pending[0] != current:
+            deadline = current[2] + self.timeout
+            if alive and deadline > now:
+                return deadline, None
+            pending = (current, 0)
+        current, sent = pending
+        if not alive or sent == len(self.signals):
+            if alive:
+                w.join(self.grace)
+            self.reap(ix)
+            return now + self.timeout, None
+        sig = self.signals[sent]
+        if sent:
+            log.error("Worker %s did not stop %s; sending signal %s",
+                      ix, addr, sig)
+        else:
+            log.debug("Worker %s timed out running %s", ix, addr)
+        try:
+            os.kill(w.pid, sig)
+        except OSError:
+            pass
+        return now + self.grace, (current, sent + 1)
+
+
+class ModuleCache(object):
+    """Importer wrapper used by worker processes. Remembers the module
+    imported for each path and name, so that when several tasks come
+    from the same module, only the first goes through the importer.
+    """
+    def __init__(self, importer):
+        self.importer = importer
+        self.modules = {}
+
+    def __getattr__(self, attr):
+        return getattr(self.importer, attr)
+
+    def importFromPath(self, path, fqname):
+        key = (path, fqname)
+        mod = self.modules.get(key)
+        # the module may have been replaced, eg by a test that
+        # reloads it or by a same-named module from another directory
+        if mod is not None and sys.modules.get(fqname) is mod:
+            return mod
+        mod = self.modules[key] = self.importer.importFromPath(path, fqname)
+        return mod
+
+
 class MultiProcess(Plugin):
     """
     Run tests in multiple processes. Requires processing module.
@@ -215,6 +740,79 @@ class MultiProcess(Plugin):
                           " their tests are done, this helps control memory "
                           "leaks from killing the system. "
                           "[NOSE_PROCESS_RESTARTWORKER]")
+        parser.add_option("--process-max-tasks-per-worker", action="store",
+                          default=env.get('NOSE_PROCESS_MAX_TASKS_PER_WORKER',
+                                          0),
+                          dest="multiprocess_max_tasks",
+                          metavar="NUM",
+                          help="Replace each worker process with a new one "
+                          "after it has run this many tests. Default is 0, "
+                          "meaning never. "
+                          "[NOSE_PROCESS_MAX_TASKS_PER_WORKER]")
+        parser.add_option("--process-max-rss", action="store",
+                          default=env.get('NOSE_PROCESS_MAX_RSS', 0),
+                          dest="multiprocess_max_rss",
+                          metavar="MB",
+                          help="Replace a worker process with a new one "
+                          "once its memory use has reached this many "
+                          "megabytes. Default is 0, meaning never. "
+                          "[NOSE_PROCESS_MAX_RSS]")
+        parser.add_option("--process-scheduler", action="store",
+                          type="choice", choices=("queue", "steal"),
+                          default=env.get('NOSE_PROCESS_SCHEDULER', 'queue'),
+                          dest="multiprocess_scheduler",
+                          metavar="SCHEDULER",
+                          help="How tests are handed out to worker "
+                          "processes. 'queue' (the default) puts all tests "
+                          "on one queue shared by all workers. 'steal' "
+                          "gives each worker its own queue of tests, and "
+                          "lets workers that run out of tests take them "
+                          "from the queues of other workers. "
+                          "[NOSE_PROCESS_SCHEDULER]")
+        parser.add_option("--process-durations-file", action="store",
+                          default=env.get('NOSE_PROCESS_DURATIONS_FILE'),
+                          dest="multiprocess_durations",
+                          metavar="FILE",
+                          help="Record how long each test dispatched to a "
+                          "worker process takes in this file, and use the "
+                          "times recorded by earlier runs to dispatch the "
+                          "slowest tests first. A relative path is taken "
+                          "to be relative to the working directory. "
+                          "[NOSE_PROCESS_DURATIONS_FILE]")
+        parser.add_option("--process-result-batch", action="store",
+                          default=env.get('NOSE_PROCESS_RESULT_BATCH', 1),
+                          dest="multiprocess_result_batch",
+                          metavar="NUM",
+                          help="Have each worker process send the results "
+                          "of up to this many tests back to the main "
+                          "process at once. Default is 1. "
+                          "[NOSE_PROCESS_RESULT_BATCH]")
+        parser.add_option("--process-result-interval", action="store",
+                          default=env.get('NOSE_PROCESS_RESULT_INTERVAL', 1),
+                          dest="multiprocess_result_interval",
+                          metavar="SECONDS",
+                          help="When sending results in batches, send a "
+                          "batch when a test finishes this many seconds or "
+                          "more after the batch was started, even if it is "
+                          "not full. Results are not sent while a test is "
+                          "running. Default is 1. "
+                          "[NOSE_PROCESS_RESULT_INTERVAL]")
+        parser.add_option("--process-prefork", action="store_true",
+                          default=env.get('NOSE_PROCESS_PREFORK', False),
+                          dest="multiprocess_prefork",
+                          help="Configure the plugins of the worker "
+                          "processes once, in a template process, and fork "
+                          "every worker, including restarted workers, from "
+                          "it. [NOSE_PROCESS_PREFORK]")
+        parser.add_option("--process-preload", action="append",
+                          default=tolist(env.get('NOSE_PROCESS_PRELOAD')),
+                          dest="multiprocess_preload",
+                          metavar="MODULES",
+                          help="Import these modules (a comma-separated "
+                          "list; the option may be given more than once) "
+                          "in the template process, so that every worker "
+                          "begins with them imported. Implies "
+                          "--process-prefork. [NOSE_PROCESS_PRELOAD]")
 
     def configure(self, options, config):
         """
@@ -255,6 +853,39 @@ class MultiProcess(Plugin):
             self.config.multiprocess_timeout = t
             r = int(options.multiprocess_restartworker)
             self.config.multiprocess_restartworker = r
+            self.config.multiprocess_max_tasks = int(
+                getattr(options, 'multiprocess_max_tasks', 0) or 0)
+            self.config.multiprocess_max_rss = float(
+                getattr(options, 'multiprocess_max_rss', 0) or 0)
+            if self.config.multiprocess_max_rss and max_rss() is None:
+                warn("Memory use of worker processes can't be measured on "
+                     "this platform; --process-max-rss will be ignored",
+                     RuntimeWarning)
+                self.config.multiprocess_max_rss = 0
+            self.config.multiprocess_scheduler = getattr(
+                options, 'multiprocess_scheduler', 'queue')
+            durations = getattr(options, 'multiprocess_durations', None)
+            if durations:
+                durations = os.path.expanduser(durations)
+                if not os.path.isabs(durations):
+                    durations = os.path.join(config.workingDir, durations)
+            self.config.multiprocess_durations = durations
+            self.config.multiprocess_result_batch = int(
+                getattr(options, 'multiprocess_result_batch', 1))
+            self.config.multiprocess_result_interval = float(
+                getattr(options, 'multiprocess_result_interval', 1))
+            preload = []
+            for names in getattr(options, 'multiprocess_preload', None) or ():
+                preload.extend(tolist(names))
+            self.config.multiprocess_preload = preload
+            prefork = bool(getattr(options, 'multiprocess_prefork', False)
+                           or preload)
+            if prefork and not hasattr(os, 'fork'):
+                warn("Worker processes can't be forked on this platform; "
+                     "--process-prefork and --process-preload will be "
+                     "ignored", RuntimeWarning)
+                prefork = False
+            self.config.multiprocess_prefork = prefork
             self.status['active'] = True
 
     def prepareTestLoader(self, loader):
@@ -276,11 +907,19 @@ def signalhandler(sig, frame):
     raise TimedOutException()
 
 class MultiProcessTestRunner(TextTestRunner):
-    waitkilltime = 5.0 # max time to wait to terminate a process that does not
-                       # respond to SIGILL
+    waitkilltime = 5.0 # time to wait for a timed out worker to respond to
+                       # each signal before sending a stronger one
     def __init__(self, **kw):
         self.loaderClass = kw.pop('loaderClass', loader.defaultTestLoader)
         super(MultiProcessTestRunner, self).__init__(**kw)
+        self.pickledConfig = None
+        self.template = None
+
+    def workerConfig(self):
+        if self.pickledConfig is None:
+            # workers all get the same config; pickle it only once
+            self.pickledConfig = pickle.dumps(self.config)
+        return self.pickledConfig
 
     def collect(self, test, testQueue, tasks, to_teardown, result):
         # dispatch and collect results
@@ -325,20 +964,41 @@ class MultiProcessTestRunner(TextTestRunner):
     def startProcess(self, iworker, testQueue, resultQueue, shouldStop, result):
         currentaddr = Value('c',bytes_(''))
         currentstart = Value('d',time.time())
+        unsent = Value('c',bytes_(''))
         keyboardCaught = Event()
+        p = None
+        if self.template is not None:
+            try:
+                p = self.template.fork(iworker, currentaddr, currentstart,
+                                       unsent, keyboardCaught)
+            except (IOError, EOFError):
+                log.warn("Worker template process has gone away; starting "
+                         "worker processes directly")
+                self.template = None
+        if p is None:
+            p = self._startProcess(iworker, testQueue, resultQueue,
+                                   currentaddr, currentstart, unsent,
+                                   keyboardCaught, shouldStop, result)
+        p.currentaddr = currentaddr
+        p.currentstart = currentstart
+        p.unsent = unsent
+        p.keyboardCaught = keyboardCaught
+        return p
+
+    def _startProcess(self, iworker, testQueue, resultQueue, currentaddr,
+                      currentstart, unsent, keyboardCaught, shouldStop,
+                      result):
         p = Process(target=runner,
-                   args=(iworker, testQueue,
+                   args=(iworker, testQueue.forWorker(iworker),
                          resultQueue,
                          currentaddr,
                          currentstart,
+                         unsent,
                          keyboardCaught,
                          shouldStop,
                          self.loaderClass,
                          result.__class__,
-                         pickle.dumps(self.config)))
-        p.currentaddr = currentaddr
-        p.currentstart = currentstart
-        p.keyboardCaught = keyboardCaught
+                         self.workerConfig()))
         old = signal.signal(signal.SIGILL, signalhandler)
         p.start()
         signal.signal(signal.SIGILL, old)
@@ -362,10 +1022,22 @@ class MultiProcessTestRunner(TextTestRunner):
         if wrapped is not None:
             self.stream = wrapped
 
-        testQueue = Queue()
+        if getattr(self.config, 'multiprocess_scheduler', 'queue') == 'steal':
+            # plain queues, read and written by the workers directly rather
+            # than through the manager process
+            queues = [WorkerQueue()
+                      for i in range(self.config.multiprocess_workers)]
+            for queue in queues:
+                # tasks left over when the run stops early must not keep
+                # the main process from exiting
+                queue.cancel_join_thread()
+            testQueue = TaskQueues(queues, idle=RawArray(
+                'b', self.config.multiprocess_workers))
+        else:
+            testQueue = TaskQueues([Queue()])
         resultQueue = Queue()
-        tasks = []
-        completed = []
+        tasks = TaskSet()
+        completed = 0
         workers = []
         to_teardown = []
         shouldStop = Event()
@@ -374,6 +1046,20 @@ class MultiProcessTestRunner(TextTestRunner):
         start = time.time()
 
         self.collect(test, testQueue, tasks, to_teardown, result)
+        durations = None
+        if getattr(self.config, 'multiprocess_durations', None):
+            durations = TaskDurations(self.config.multiprocess_durations)
+            testQueue.dispatch(durations.estimate)
+        else:
+            testQueue.dispatch()
+
+        if getattr(self.config, 'multiprocess_prefork', False):
+            # after collection, so that the template inherits the modules
+            # it imported
+            self.template = WorkerTemplate(
+                testQueue, resultQueue, shouldStop, self.loaderClass,
+                result.__class__, self.workerConfig(),
+                self.config.multiprocess_preload)
 
         log.debug("Starting %s workers", self.config.multiprocess_workers)
         for i in range(self.config.multiprocess_workers):
@@ -382,40 +1068,48 @@ class MultiProcessTestRunner(TextTestRunner):
             log.debug("Started worker process %s", i+1)
 
         total_tasks = len(tasks)
-        # need to keep track of the next time to check for timeouts in case
-        # more than one process times out at the same time.
-        nexttimeout=self.config.multiprocess_timeout
+        watchdog = Watchdog(workers, resultQueue,
+                            self.config.multiprocess_timeout,
+                            self.waitkilltime)
+        watchdog.start()
         thrownError = None
 
         try:
             while tasks:
-                log.debug("Waiting for results (%s/%s tasks), next timeout=%.3fs",
-                          len(completed), total_tasks,nexttimeout)
+                log.debug("Waiting for results (%s/%s tasks)",
+                          completed, total_tasks)
                 try:
-                    iworker, addr, newtask_addrs, batch_result = resultQueue.get(
-                                                            timeout=nexttimeout)
-                    log.debug('Results received for worker %d, %s, new tasks: %d',
-                              iworker,addr,len(newtask_addrs))
-                    try:
+                    (iworker, task_results, batch_result,
+                     retiring) = resultQueue.get(
+                                    timeout=self.config.multiprocess_timeout)
+                    for addr, newtask_addrs, elapsed in task_results:
+                        log.debug('Results received for worker %d, %s, '
+                                  'new tasks: %d',
+                                  iworker,addr,len(newtask_addrs))
+                        if durations is not None and elapsed is not None:
+                            durations.record(addr, elapsed)
                         try:
                             tasks.remove(addr)
                         except ValueError:
+                            if elapsed is None:
+                                # the batch holding it did arrive
+                                continue
                             log.warn('worker %s failed to remove from tasks: %s',
                                      iworker,addr)
+                        else:
+                            completed += 1
                         total_tasks += len(newtask_addrs)
                         tasks.extend(newtask_addrs)
-                    except KeyError:
-                        log.debug("Got result for unknown task? %s", addr)
-                        log.debug("current: %s",str(list(tasks)[0]))
-                    else:
-                        completed.append([addr,batch_result])
-                    self.consolidate(result, batch_result)
+                        if batch_result is None:
+                            self.killed(result, iworker, addr, elapsed)
+                    if batch_result is not None:
+                        self.consolidate(result, batch_result)
                     if (self.config.stopOnError
                         and not result.wasSuccessful()):
                         # set the stop condition
                         shouldStop.set()
                         break
-                    if self.config.multiprocess_restartworker:
+                    if retiring:
                         log.debug('joining worker %s',iworker)
                         # wait for working, but not that important if worker
                         # cannot be joined in fact, for workers that add to
@@ -430,53 +1124,19 @@ class MultiProcessTestRunner(TextTestRunner):
                               "(empty testQueue=%r): %s",
                               len(tasks),testQueue.empty(),str(tasks))
                     any_alive = False
-                    for iworker, w in enumerate(workers):
+                    for w in workers:
                         if w.is_alive():
-                            worker_addr = bytes_(w.currentaddr.value,'ascii')
-                            timeprocessing = time.time() - w.currentstart.value
-                            if ( len(worker_addr) == 0
-                                    and timeprocessing > self.config.multiprocess_timeout-0.1):
-                                log.debug('worker %d has finished its work item, '
-                                          'but is not exiting? do we wait for it?',
-                                          iworker)
-                            else:
-                                any_alive = True
-                            if (len(worker_addr) > 0
-                                and timeprocessing > self.config.multiprocess_timeout-0.1):
-                                log.debug('timed out worker %s: %s',
-                                          iworker,worker_addr)
-                                w.currentaddr.value = bytes_('')
-                                # If the process is in C++ code, sending a SIGILL
-                                # might not send a python KeybordInterrupt exception
-                                # therefore, send multiple signals until an
-                                # exception is caught. If this takes too long, then
-                                # terminate the process
-                                w.keyboardCaught.clear()
-                                startkilltime = time.time()
-                                while not w.keyboardCaught.is_set() and w.is_alive():
-                                    if time.time()-startkilltime > self.waitkilltime:
-                                        # have to terminate...
-                                        log.error("terminating worker %s",iworker)
-                                        w.terminate()
-                                        # there is a small probability that the
-                                        # terminated process might send a result,
-                                        # which has to be specially handled or
-                                        # else processes might get orphaned.
-                                        workers[iworker] = w = self.startProcess(iworker, testQueue, resultQueue, shouldStop, result)
-                                        break
-                                    os.kill(w.pid, signal.SIGILL)
-                                    time.sleep(0.1)
+                            any_alive = True
                     if not any_alive and testQueue.empty():
+                        # report what the workers left unfinished, if the
+                        # watchdog has not done so yet
+                        reaped = [ix for ix in range(len(workers))
+                                  if watchdog.reap(ix)]
+                        if reaped:
+                            continue
                         log.debug("All workers dead")
                         break
-                nexttimeout=self.config.multiprocess_timeout
-                for w in workers:
-                    if w.is_alive() and len(w.currentaddr.value) > 0:
-                        timeprocessing = time.time()-w.currentstart.value
-                        if timeprocessing <= self.config.multiprocess_timeout:
-                            nexttimeout = min(nexttimeout,
-                                self.config.multiprocess_timeout-timeprocessing)
-            log.debug("Completed %s tasks (%s remain)", len(completed), len(tasks))
+            log.debug("Completed %s tasks (%s remain)", completed, len(tasks))
 
         except (KeyboardInterrupt, SystemExit), e:
             log.info('parent received ctrl-c when waiting for test results')
@@ -485,6 +1145,9 @@ class MultiProcessTestRunner(TextTestRunner):
                 
             result.addError(test, sys.exc_info())
 
+        if durations is not None:
+            durations.save()
+
         try:
             for case in to_teardown:
                 log.debug("Tearing down shared fixtures for %s", case)
@@ -504,9 +1167,9 @@ class MultiProcessTestRunner(TextTestRunner):
 
             if thrownError is None:
                 log.debug("Tell all workers to stop")
-                for w in workers:
+                for iworker, w in enumerate(workers):
                     if w.is_alive():
-                        testQueue.put('STOP', block=False)
+                        testQueue.stop(iworker)
 
             # wait for the workers to end
             for iworker,worker in enumerate(workers):
@@ -515,17 +1178,46 @@ class MultiProcessTestRunner(TextTestRunner):
                     worker.join()
                     if worker.is_alive():
                         log.debug('failed to join worker %s',iworker)
+            watchdog.stop()
+            self.closeTemplate()
         except (KeyboardInterrupt, SystemExit):
             log.info('parent received ctrl-c when shutting down: stop all processes')
+            watchdog.stopped.set()
             for worker in workers:
                 if worker.is_alive():
                     worker.terminate()
+            self.closeTemplate()
 
             if thrownError: raise thrownError
             else: raise
 
         return result
 
+    def closeTemplate(self):
+        if self.template is not None:
+            log.debug("Stopping the worker template process")
+            self.template.close()
+            self.template = None
+
+    def killed(self, result, iworker, addr, elapsed):
+        """Fail the test at addr, which was running in worker iworker
+        when the worker was killed, or if elapsed is None, which had
+        finished but whose result the worker had not yet sent.
+        """
+        if elapsed is None:
+            msg = "%s (result lost when worker %s was killed)" % (
+                addr, iworker)
+        else:
+            msg = "%s (worker %s killed after %.1f seconds)" % (
+                addr, iworker, elapsed)
+            if faulthandler is not None:
+                msg += "; stack dumped to stderr"
+        case = failure.Failure(TimedOutException, msg)
+        result.startTest(case)
+        result.addError(case, (TimedOutException, TimedOutException(msg),
+                               None))
+        result.stopTest(case)
+
     def addtask(testQueue,tasks,case):
         arg = None
         if isinstance(case,nose.case.Test) and hasattr(case.test,'arg'):
@@ -533,10 +1225,9 @@ class MultiProcessTestRunner(TextTestRunner):
             # name to be returned
             case.test.descriptor = None
             arg = case.test.arg
-        test_addr = MultiProcessTestRunner.address(case)
-        testQueue.put((test_addr,arg), block=False)
-        if arg is not None:
-            test_addr += str(arg)
+        task = (MultiProcessTestRunner.address(case), arg)
+        testQueue.put(task, block=False)
+        test_addr = task_address(task)
         if tasks is not None:
             tasks.append(test_addr)
         return test_addr
@@ -624,7 +1315,8 @@ class MultiProcessTestRunner(TextTestRunner):
     def consolidate(self, result, batch_result):
         log.debug("batch result is %s" , batch_result)
         try:
-            output, testsRun, failures, errors, errorClasses = batch_result
+            (output, testsRun, failures, errors, errorClasses,
+             durations) = batch_result
         except ValueError:
             log.debug("result in unexpected format %s", batch_result)
             failure.Failure(*sys.exc_info())(result)
@@ -641,23 +1333,28 @@ class MultiProcessTestRunner(TextTestRunner):
                 result.errorClasses[key] = ([], label, isfail)
             mystorage, _junk, _junk = result.errorClasses[key]
             mystorage.extend(storage)
+        recorded = getattr(result, 'testDurations', None)
+        if durations is not None and recorded is not None:
+            recorded.update(*durations)
         log.debug("Ran %s tests (total: %s)", testsRun, result.testsRun)
 
 
-def runner(ix, testQueue, resultQueue, currentaddr, currentstart,
+def runner(ix, testQueue, resultQueue, currentaddr, currentstart, unsent,
            keyboardCaught, shouldStop, loaderClass, resultClass, config):
     try:
         try:
             return __runner(ix, testQueue, resultQueue, currentaddr, currentstart,
-                    keyboardCaught, shouldStop, loaderClass, resultClass, config)
+                    unsent, keyboardCaught, shouldStop, loaderClass,
+                    resultClass, config)
         except KeyboardInterrupt:
             log.debug('Worker %s keyboard interrupt, stopping',ix)
     except Empty:
         log.debug("Worker %s timed out waiting for tasks", ix)
 
-def __runner(ix, testQueue, resultQueue, currentaddr, currentstart,
-           keyboardCaught, shouldStop, loaderClass, resultClass, config):
-
+def configureWorker(config):
+    """Unpickle the config sent to worker processes, and configure its
+    plugins.
+    """
     config = pickle.loads(config)
     dummy_parser = config.parserClass()
     if _instantiate_plugins is not None:
@@ -666,10 +1363,26 @@ def __runner(ix, testQueue, resultQueue, currentaddr, currentstart,
             plugin.addOptions(dummy_parser,{})
             config.plugins.addPlugin(plugin)
     config.plugins.configure(config.options,config)
+    return config
+
+def __runner(ix, testQueue, resultQueue, currentaddr, currentstart, unsent,
+           keyboardCaught, shouldStop, loaderClass, resultClass, config):
+
+    if not isinstance(config, Config):
+        config = configureWorker(config)
     config.plugins.begin()
     log.debug("Worker %s executing, pid=%d", ix,os.getpid())
+    if faulthandler is not None:
+        # show where a test was stuck if the watchdog has to kill us
+        faulthandler.register(signal.SIGTERM, chain=True)
 
     def get():
+        if results.tasks:
+            # send finished results before waiting for more work
+            try:
+                return testQueue.get(False)
+            except Empty:
+                results.flush()
         return testQueue.get(timeout=config.multiprocess_timeout)
 
     def makeResult():
@@ -689,19 +1402,49 @@ def __runner(ix, testQueue, resultQueue, currentaddr, currentstart,
         for key, (storage, label, isfail) in result.errorClasses.items():
             errorClasses[key] = ([(TestLet(c), err) for c, err in storage],
                                  label, isfail)
+        durations = getattr(result, 'testDurations', None)
+        if durations is not None:
+            durations = (durations.tests, durations.contexts)
         return (
             result.stream.getvalue(),
             result.testsRun,
             failures,
             errors,
-            errorClasses)
+            errorClasses,
+            durations)
+
+    results = ResultBatch(ix, resultQueue, makeResult, batch,
+                          getattr(config, 'multiprocess_result_batch', 1),
+                          getattr(config, 'multiprocess_result_interval', 0),
+                          unsent)
+
+    def makeLoader():
+        loader = loaderClass(config=config)
+        loader.suiteClass.suiteClass = NoSharedFixtureContextSuite
+        loader.importer = ModuleCache(loader.importer)
+        return loader
+
+    # One loader serves all of the tasks that this worker runs, so that
+    # modules already imported for an earlier task are not resolved and
+    # imported again. Fixture state must not leak from one task to the
+    # next, so the suite factory is reset before each task. Loaders whose
+    # suite factory can't be reset are rebuilt for each task instead.
+    loader = makeLoader()
+    max_tasks = getattr(config, 'multiprocess_max_tasks', 0)
+    max_mb = getattr(config, 'multiprocess_max_rss', 0)
+    ntasks = 0
+    retiring = False
     for test_addr, arg in iter(get, 'STOP'):
         if shouldStop.is_set():
             log.exception('Worker %d STOPPED',ix)
             break
-        result = makeResult()
-        loader = loaderClass(config=config)
-        loader.suiteClass.suiteClass = NoSharedFixtureContextSuite
+        start = time.time()
+        result = results.getResult()
+        if hasattr(loader.suiteClass, 'reset'):
+            loader.suiteClass.reset()
+            loader._visitedPaths = set()
+        else:
+            loader = makeLoader()
         test = loader.loadTestsFromNames([test_addr])
         test.testQueue = testQueue
         test.tasks = []
@@ -714,7 +1457,7 @@ def __runner(ix, testQueue, resultQueue, currentaddr, currentstart,
             currentstart.value = time.time()
             test(result)
             currentaddr.value = bytes_('')
-            resultQueue.put((ix, test_addr, test.tasks, batch(result)))
+            results.add(test_addr, test.tasks, time.time() - start)
         except KeyboardInterrupt, e: #TimedOutException:
             timeout = isinstance(e, TimedOutException)
             if timeout:
@@ -727,31 +1470,153 @@ def __runner(ix, testQueue, resultQueue, currentaddr, currentstart,
                 log.exception(msg,ix,test_addr)
                 currentaddr.value = bytes_('')
                 failure.Failure(*sys.exc_info())(result)
-                resultQueue.put((ix, test_addr, test.tasks, batch(result)))
+                results.add(test_addr, test.tasks, time.time() - start)
             else:
                 if timeout:
                     msg = 'Worker %s test %s timed out'
                 else:
                     msg = 'Worker %s test %s keyboard interrupt'
                 log.debug(msg,ix,test_addr)
-                resultQueue.put((ix, test_addr, test.tasks, batch(result)))
+                results.add(test_addr, test.tasks, time.time() - start)
+            results.flush()
             if not timeout:
                 raise
         except SystemExit:
             currentaddr.value = bytes_('')
             log.exception('Worker %s system exit',ix)
+            results.flush()
             raise
         except:
             currentaddr.value = bytes_('')
             log.exception("Worker %s error running test or returning "
                             "results",ix)
+            # if sending results failed, the batch they were in is gone
+            result = results.getResult()
             failure.Failure(*sys.exc_info())(result)
-            resultQueue.put((ix, test_addr, test.tasks, batch(result)))
+            results.add(test_addr, test.tasks, time.time() - start)
+        ntasks += 1
         if config.multiprocess_restartworker:
+            retiring = True
+        elif max_tasks and ntasks >= max_tasks:
+            log.debug("Worker %s has run %s tasks, retiring", ix, ntasks)
+            retiring = True
+        elif max_mb and max_rss() >= max_mb:
+            log.debug("Worker %s has used %.1fMB, retiring", ix, max_rss())
+            retiring = True
+        if retiring:
             break
+    results.flush(retiring)
     log.debug("Worker %s ending", ix)
 
 
+class WorkerTemplate(object):
+    """Main process side of the worker template process, which sets up
+    the plugins of the workers and imports the preload modules once, and
+    then forks each worker process that the main process asks for.
+    """
+    def __init__(self, testQueue, resultQueue, shouldStop, loaderClass,
+                 resultClass, config, preload):
+        self.conn, conn = Pipe()
+        # the queues can only be handed to a process as it starts
+        self.process = Process(target=template,
+                               args=(conn, testQueue, resultQueue,
+                                     shouldStop, loaderClass, resultClass,
+                                     config, preload))
+        # the workers get ctrl+c, but the template carries on until the
+        # main process tells it to stop
+        old = signal.signal(signal.SIGINT, signal.SIG_IGN)
+        self.process.start()
+        signal.signal(signal.SIGINT, old)
+        conn.close()
+
+    def fork(self, ix, currentaddr, currentstart, unsent, keyboardCaught):
+        """Have the template fork worker ix, and return a handle on it.
+        """
+        self.conn.send((ix, currentaddr, currentstart, unsent,
+                        keyboardCaught))
+        return ForkedWorker(self.conn.recv())
+
+    def close(self):
+        try:
+            self.conn.send(None)
+        except (IOError, EOFError):
+            pass
+        self.conn.close()
+        self.process.join()
+
+
+class ForkedWorker(object):
+    """Handle on a worker process forked by the template process. Only the
+    template can wait for the worker, so the main process checks on it by
+    process id, and the template reaps it when it exits.
+    """
+    def __init__(self, pid):
+        self.pid = pid
+
+    def is_alive(self):
+        try:
+            os.kill(self.pid, 0)
+        except OSError, e:
+            return e.errno == errno.EPERM
+        return True
+
+    def join(self, timeout=None):
+        if timeout is not None:
+            timeout += time.time()
+        while self.is_alive():
+            if timeout is not None and time.time() >= timeout:
+                return
+            time.sleep(0.05)
+
+    def terminate(self):
+        try:
+            os.kill(self.pid, signal.SIGTERM)
+        except OSError:
+            pass
+
+
+def template(conn, testQueue, resultQueue, shouldStop, loaderClass,
+             resultClass, config, preload):
+    from multiprocessing import active_children
+    config = configureWorker(config)
+    for name in preload:
+        if name in sys.modules:
+            continue
+        log.debug("Preloading %s", name)
+        try:
+            __import__(name)
+        except (KeyboardInterrupt, SystemExit):
+            raise
+        except:
+            log.warn("Unable to preload %s; workers will import it "
+                     "themselves", name, exc_info=True)
+    log.debug("Worker template ready, pid=%d", os.getpid())
+    while True:
+        # reap the workers that have exited
+        active_children()
+        try:
+            if not conn.poll(0.1):
+                continue
+            request = conn.recv()
+        except (IOError, EOFError):
+            break
+        if request is None:
+            break
+        ix, currentaddr, currentstart, unsent, keyboardCaught = request
+        p = Process(target=runner,
+                    args=(ix, testQueue.forWorker(ix), resultQueue,
+                          currentaddr, currentstart, unsent, keyboardCaught,
+                          shouldStop, loaderClass, resultClass, config))
+        old = signal.signal(signal.SIGILL, signalhandler)
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+        p.start()
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGILL, old)
+        log.debug("Template forked worker %s, pid=%d", ix, p.pid)
+        conn.send(p.pid)
+    conn.close()
+
+
 class NoSharedFixtureContextSuite(ContextSuite):
     """
     Context suite that never fires shared fixtures.
@@ -833,3 +1698,4 @@ class NoSharedFixtureContextSuite(ContextSuite):
             except:
                 self.error_context = 'teardown'
                 result.addError(self, self._exc_info())
+            self.reportDurations(result)
@@ -1,35 +1,98 @@
-"""This plugin will run tests using the hotshot profiler, which is part
+"""This plugin will run tests using the cProfile profiler, which is part
 of the standard library. To turn it on, use the ``--with-profile`` option
 or set the NOSE_WITH_PROFILE environment variable. Profiler output can be
 controlled with the ``--profile-sort`` and ``--profile-restrict`` options,
 and the profiler output file may be changed with ``--profile-stats-file``.
 
-See the `hotshot documentation`_ in the standard library documentation for
-more details on the various output options.
+By default the whole test run is profiled as one. To see where each test
+or test module spends its time, pass ``--profile-per=test`` or
+``--profile-per=module`` along with ``--profile-dir=DIR``, and one stats
+file is written to DIR for each test or module, named after the test or
+module, with ``.prof`` added. The report printed at the end of the run,
+and the file named by ``--profile-stats-file``, hold the stats of all of
+them merged together. Per module profiles include the time taken by the
+module's fixtures; per test profiles do not.
 
-.. _hotshot documentation: http://docs.python.org/library/hotshot.html
+The plugin also works with the multiprocess plugin. Each worker process
+profiles the tests it runs, by test with ``--profile-per=test`` and
+otherwise by module, and the main process merges the stats of all of the
+workers into the report and the stats file. The main process itself is
+not profiled, so shared fixtures that it runs are left out. Stats files
+written to ``--profile-dir`` by workers have the worker's process id added
+to their names, since several workers may run tests from the same module.
+
+Stats files can be loaded with the `pstats module`_, or with any of the
+many tools that read its format.
+
+Sampling
+--------
+
+Deterministic profiling slows tests down, often by several times, and not
+evenly, so it can change which tests look slow. With ``--profile-sample``
+the plugin instead interrupts the tests at regular intervals of CPU time,
+every ``--profile-sample-interval`` milliseconds (5 by default), and
+records the stack that was running, which costs much less. Time spent
+waiting, such as sleeping or blocked on I/O, uses no CPU time and is not
+sampled. Sampling needs ``signal.setitimer``, so it is not available on
+Windows.
+
+Each stack is recorded under the address of the test that was running,
+as the outermost frame of the stack. The report lists the tests that
+were sampled most often, and the functions that were most often running
+when a sample was taken. ``--profile-collapsed=FILE`` writes every stack
+to FILE in the collapsed format read by flame graph tools such as
+`FlameGraph`_::
+
+    flamegraph.pl stacks.txt > stacks.svg
+
+Sampling works with the multiprocess plugin in the same way as
+deterministic profiling. ``--profile-per``, ``--profile-dir``,
+``--profile-sort``, ``--profile-restrict`` and ``--profile-stats-file``
+do not apply to sampling.
+
+.. _pstats module: http://docs.python.org/library/profile.html
+.. _FlameGraph: https://github.com/brendangregg/FlameGraph
 """
 
 try:
-    import hotshot
-    from hotshot import stats
+    import cProfile
+    import pstats
 except ImportError:
-    hotshot, stats = None, None
+    cProfile, pstats = None, None
 import logging
 import os
+import re
+import shutil
+import signal
 import sys
 import tempfile
+from inspect import ismodule
+from warnings import warn
 from nose.plugins.base import Plugin
 from nose.util import tolist
 
 log = logging.getLogger('nose.plugins')
 
+# characters not allowed in the names of per test and module stats files
+UNSAFE_NAME = re.compile(r'[^\w.-]+')
+# rows of each table in the sampling report
+SAMPLE_ROWS = 20
+
+
 class Profile(Plugin):
     """
-    Use this plugin to run tests using the hotshot profiler. 
+    Use this plugin to run tests using the cProfile profiler.
     """
     pfile = None
     clean_stats_file = False
+    per = 'run'
+    profileDir = None
+    spool = None
+    prof = None
+    stats = None
+    unitProf = None
+    sampler = None
+
     def options(self, parser, env):
         """Register commandline options.
         """
@@ -52,9 +115,45 @@ class Profile(Plugin):
                           default=env.get('NOSE_PROFILE_RESTRICT'),
                           help="Restrict profiler output. See help for "
                           "pstats.Stats for details")
+        parser.add_option('--profile-per', action='store',
+                          dest='profile_per', type='choice',
+                          choices=['run', 'module', 'test'],
+                          default=env.get('NOSE_PROFILE_PER', 'run'),
+                          metavar="UNIT",
+                          help="Profile each test or each test module "
+                          "separately (test, module), or the whole run "
+                          "at once (run). The default is run. "
+                          "[NOSE_PROFILE_PER]")
+        parser.add_option('--profile-dir', action='store',
+                          dest='profile_dir',
+                          metavar="DIR",
+                          default=env.get('NOSE_PROFILE_DIR'),
+                          help="Write the stats of each test or module "
+                          "profiled with --profile-per to a file in this "
+                          "directory. [NOSE_PROFILE_DIR]")
+        parser.add_option('--profile-sample', action='store_true',
+                          dest='profile_sample',
+                          default=bool(env.get('NOSE_PROFILE_SAMPLE')),
+                          help="Profile by sampling the running stack at "
+                          "intervals, instead of recording every call. "
+                          "[NOSE_PROFILE_SAMPLE]")
+        parser.add_option('--profile-sample-interval', action='store',
+                          dest='profile_sample_interval', type='float',
+                          default=env.get('NOSE_PROFILE_SAMPLE_INTERVAL', 5),
+                          metavar="MS",
+                          help="Take a sample every MS milliseconds of CPU "
+                          "time. The default is 5. "
+                          "[NOSE_PROFILE_SAMPLE_INTERVAL]")
+        parser.add_option('--profile-collapsed', action='store',
+                          dest='profile_collapsed',
+                          metavar="FILE",
+                          default=env.get('NOSE_PROFILE_COLLAPSED'),
+                          help="Write the sampled stacks to this file, in "
+                          "the collapsed format read by flame graph tools. "
+                          "[NOSE_PROFILE_COLLAPSED]")
 
     def available(cls):
-        return hotshot is not None
+        return cProfile is not None
     available = classmethod(available)
 
     def begin(self):
@@ -62,8 +161,23 @@ class Profile(Plugin):
         """
         if not self.available():
             return
+        self.stats = None
+        self.saved = {}
+        if self.isWorker():
+            if self.sampler is not None:
+                self.sampler.start()
+            return
         self._create_pfile()
-        self.prof = hotshot.Profile(self.pfile)
+        if getattr(getattr(self, 'conf', None), 'multiprocess_workers', 0):
+            # the tests run in the workers, which write the files they
+            # profile to this directory, and list them in a file of their
+            # own, for report() to merge
+            self.spool = tempfile.mkdtemp(prefix='nose-profile-')
+            self.conf.profileSpool = self.spool
+        elif self.sampler is not None:
+            self.sampler.start()
+        elif self.per == 'run':
+            self.prof = cProfile.Profile()
 
     def configure(self, options, conf):
         """Configure plugin.
@@ -82,11 +196,46 @@ class Profile(Plugin):
         self.fileno = None
         self.sort = options.profile_sort
         self.restrict = tolist(options.profile_restrict)
+        self.per = getattr(options, 'profile_per', None) or 'run'
+        self.profileDir = getattr(options, 'profile_dir', None)
+        if self.profileDir:
+            self.profileDir = os.path.join(
+                conf.workingDir, os.path.expanduser(self.profileDir))
+            if not os.path.isdir(self.profileDir):
+                os.makedirs(self.profileDir)
+        self.sampler = None
+        self.collapsedFile = None
+        if getattr(options, 'profile_sample', False):
+            if not hasattr(signal, 'setitimer'):
+                warn("Sampling profiler is not available on this platform; "
+                     "using the deterministic profiler", RuntimeWarning)
+            else:
+                self.sampler = Sampler(
+                    float(options.profile_sample_interval) / 1000.0)
+                self.collapsedFile = options.profile_collapsed
+                if self.collapsedFile:
+                    self.collapsedFile = os.path.join(
+                        conf.workingDir,
+                        os.path.expanduser(self.collapsedFile))
+
+    def isWorker(self):
+        return bool(getattr(getattr(self, 'conf', None), 'worker', False))
+
+    def unit(self):
+        """Return what each profile covers: the whole run, a module or a
+        test. Workers never see the whole run, so they profile modules
+        instead. When sampling, nothing is profiled by cProfile.
+        """
+        if self.sampler is not None:
+            return None
+        if self.per == 'run' and self.isWorker():
+            return 'module'
+        return self.per
 
     def prepareTest(self, test):
         """Wrap entire test run in :func:`prof.runcall`.
         """
-        if not self.available():
+        if not self.available() or self.prof is None:
             return
         log.debug('preparing test %s' % test)
         def run_and_profile(result, prof=self.prof, test=test):
@@ -94,12 +243,136 @@ class Profile(Plugin):
             prof.runcall(test, result)
         return run_and_profile
 
+    def startContext(self, context):
+        if self.unit() == 'module' and self._isModule(context):
+            self._start()
+
+    def stopContext(self, context):
+        if self.unit() == 'module' and self._isModule(context):
+            self._stop(context.__name__)
+        elif self.sampler is not None:
+            self._flushSamples()
+
+    def beforeTest(self, test):
+        if self.unit() == 'test':
+            self._start()
+        elif self.sampler is not None:
+            self.sampler.current = test_label(test)
+
+    def afterTest(self, test):
+        if self.unit() == 'test':
+            self._stop(test.id())
+        elif self.sampler is not None:
+            self.sampler.current = None
+            self._flushSamples()
+
+    def _flushSamples(self):
+        # workers hand their samples to the main process as they go, since
+        # they are not told when they are about to exit
+        if self.isWorker() and getattr(self.conf, 'profileSpool', None):
+            self.sampler.flush(os.path.join(
+                self.conf.profileSpool, '%s.collapsed' % os.getpid()))
+
+    def _isModule(self, context):
+        # packages are not profiled on their own, since their modules are
+        return ismodule(context) and not hasattr(context, '__path__')
+
+    def _start(self):
+        self.unitProf = cProfile.Profile()
+        self.unitProf.enable()
+
+    def _stop(self, name):
+        prof = self.unitProf
+        if prof is None:
+            return
+        prof.disable()
+        self.unitProf = None
+        filename = None
+        if self.profileDir:
+            filename = self._unitFile(self.profileDir, name)
+        elif self.isWorker() and getattr(self.conf, 'profileSpool', None):
+            filename = self._unitFile(self.conf.profileSpool, 'unit')
+        if filename:
+            prof.dump_stats(filename)
+        if not self.isWorker():
+            self._addStats(prof)
+        elif filename and getattr(self.conf, 'profileSpool', None):
+            manifest = open(os.path.join(self.conf.profileSpool,
+                                         '%s.list' % os.getpid()), 'a')
+            try:
+                manifest.write(filename + '\n')
+            finally:
+                manifest.close()
+
+    def _unitFile(self, directory, name):
+        name = UNSAFE_NAME.sub('_', name)[:200]
+        if self.isWorker():
+            name = '%s.%s' % (name, os.getpid())
+        count = self.saved.get(name, 0) + 1
+        self.saved[name] = count
+        if count > 1:
+            name = '%s.%s' % (name, count)
+        return os.path.join(directory, name + '.prof')
+
+    def _mergeWorkers(self):
+        """Add the stats of the files listed by worker processes to the
+        merged stats, and remove the worker spool directory.
+        """
+        for listing in os.listdir(self.spool):
+            if not listing.endswith('.list'):
+                continue
+            fh = open(os.path.join(self.spool, listing))
+            try:
+                filenames = [line.strip() for line in fh if line.strip()]
+            finally:
+                fh.close()
+            for filename in filenames:
+                try:
+                    self._addStats(filename)
+                except (KeyboardInterrupt, SystemExit):
+                    raise
+                except:
+                    log.warn("Unable to read profile stats from %s",
+                             filename, exc_info=True)
+        shutil.rmtree(self.spool, ignore_errors=True)
+        self.spool = None
+
+    def _addStats(self, source):
+        """Merge the stats of source, a profiler or a stats file name, into
+        the stats for the whole run.
+        """
+        if self.stats is None:
+            self.stats = pstats.Stats(source)
+        else:
+            self.stats.add(source)
+
     def report(self, stream):
         """Output profiler report.
         """
         log.debug('printing profiler report')
-        self.prof.close()
-        prof_stats = stats.load(self.pfile)
+        if self.sampler is not None:
+            self.sampler.stop()
+            if self.spool:
+                for name in os.listdir(self.spool):
+                    if name.endswith('.collapsed'):
+                        self.sampler.load(os.path.join(self.spool, name))
+                shutil.rmtree(self.spool, ignore_errors=True)
+                self.spool = None
+            if self.collapsedFile:
+                self.sampler.write(self.collapsedFile)
+            self.sampler.report(stream)
+            return
+        if self.prof is not None:
+            self.prof.disable()
+            self._addStats(self.prof)
+            self.prof = None
+        if self.spool:
+            self._mergeWorkers()
+        if self.stats is None or not self.stats.stats:
+            stream.writeln("No profiler stats recorded")
+            return
+        self.stats.dump_stats(self.pfile)
+        prof_stats = self.stats
         prof_stats.sort_stats(self.sort)
 
         # 2.5 has completely different stream handling from 2.4 and earlier.
@@ -129,13 +402,16 @@ class Profile(Plugin):
         """
         if not self.available():
             return
+        if self.sampler is not None:
+            self.sampler.stop()
         try:
-            self.prof.close()
+            self.prof.disable()
         except AttributeError:
-            # TODO: is this trying to catch just the case where not
-            # hasattr(self.prof, "close")?  If so, the function call should be
-            # moved out of the try: suite.
+            # no profiler was started
             pass
+        if self.spool:
+            shutil.rmtree(self.spool, ignore_errors=True)
+            self.spool = None
         if self.clean_stats_file:
             if self.fileno:
                 try:
@@ -152,3 +428,138 @@ class Profile(Plugin):
         if not self.pfile:
             self.fileno, self.pfile = tempfile.mkstemp()
             self.clean_stats_file = True
+
+
+def test_label(test):
+    """Return the label of test in sampled stacks: its address, as
+    module:callable, or its id if it has no address.
+    """
+    try:
+        filename, module, call = test.address()
+    except (AttributeError, TypeError, ValueError):
+        return test.id()
+    if call:
+        return '%s:%s' % (module or filename, call)
+    return module or filename or test.id()
+
+
+class Sampler(object):
+    """Statistical profiler that records the stack running in the main
+    thread every interval seconds of CPU time.
+
+    Stacks are counted by the label of the test that was running
+    (``current``) and the code objects of the stack, outermost first.
+    """
+    def __init__(self, interval):
+        self.interval = interval
+        self.current = None
+        self.counts = {}
+        self.loaded = {}
+        self.running = False
+        self._handler = None
+
+    def start(self):
+        try:
+            self._handler = signal.signal(signal.SIGPROF, self.sample)
+        except ValueError:
+            # signal handlers can only be set in the main thread
+            log.warn("Unable to sample stacks outside of the main thread")
+            return
+        # don't fail system calls that are interrupted by a sample
+        signal.siginterrupt(signal.SIGPROF, False)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        self.running = True
+
+    def stop(self):
+        if not self.running:
+            return
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        signal.signal(signal.SIGPROF, self._handler or signal.SIG_DFL)
+        self.running = False
+
+    def sample(self, signum, frame):
+        codes = []
+        while frame is not None:
+            codes.append(frame.f_code)
+            frame = frame.f_back
+        codes.append(self.current)
+        codes.reverse()
+        key = tuple(codes)
+        self.counts[key] = self.counts.get(key, 0) + 1
+
+    def collapsed(self, counts=None):
+        """Return a dict of {collapsed stack: count} for counts, or for all
+        samples, including those loaded from files.
+        """
+        if counts is None:
+            stacks = self.loaded.copy()
+            counts = self.counts
+        else:
+            stacks = {}
+        for codes, count in counts.items():
+            frames = [(codes[0] or '<no test>').replace(';', ':')]
+            for code in codes[1:]:
+                frames.append('%s (%s:%s)' % (
+                    code.co_name, code.co_filename, code.co_firstlineno))
+            stack = ';'.join(frames)
+            stacks[stack] = stacks.get(stack, 0) + count
+        return stacks
+
+    def write(self, filename, stacks=None, mode='w'):
+        """Write stacks, or all samples, to filename in collapsed stack
+        format.
+        """
+        if stacks is None:
+            stacks = self.collapsed()
+        fh = open(filename, mode)
+        try:
+            for stack, count in stacks.items():
+                fh.write('%s %s\n' % (stack, count))
+        finally:
+            fh.close()
+
+    def flush(self, filename):
+        """Append the samples taken since the last flush to filename, and
+        forget them.
+        """
+        if not self.counts:
+            return
+        counts, self.counts = self.counts, {}
+        self.write(filename, self.collapsed(counts), 'a')
+
+    def load(self, filename):
+        """Add the samples in filename, a collapsed stack file, to the
+        samples for the run.
+        """
+        fh = open(filename)
+        try:
+            for line in fh:
+                stack, count = line.rstrip('\n').rsplit(' ', 1)
+                self.loaded[stack] = self.loaded.get(stack, 0) + int(count)
+        finally:
+            fh.close()
+
+    def report(self, stream):
+        """Print the tests and functions that were sampled most often.
+        """
+        stacks = self.collapsed()
+        total = sum(stacks.values())
+        stream.writeln("Sampled %d stacks every %.1fms of CPU time" % (
+            total, self.interval * 1000))
+        if not total:
+            return
+        tests = {}
+        functions = {}
+        for stack, count in stacks.items():
+            frames = stack.split(';')
+            tests[frames[0]] = tests.get(frames[0], 0) + count
+            # the innermost frame is the function that was running
+            functions[frames[-1]] = functions.get(frames[-1], 0) + count
+        for title, counts in (('Test', tests), ('Function', functions)):
+            stream.writeln()
+            stream.writeln("%8s %8s  %s" % ('Samples', 'Percent', title))
+            rows = [(-n, name) for name, n in counts.items()]
+            rows.sort()
+            for n, name in rows[:SAMPLE_ROWS]:
+                stream.writeln("%8d %7.1f%%  %s" % (
+                    -n, -n * 100.0 / total, name))
@@ -0,0 +1,235 @@
+"""
+This plugin splits a test run into shards that can be run on separate
+machines, with each machine running a stable subset of the test files.
+Run every shard of a run with the same ``--shard-count``, and a different
+``--shard-index`` from 0 to one less than the count::
+
+    nosetests --shard-count=4 --shard-index=0
+    nosetests --shard-count=4 --shard-index=1
+    ...
+
+Shards are made up of whole test files, so module and package fixtures
+run only in the shards that need them. Every file found by test discovery
+is assigned to exactly one shard, and the assignment depends only on the
+file's path relative to the working directory, so that it is the same on
+every machine and from one run to the next.
+
+By default files are assigned to shards by a hash of their path. That
+gives each shard about the same number of files, but not necessarily the
+same amount of work. To balance shards by time instead, have each shard
+save how long its test files took with ``--shard-save-timings=FILE``, and
+pass all of the saved files to the next run with ``--shard-timings``::
+
+    nosetests --shard-count=2 --shard-index=0 \\
+        --shard-timings=shard0.times,shard1.times \\
+        --shard-save-timings=shard0.times
+
+Files with recorded times are divided among the shards longest first, each
+going to the shard with the least total time so far. Files without a
+recorded time are assigned by hash. Every shard must be given the same
+timings files, or shards may overlap or miss files.
+
+To combine the results of the shards, have each one write its own xunit
+report, for instance with ``--xunit-file=shard0.xml``, and hand all of the
+reports to your CI system.
+
+Only test files found by discovery are sharded; tests named on the command
+line always run. Timings are not recorded for tests run by worker
+processes of the multiprocess plugin.
+"""
+import logging
+import os
+import time
+from inspect import ismodule
+from nose.plugins.base import Plugin
+from nose.pyversion import bytes_
+from nose.util import src, tolist
+
+try:
+    from cPickle import dump, load
+except ImportError:
+    from pickle import dump, load
+
+try:
+    from hashlib import md5
+except ImportError:
+    from md5 import new as md5
+
+log = logging.getLogger(__name__)
+
+
+class Shard(Plugin):
+    """
+    Run only the test files assigned to one shard of a sharded test run.
+    """
+    name = 'shard'
+    # decide which files are wanted before any other plugin
+    score = 3000
+
+    def options(self, parser, env):
+        """Register commandline options.
+        """
+        parser.add_option('--shard-count', action='store', type='int',
+                          dest='shardCount',
+                          default=int(env.get('NOSE_SHARD_COUNT', 0)),
+                          metavar='NUM',
+                          help="Split the test run into this many shards, "
+                          "and run only the tests in the shard chosen by "
+                          "--shard-index. [NOSE_SHARD_COUNT]")
+        parser.add_option('--shard-index', action='store', type='int',
+                          dest='shardIndex',
+                          default=int(env.get('NOSE_SHARD_INDEX', 0)),
+                          metavar='NUM',
+                          help="Run the shard with this index, from 0 to "
+                          "one less than --shard-count. Default is 0. "
+                          "[NOSE_SHARD_INDEX]")
+        parser.add_option('--shard-timings', action='append',
+                          dest='shardTimings',
+                          default=tolist(env.get('NOSE_SHARD_TIMINGS')),
+                          metavar='FILES',
+                          help="Balance shards using the test file times "
+                          "recorded in these files (a comma-separated "
+                          "list; the option may be given more than "
+                          "once). [NOSE_SHARD_TIMINGS]")
+        parser.add_option('--shard-save-timings', action='store',
+                          dest='shardSaveTimings',
+                          default=env.get('NOSE_SHARD_SAVE_TIMINGS'),
+                          metavar='FILE',
+                          help="Record how long each test file in this "
+                          "shard takes in this file. "
+                          "[NOSE_SHARD_SAVE_TIMINGS]")
+
+    def configure(self, options, conf):
+        """Configure plugin.
+        """
+        self.conf = conf
+        self.count = getattr(options, 'shardCount', 0) or 0
+        self.index = getattr(options, 'shardIndex', 0) or 0
+        if self.count < 2:
+            self.enabled = False
+            return
+        if not 0 <= self.index < self.count:
+            raise ValueError("--shard-index must be from 0 to %s, not %s"
+                             % (self.count - 1, self.index))
+        self.enabled = True
+        timings = {}
+        for names in getattr(options, 'shardTimings', None) or ():
+            for filename in tolist(names):
+                timings.update(self.loadTimings(self.abspath(filename)))
+        self.assigned = assign(timings, self.count)
+        self.saveFile = getattr(options, 'shardSaveTimings', None)
+        if self.saveFile:
+            self.saveFile = self.abspath(self.saveFile)
+        self.timings = {}
+        self._started = {}
+        # runs with different shards must not share a discovery cache
+        self.discoveryKey = (self.count, self.index,
+                             _hash(repr(sorted(self.assigned.items()))))
+        log.debug("Running shard %s of %s (%s files balanced by time)",
+                  self.index, self.count, len(self.assigned))
+
+    def abspath(self, filename):
+        filename = os.path.expanduser(filename)
+        if not os.path.isabs(filename):
+            filename = os.path.join(self.conf.workingDir, filename)
+        return filename
+
+    def key(self, path):
+        """Return the key identifying the file at path in every shard: its
+        path relative to the working directory, with / separators.
+        """
+        path = os.path.abspath(path)
+        prefix = os.path.join(self.conf.workingDir, '')
+        if path.startswith(prefix):
+            path = path[len(prefix):]
+        return path.replace(os.sep, '/')
+
+    def shardFor(self, key):
+        """Return the index of the shard that runs the file with key.
+        """
+        try:
+            return self.assigned[key]
+        except KeyError:
+            return int(_hash(key), 16) % self.count
+
+    def wantFile(self, file):
+        """Reject files that belong to other shards.
+        """
+        if self.shardFor(self.key(file)) != self.index:
+            log.debug("%s is in another shard", file)
+            return False
+        return None
+
+    def startContext(self, context):
+        if self.saveFile and self._isTestFile(context):
+            self._started[context] = time.time()
+
+    def stopContext(self, context):
+        start = self._started.pop(context, None)
+        if start is not None:
+            key = self.key(src(context.__file__))
+            self.timings[key] = self.timings.get(key, 0.0) + (
+                time.time() - start)
+
+    def _isTestFile(self, context):
+        if not ismodule(context) or not getattr(context, '__file__', None):
+            return False
+        return os.path.basename(src(context.__file__)) != '__init__.py'
+
+    def finalize(self, result):
+        """Save test file times, if requested.
+        """
+        if self.saveFile:
+            self.saveTimings(self.saveFile)
+
+    def loadTimings(self, filename):
+        try:
+            fh = open(filename, 'rb')
+        except IOError:
+            log.debug("No shard timings in %s", filename)
+            return {}
+        try:
+            try:
+                return load(fh)
+            except (KeyboardInterrupt, SystemExit):
+                raise
+            except:
+                log.warn("Unable to read shard timings from %s", filename,
+                         exc_info=True)
+                return {}
+        finally:
+            fh.close()
+
+    def saveTimings(self, filename):
+        try:
+            fh = open(filename, 'wb')
+        except IOError, e:
+            log.warn("Unable to save shard timings to %s: %s", filename, e)
+            return
+        try:
+            dump(self.timings, fh)
+        finally:
+            fh.close()
+        log.debug("Saved times of %s files to %s", len(self.timings),
+                  filename)
+
+
+def _hash(value):
+    return md5(bytes_(value)).hexdigest()
+
+
+def assign(timings, count):
+    """Divide the files in timings, a dict of {key: seconds}, among count
+    shards, longest first, each to the shard with the least time so far.
+    Returns a dict of {key: shard index}.
+
+    >>> sorted(assign({'a': 5, 'b': 3, 'c': 3, 'd': 1}, 2).items())
+    [('a', 0), ('b', 1), ('c', 1), ('d', 0)]
+    """
+    loads = [0.0] * count
+    assigned = {}
+    for seconds, key in sorted([(-t, k) for k, t in timings.items()]):
+        index = loads.index(min(loads))
+        assigned[key] = index
+        loads[index] -= seconds
+    return assigned
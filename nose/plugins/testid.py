@@ -90,19 +90,73 @@ Second::
   you have failing tests. Otherwise, your first run using ``--failed`` will
   (perhaps surprisingly) run *all* tests, because there won't be an id file
   containing the record of failed tests from your previous run.
-  
+
+Running failures and new tests first
+------------------------------------
+
+To run the whole suite, but see the tests that failed last time first, use
+the ``--failed-first`` switch. The tests that failed in the last run are
+run before all of the others, so a regression that is still there shows
+up in the first few seconds of a long run::
+
+ % nosetests -v --failed-first
+ #3 test.test_c ... FAILED
+ #1 test.test_a ... ok
+ #2 test.test_b ... ok
+ #4 test.test_d ... ok
+
+Similarly, ``--new-first`` runs the tests that are not in the ids file, such
+as tests added since the last run, before the tests that are. Finding the
+new tests means loading the tests twice, though test modules are only
+imported once. The two switches may be used together, in which case the
+failed tests run first, then the new tests, then the rest. Each test runs
+only once, but the fixtures of a module or class that contains tests run
+first may run again when the rest of its tests run.
+
+These switches have no effect together with ``--failed``, when specific
+test ids are given, or when the multiprocess plugin runs tests in worker
+processes (``--processes``), in which case a warning is logged.
+
+The ids file
+------------
+
+The ids file is a log: it starts with a snapshot of the ids, failed tests
+and source names, and each test run appends a record of what it changed
+(the ids it gave to new tests, the tests that failed and the tests that
+passed) rather than rewriting the whole file. Once enough records build up,
+the next run folds them into a new snapshot, written to a temporary file
+and renamed into place.
+
+Several test runs may share one ids file, for instance the shards of a
+sharded run in the same workspace. Each run appends its record while
+holding a lock on the file, after reading the records that other runs
+appended since it loaded the file, so no run's changes are lost. A test
+stays on the failed list until a run in which it passes. (Locking is not
+available on Windows, where concurrent runs may still overwrite each
+other's changes.)
+
+The log makes saving cheaper, not loading: each run still reads the whole
+file, snapshot and records, when it starts.
 """
 __test__ = False
 
 import logging
 import os
+import unittest
+from nose.failure import Failure
 from nose.plugins import Plugin
-from nose.util import src, set
+from nose.plugins.collect import IndexSuite
+from nose.util import src, set, test_address
 
 try:
-    from cPickle import dump, load
+    from cPickle import dump, dumps, load, UnpicklingError
 except ImportError:
-    from pickle import dump, load
+    from pickle import dump, dumps, load, UnpicklingError
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
 log = logging.getLogger(__name__)
 
@@ -116,6 +170,9 @@ class TestId(Plugin):
     idfile = None
     collecting = True
     loopOnFailed = False
+    failedFirst = False
+    newFirst = False
+    loader = None
 
     def options(self, parser, env):
         """Register commandline options.
@@ -130,6 +187,18 @@ class TestId(Plugin):
                           dest='failed', default=False,
                           help="Run the tests that failed in the last "
                           "test run.")
+        parser.add_option('--failed-first', action='store_true',
+                          dest='failedFirst',
+                          default=env.get('NOSE_FAILED_FIRST', False),
+                          help="Run the tests that failed in the last "
+                          "test run first, then the rest of the tests. "
+                          "[NOSE_FAILED_FIRST]")
+        parser.add_option('--new-first', action='store_true',
+                          dest='newFirst',
+                          default=env.get('NOSE_NEW_FIRST', False),
+                          help="Run the tests that are not in the ids file "
+                          "first, then the rest of the tests. "
+                          "[NOSE_NEW_FIRST]")
 
     def configure(self, options, conf):
         """Configure plugin.
@@ -139,6 +208,11 @@ class TestId(Plugin):
             self.enabled = True
             self.loopOnFailed = True
             log.debug("Looping on failed tests")
+        self.failedFirst = bool(getattr(options, 'failedFirst', False))
+        self.newFirst = bool(getattr(options, 'newFirst', False))
+        if (self.failedFirst or self.newFirst) \
+               and not getattr(conf, 'worker', False):
+            self.enabled = True
         self.idfile = os.path.expanduser(options.testIdFile)
         if not os.path.isabs(self.idfile):
             self.idfile = os.path.join(conf.workingDir, self.idfile)
@@ -153,64 +227,63 @@ class TestId(Plugin):
         # loaded ids file
         self._seen = {}
         self._write_hashes = conf.verbosity >= 2
+        # ids of the tests that have run, when some run ahead of the rest
+        self._reordered = False
+        self._ranFirst = set()
+        # changes made by this run, for the ids file
+        self.store = IdFile(self.idfile)
+        self._failedNow = []
+        self._passedNow = set()
+        self._newSources = []
 
     def finalize(self, result):
-        """Save new ids file, if needed.
+        """Record the ids of new tests, and the tests that failed and
+        passed, in the ids file.
         """
-        if result.wasSuccessful():
-            self.failed = []
+        new = {}
         if self.collecting:
-            ids = dict(list(zip(list(self.tests.values()), list(self.tests.keys()))))
-        else:
-            ids = self.ids
-        fh = open(self.idfile, 'wb')
-        dump({'ids': ids,
-              'failed': self.failed,
-              'source_names': self.source_names}, fh)
-        fh.close()
-        log.debug('Saved test ids: %s, failed %s to %s',
-                  ids, self.failed, self.idfile)
+            for addr, id in self.tests.items():
+                if self.ids.get(id) != addr:
+                    new[id] = addr
+        saved = self.store.save(new, self._failedNow, self._passedNow,
+                                self._newSources)
+        # another run may have given some of the new tests other ids
+        for id, addr in saved.items():
+            self.tests[addr] = id
+        self.ids.update(saved)
+        self.failed = list(self.store.failed)
+        log.debug('Saved new test ids: %s, failed %s to %s',
+                  saved, self.failed, self.idfile)
 
     def loadTestsFromNames(self, names, module=None):
         """Translate ids in the list of requested names into their
         test addresses, if they are found in my dict of tests.
         """
         log.debug('ltfn %s %s', names, module)
-        try:
-            fh = open(self.idfile, 'rb')
-            try:
-                data = load(fh)
-                if 'ids' in data:
-                    self.ids = data['ids']
-                    self.failed = data['failed']
-                    self.source_names = data['source_names']
-                else:
-                    # old ids field
-                    self.ids = data
-                    self.failed = []
-                    self.source_names = names
-                if self.ids:
-                    self.id = max(self.ids) + 1
-                    self.tests = dict(list(zip(list(self.ids.values()), list(self.ids.keys()))))
-                else:
-                    self.id = 1
-                log.debug(
-                    'Loaded test ids %s tests %s failed %s sources %s from %s',
-                    self.ids, self.tests, self.failed, self.source_names,
-                    self.idfile)
-            except ValueError, e:
-                # load() may throw a ValueError when reading the ids file, if it
-                # was generated with a newer version of Python than we are currently
-                # running.
-                log.debug('Error loading %s : %s', self.idfile, str(e))
-            finally:
-                fh.close()
-        except IOError:
-            log.debug('IO error reading %s', self.idfile)
+        if self.store.load():
+            self.ids = dict(self.store.ids)
+            self.failed = list(self.store.failed)
+            if self.store.source_names is None:
+                # old ids field
+                self.source_names = list(names)
+            else:
+                self.source_names = list(self.store.source_names)
+            if self.ids:
+                self.id = max(self.ids) + 1
+                self.tests = dict(list(zip(list(self.ids.values()), list(self.ids.keys()))))
+            else:
+                self.id = 1
+            log.debug(
+                'Loaded test ids %s tests %s failed %s sources %s from %s',
+                self.ids, self.tests, self.failed, self.source_names,
+                self.idfile)
 
         if self.loopOnFailed and self.failed:
             self.collecting = False
             names = self.failed
+            # failed tests that don't run again, perhaps because they no
+            # longer exist, drop off the list
+            self._passedNow.update(self.failed)
             self.failed = []
         # I don't load any tests myself, only translate names like '#2'
         # into the associated test addresses
@@ -234,6 +307,7 @@ class TestId(Plugin):
             if really_new:
                 # remember new sources
                 self.source_names.extend(really_new)
+                self._newSources.extend(really_new)
             if not translated:
                 # new set of source names, no translations
                 # means "run the requested tests"
@@ -243,7 +317,89 @@ class TestId(Plugin):
             self.collecting = False
         log.debug("translated: %s new sources %s names %s",
                   translated, really_new, names)
-        return (None, translated + really_new or names)
+        names = translated + really_new or names
+        if self.collecting and not translated \
+               and (self.failedFirst or self.newFirst) \
+               and not getattr(self.conf, 'worker', False):
+            if getattr(self.conf, 'multiprocess_workers', 0):
+                # tests run ahead of the rest are only skipped later in
+                # this process, not in the workers, so they would run twice
+                log.warn("--failed-first and --new-first have no effect "
+                         "with --processes")
+                return (None, names)
+            first = self.firstNames(names)
+            if first:
+                log.debug("Running first: %s", first)
+                self._reordered = True
+                names = first + names
+        return (None, names)
+
+    def firstNames(self, names):
+        """Return the names of the tests to run ahead of names: the tests
+        that failed last time, with --failed-first, and the tests in names
+        that are not in the ids file, with --new-first.
+        """
+        first = []
+        if self.failedFirst:
+            for key in self.failed:
+                name = self.tr(key)
+                if name != key:
+                    first.append(name)
+        if self.newFirst and self.tests and self.loader is not None:
+            for addr in self.findTests(names):
+                if addr not in self.tests:
+                    name = self.makeName(addr)
+                    if name not in first:
+                        first.append(name)
+        return first
+
+    def findTests(self, names):
+        """Load the tests in names without building test suites, and
+        return their addresses. Each test generator has one address.
+        """
+        suiteClass = self.loader.suiteClass
+        visited = self.loader._visitedPaths.copy()
+        self.loader.suiteClass = IndexSuite
+        try:
+            addrs = []
+            for name in names:
+                self._addresses(self.loader.loadTestsFromName(name), addrs)
+            return addrs
+        finally:
+            # the real run has to visit the same directories again
+            self.loader.suiteClass = suiteClass
+            self.loader._visitedPaths = visited
+
+    def _addresses(self, test, addrs):
+        if isinstance(test, IndexSuite) and test.isGenerator():
+            test = test.context
+        elif isinstance(test, (IndexSuite, unittest.TestSuite)):
+            for t in test:
+                self._addresses(t, addrs)
+            return
+        elif isinstance(test, Failure):
+            return
+        try:
+            addrs.append(test_address(test))
+        except TypeError:
+            pass
+
+    def prepareTestLoader(self, loader):
+        """Get handle on the test loader, to look for new tests.
+        """
+        self.loader = loader
+
+    def prepareTestCase(self, test):
+        """Skip tests that already ran ahead of the rest.
+        """
+        if not self._ranFirst:
+            return
+        if test.id() not in self._ranFirst:
+            return
+        log.debug("%s already ran", test)
+        def skip(result):
+            pass
+        return skip
 
     def makeName(self, addr):
         log.debug("Make name %s", addr)
@@ -272,6 +428,8 @@ class TestId(Plugin):
         """
         adr = test.address()
         log.debug('start test %s (%s)', adr, adr in self.tests)
+        if self._reordered:
+            self._ranFirst.add(test.id())
         if adr in self.tests:
             if adr in self._seen:
                 self.write('   ')
@@ -285,15 +443,19 @@ class TestId(Plugin):
 
     def afterTest(self, test):
         # None means test never ran, False means failed/err
+        try:
+            key = str(self.tests[test.address()])
+        except KeyError:
+            # never saw this test -- startTest didn't run
+            return
         if test.passed is False:
-            try:
-                key = str(self.tests[test.address()])
-            except KeyError:
-                # never saw this test -- startTest didn't run
-                pass
-            else:
-                if key not in self.failed:
-                    self.failed.append(key)
+            if key not in self.failed:
+                self.failed.append(key)
+            if key not in self._failedNow:
+                self._failedNow.append(key)
+            self._passedNow.discard(key)
+        elif key not in self._failedNow:
+            self._passedNow.add(key)
 
     def tr(self, name):
         log.debug("tr '%s'", name)
@@ -311,3 +473,187 @@ class TestId(Plugin):
     def write(self, output):
         if self._write_hashes:
             self.stream.write(output)
+
+
+class IdFile(object):
+    """The ids, failed tests and source names saved by test runs.
+
+    The file holds a sequence of pickles. The first is a snapshot dict with
+    the keys ``ids``, ``failed`` and ``source_names``, in the format used by
+    earlier versions, which still read it. Each later pickle is an update
+    tuple of ('update', new ids, failed, passed, new source names).
+    """
+    # fold the updates into a new snapshot once there are this many
+    compactAfter = 50
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.ids = {}
+        self.failed = []
+        self.source_names = []
+        self.updates = 0
+        # how much of which file has been read
+        self.offset = 0
+        self.inode = None
+
+    def load(self):
+        """Read the file. Returns False if it could not be read.
+        """
+        try:
+            fh = open(self.filename, 'rb')
+        except IOError:
+            log.debug('IO error reading %s', self.filename)
+            return False
+        try:
+            self._read(fh, 0)
+        finally:
+            fh.close()
+        return self.inode is not None
+
+    def _read(self, fh, offset):
+        """Apply the pickles in fh from offset on. A pickle cut short by a
+        run that is still writing it is left for the next read.
+        """
+        inode = _inode(os.fstat(fh.fileno()))
+        if inode != self.inode:
+            # a new file: start from its snapshot
+            self.__init__(self.filename)
+            offset = 0
+        fh.seek(offset)
+        while True:
+            try:
+                record = load(fh)
+            except EOFError:
+                break
+            except (ValueError, UnpicklingError, IndexError, KeyError), e:
+                # load() may throw a ValueError when reading the ids file,
+                # if it was generated with a newer version of Python than we
+                # are currently running.
+                log.debug('Error loading %s : %s', self.filename, str(e))
+                break
+            self._apply(record)
+            self.inode = inode
+            self.offset = fh.tell()
+
+    def _apply(self, record):
+        if isinstance(record, tuple):
+            tag, ids, failed, passed, sources = record
+            self.ids.update(ids)
+            self.failed = [key for key in self.failed if key not in passed]
+            for key in failed:
+                if key not in self.failed:
+                    self.failed.append(key)
+            if self.source_names is not None:
+                self.source_names.extend(
+                    [name for name in sources
+                     if name not in self.source_names])
+            self.updates += 1
+        elif 'ids' in record:
+            self.ids = record['ids']
+            self.failed = record['failed']
+            self.source_names = record['source_names']
+        else:
+            # old ids field
+            self.ids = record
+            self.failed = []
+            self.source_names = None
+
+    def save(self, ids, failed, passed, sources):
+        """Append an update to the file: the new ids in ids, a dict of
+        {id: test address}, the ids of the tests in failed that failed and
+        those in passed that passed, and the new source names in sources.
+        The updates saved by other runs since the file was loaded are read
+        first, and new tests that they have already given ids keep those
+        ids, and failed and passed are translated to match. Returns the
+        new tests as saved, a dict of {id: test address}.
+        """
+        while True:
+            fd = os.open(self.filename,
+                         os.O_RDWR | os.O_APPEND | os.O_CREAT, 0666)
+            fh = os.fdopen(fd, 'a+b')
+            try:
+                _lock(fh)
+                try:
+                    if _inode(os.fstat(fd)) != _inode(os.stat(self.filename)):
+                        # replaced by a compaction while we waited
+                        continue
+                except OSError:
+                    # removed while we waited
+                    continue
+                self._read(fh, self.offset)
+                fh.seek(0, 2)
+                if self.inode is not None and fh.tell() > self.offset:
+                    # drop what a run that died while writing left behind
+                    fh.truncate(self.offset)
+                merged, moved = self._merge(ids)
+                # failed and passed name tests by the ids this run gave
+                # them, which may have moved
+                record = ('update', merged,
+                          [moved.get(key, key) for key in failed],
+                          [moved.get(key, key) for key in passed],
+                          list(sources))
+                self._apply(record)
+                if self.inode is None:
+                    # an empty file starts with a snapshot
+                    self.updates = self.compactAfter
+                if self.updates >= self.compactAfter:
+                    self._compact()
+                else:
+                    fh.write(dumps(record, -1))
+                    fh.flush()
+                return dict([(int(moved.get(str(id), id)), addr)
+                             for id, addr in ids.items()])
+            finally:
+                fh.close()
+
+    def _merge(self, ids):
+        """Return the new ids in ids that are not already in the file,
+        moving any that another run has taken, and a dict mapping the keys
+        (string ids) of tests that moved to their keys in the file.
+        """
+        known = dict([(addr, id) for id, addr in self.ids.items()])
+        merged = {}
+        moved = {}
+        next_id = max([0] + list(self.ids.keys()) + list(ids.keys())) + 1
+        for id in sorted(ids):
+            addr = ids[id]
+            if addr in known:
+                new_id = known[addr]
+            elif id in self.ids:
+                # taken by another run
+                new_id = next_id
+                next_id += 1
+            else:
+                new_id = id
+            if new_id != id:
+                moved[str(id)] = str(new_id)
+            if addr not in known:
+                merged[new_id] = addr
+        return merged, moved
+
+    def _compact(self):
+        tmp = '%s.%s.tmp' % (self.filename, os.getpid())
+        fh = open(tmp, 'wb')
+        try:
+            dump({'ids': self.ids,
+                  'failed': self.failed,
+                  'source_names': self.source_names or []}, fh, -1)
+        finally:
+            fh.close()
+        try:
+            os.rename(tmp, self.filename)
+        except OSError:
+            # windows will not rename over an existing file
+            os.remove(self.filename)
+            os.rename(tmp, self.filename)
+        log.debug('Compacted %s updates in %s', self.updates, self.filename)
+        self.updates = 0
+
+
+def _inode(st):
+    return (st.st_dev, st.st_ino)
+
+
+def _lock(fh):
+    if fcntl is not None:
+        fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
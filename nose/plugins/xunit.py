@@ -28,10 +28,27 @@ This can be used in a matrixed build to distinguish between failures
 in different environments.
 The testsuite name is used as a prefix.
 
+By default the report is built up in memory and written when the test run
+ends. For very large runs, or runs that might be killed before they finish,
+set the ``--xunit-stream`` option. Each test case is then written to a file
+named after the report file, with ``.partial`` added, as soon as the test
+completes, and the report itself is assembled from it at the end of the run.
+If the run is killed, the partial file holds every test case completed so
+far, and needs only a closing ``</testsuite>`` tag to be a valid report.
+
+The time taken by the setup and teardown fixtures of each package, module
+and class is listed in the ``properties`` of the test suite, as a
+``setup:NAME`` and a ``teardown:NAME`` property for each context, since
+fixture time is not part of the time of any one test case.
+
 Here is an abbreviated version of what an XML test report might look like::
 
     <?xml version="1.0" encoding="UTF-8"?>
     <testsuite name="nosetests" tests="1" errors="1" failures="0" skip="0">
+        <properties>
+            <property name="setup:path_to_test_suite" value="0.104"/>
+            <property name="teardown:path_to_test_suite" value="0.002"/>
+        </properties>
         <testcase classname="path_to_test_suite.TestSomething"
                   name="test_it" time="0">
             <error type="exceptions.TypeError" message="oops, wrong type">
@@ -52,10 +69,12 @@ import sys
 import traceback
 import re
 import inspect
+import shutil
 from StringIO import StringIO
 from time import time
 from xml.sax import saxutils
 
+from nose.durations import context_name
 from nose.plugins.base import Plugin
 from nose.exc import SkipTest
 from nose.pyversion import force_unicode, format_exception
@@ -153,6 +172,7 @@ class Xunit(Plugin):
     score = 1500
     encoding = 'UTF-8'
     error_report_file = None
+    partial_file = None
 
     def __init__(self):
         super(Xunit, self).__init__()
@@ -206,6 +226,14 @@ class Xunit(Plugin):
             help=("Whether to prefix the class name under test with testsuite name. "
                   "Defaults to false."))
 
+        parser.add_option(
+            '--xunit-stream', action='store_true',
+            dest='xunit_stream',
+            default=bool(env.get('NOSE_XUNIT_STREAM', False)),
+            help=("Write each test case to FILE.partial as soon as it "
+                  "completes, instead of holding the whole report in memory "
+                  "until the end of the run. [NOSE_XUNIT_STREAM]"))
+
     def configure(self, options, config):
         """Configures the xunit plugin."""
         Plugin.configure(self, options, config)
@@ -217,9 +245,35 @@ class Xunit(Plugin):
                           'skipped': 0
                           }
             self.errorlist = []
+            self.fixtureTimes = []
             self.error_report_file_name = os.path.realpath(options.xunit_file)
             self.xunit_testsuite_name = options.xunit_testsuite_name
             self.xunit_prefix_class = options.xunit_prefix_class
+            self.xunit_stream = getattr(options, 'xunit_stream', False)
+            self.partial_file_name = self.error_report_file_name + '.partial'
+
+    def _addTestcase(self, testcase):
+        """Add the XML for one test case to the report: in memory, or when
+        streaming, at the end of the partial file.
+        """
+        if not self.xunit_stream:
+            self.errorlist.append(testcase)
+            return
+        if self.partial_file is None:
+            self._openPartial()
+        self.partial_file.write(force_unicode(testcase, self.encoding))
+        self.partial_file.flush()
+
+    def _openPartial(self):
+        # the partial file starts with a header without counts, so that a
+        # killed run leaves behind a report that is missing only its end
+        self.partial_file = codecs.open(self.partial_file_name, 'w+',
+                                        self.encoding, 'replace')
+        self.partial_file.write(
+            u'<?xml version="1.0" encoding="%s"?><testsuite name=%s>'
+            % (self.encoding, self._quoteattr(self.xunit_testsuite_name)))
+        self.partial_file.flush()
+        self._partial_start = self.partial_file.tell()
 
     def report(self, stream):
         """Writes an Xunit-formatted XML file
@@ -238,14 +292,49 @@ class Xunit(Plugin):
             u'<testsuite name="%(testsuite_name)s" tests="%(total)d" '
             u'errors="%(errors)d" failures="%(failures)d" '
             u'skip="%(skipped)d">' % self.stats)
-        self.error_report_file.write(u''.join([force_unicode(e, self.encoding)
-                                               for e in self.errorlist]))
+        if self.fixtureTimes:
+            self.error_report_file.write(u'<properties>')
+            for name, setup, teardown in self.fixtureTimes:
+                for kind, elapsed in (('setup', setup),
+                                      ('teardown', teardown)):
+                    self.error_report_file.write(
+                        u'<property name=%s value="%.3f"/>'
+                        % (self._quoteattr(u'%s:%s' % (kind, name)),
+                           elapsed))
+            self.error_report_file.write(u'</properties>')
+        if self.partial_file is not None:
+            self._copyPartial(self.error_report_file)
+        else:
+            self.error_report_file.write(
+                u''.join([force_unicode(e, self.encoding)
+                          for e in self.errorlist]))
         self.error_report_file.write(u'</testsuite>')
         self.error_report_file.close()
         if self.config.verbosity > 1:
             stream.writeln("-" * 70)
             stream.writeln("XML: %s" % self.error_report_file.name)
 
+    def _copyPartial(self, report_file):
+        """Copy the test cases from the partial file into report_file, then
+        remove the partial file.
+        """
+        partial = self.partial_file
+        self.partial_file = None
+        partial.close()
+        # both files are in the same encoding, so copy the bytes after the
+        # partial file's header as they are
+        report_file.flush()
+        fh = open(self.partial_file_name, 'rb')
+        try:
+            fh.seek(self._partial_start)
+            shutil.copyfileobj(fh, report_file.stream)
+        finally:
+            fh.close()
+        try:
+            os.remove(self.partial_file_name)
+        except OSError:
+            pass
+
     def _startCapture(self):
         self._capture_stack.append((sys.stdout, sys.stderr))
         self._currentStdout = StringIO()
@@ -259,6 +348,12 @@ class Xunit(Plugin):
     def stopContext(self, context):
         self._endCapture()
 
+    def addContextDuration(self, context, setup, teardown):
+        """Records the time taken by a context's fixtures."""
+        self.fixtureTimes.append((force_unicode(context_name(context),
+                                                self.encoding),
+                                  setup, teardown))
+
     def beforeTest(self, test):
         """Initializes a timer before starting a test."""
         self._timer = time()
@@ -308,7 +403,7 @@ class Xunit(Plugin):
         tb = format_exception(err, self.encoding)
         id = test.id()
 
-        self.errorlist.append(
+        self._addTestcase(
             u'<testcase classname=%(cls)s name=%(name)s time="%(taken).3f">'
             u'<%(type)s type=%(errtype)s message=%(message)s><![CDATA[%(tb)s]]>'
             u'</%(type)s>%(systemout)s%(systemerr)s</testcase>' %
@@ -331,7 +426,7 @@ class Xunit(Plugin):
         self.stats['failures'] += 1
         id = test.id()
 
-        self.errorlist.append(
+        self._addTestcase(
             u'<testcase classname=%(cls)s name=%(name)s time="%(taken).3f">'
             u'<failure type=%(errtype)s message=%(message)s><![CDATA[%(tb)s]]>'
             u'</failure>%(systemout)s%(systemerr)s</testcase>' %
@@ -351,7 +446,7 @@ class Xunit(Plugin):
         taken = self._timeTaken()
         self.stats['passes'] += 1
         id = test.id()
-        self.errorlist.append(
+        self._addTestcase(
             '<testcase classname=%(cls)s name=%(name)s '
             'time="%(taken).3f">%(systemout)s%(systemerr)s</testcase>' %
             {'cls': self._getCls(id),
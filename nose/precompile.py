@@ -0,0 +1,139 @@
+"""
+Parallel Byte Compilation
+-------------------------
+
+Collecting tests imports every test module, one after another, and the
+first import of a module whose bytecode file is missing or out of date
+has to read and compile its source. In large trees, and especially on
+network filesystems, much of the collection phase is spent that way.
+With ``--compile-workers=N``, each directory that the test loader is
+asked to search is first walked once, and the python source files whose
+bytecode is missing or stale are read and byte-compiled by a pool of N
+worker processes. The imports made during collection then load the
+fresh bytecode files, in the usual order, in the main process.
+
+The walk visits the same directories and files that collection does: the
+loader makes its usual selection (and uses the discovery cache, if there
+is one), and keeps the entries that it finds for the collection that
+follows, so that no directory is listed twice. Only the test files and
+the ``__init__.py`` files of test packages are compiled; the modules that
+they import are compiled as usual when they are first imported.
+
+Modules are not imported in the workers: a module object cannot be
+handed from one process to another, and the main process has to import
+every test module itself to find the tests in it, so the parts of an
+import that can be shared are reading and compiling the source.
+
+Files that fail to compile are left alone; importing them reports the
+error as usual. Nothing is compiled when writing bytecode is turned off
+(``--no-byte-compile``). If worker processes cannot be started, the files
+are compiled by a pool of threads instead.
+"""
+import imp
+import logging
+import os
+import py_compile
+import struct
+import sys
+
+log = logging.getLogger(__name__)
+
+__all__ = ['precompile', 'stale_sources']
+
+# number of stale files sent to a worker at a time
+CHUNK_SIZE = 8
+
+
+def _bytecode_path(source):
+    cache_from_source = getattr(imp, 'cache_from_source', None)
+    if cache_from_source is not None:
+        return cache_from_source(source)
+    if __debug__:
+        return source + 'c'
+    return source + 'o'
+
+
+def is_stale(source):
+    """Return True if the bytecode file for source is missing, was
+    written by another version of python or does not match the source's
+    modification time.
+    """
+    try:
+        mtime = int(os.stat(source).st_mtime) & 0xFFFFFFFF
+        fh = open(_bytecode_path(source), 'rb')
+    except (IOError, OSError):
+        return True
+    try:
+        header = fh.read(8)
+    finally:
+        fh.close()
+    if len(header) < 8 or header[:4] != imp.get_magic():
+        return True
+    return struct.unpack('<I', header[4:8])[0] != mtime
+
+
+def stale_sources(sources):
+    """Return the paths in sources, a list of python source files, whose
+    bytecode is stale.
+    """
+    return [source for source in sources if is_stale(source)]
+
+
+def _compile(source):
+    try:
+        py_compile.compile(source, doraise=True)
+    except (KeyboardInterrupt, SystemExit):
+        raise
+    except:
+        # importing the module will report the error
+        return source, False
+    return source, True
+
+
+def _pool(workers):
+    try:
+        from multiprocessing import Pool
+        return Pool(workers)
+    except (ImportError, OSError, NotImplementedError), e:
+        log.debug("Unable to start compile worker processes (%s); "
+                  "using threads", e)
+    from multiprocessing.pool import ThreadPool
+    return ThreadPool(workers)
+
+
+def precompile(sources, workers):
+    """Byte-compile the python source files in sources whose bytecode is
+    stale, using a pool of workers; if workers is negative, use one worker
+    per CPU. Return the number of files compiled.
+    """
+    if sys.dont_write_bytecode:
+        return 0
+    sources = stale_sources(sources)
+    if not sources:
+        return 0
+    if workers < 0:
+        try:
+            import multiprocessing
+            workers = multiprocessing.cpu_count()
+        except (ImportError, NotImplementedError):
+            workers = 1
+    workers = min(workers, len(sources))
+    log.debug("Compiling %s source files with %s workers",
+              len(sources), workers)
+    if workers <= 1:
+        results = map(_compile, sources)
+    else:
+        pool = _pool(workers)
+        try:
+            results = list(pool.imap_unordered(_compile, sources,
+                                               CHUNK_SIZE))
+        finally:
+            pool.terminate()
+            pool.join()
+    compiled = 0
+    for source, ok in results:
+        if ok:
+            compiled += 1
+        else:
+            log.debug("Unable to compile %s", source)
+    return compiled
@@ -3,8 +3,8 @@ Result Proxy
 ------------
 
 The result proxy wraps the result instance given to each test. It
-performs two functions: enabling extended error/failure reporting
-and calling plugins.
+performs three functions: enabling extended error/failure reporting,
+calling plugins, and timing the test for the ``--durations`` report.
 
 As each result event is fired, plugins are called with the same event;
 however, plugins are called with the nose.case.Test instance that
@@ -16,6 +16,7 @@ manipulate the test object itself by setting the `test` attribute of
 the nose.case.Test that they receive.
 """
 import logging
+import time
 from nose.config import Config
 
 
@@ -81,6 +82,7 @@ class ResultProxy(object):
         self.plugins = config.plugins
         self.result = result
         self.test = test
+        self.started = None
 
     def __repr__(self):
         return repr(self.result)
@@ -112,6 +114,11 @@ class ResultProxy(object):
         if hasattr(self.result, "afterTest"):
             self.result.afterTest(self.test)
 
+    def addContextDuration(self, context, setup, teardown):
+        self.plugins.addContextDuration(context, setup, teardown)
+        if hasattr(self.result, "addContextDuration"):
+            self.result.addContextDuration(context, setup, teardown)
+
     def beforeTest(self, test):
         self.assertMyTest(test)
         self.plugins.beforeTest(self.test)
@@ -168,12 +175,17 @@ class ResultProxy(object):
         self.assertMyTest(test)
         self.plugins.startTest(self.test)
         self.result.startTest(self.test)
+        self.started = time.time()
 
     def stop(self):
         self.result.stop()
 
     def stopTest(self, test):
         self.assertMyTest(test)
+        if self.started is not None and hasattr(self.result,
+                                                "addTestDuration"):
+            self.result.addTestDuration(self.test,
+                                        time.time() - self.started)
         self.plugins.stopTest(self.test)
         self.result.stopTest(self.test)
 
@@ -9,12 +9,14 @@ reporting.
 """
 
 import logging
+import os
 try:
     # 2.7+
     from unittest.runner import _TextTestResult
 except ImportError:
     from unittest import _TextTestResult
 from nose.config import Config
+from nose.durations import Durations
 from nose.util import isclass, ln as _ln # backwards compat
 
 log = logging.getLogger('nose.result')
@@ -42,6 +44,25 @@ class TextTestResult(_TextTestResult):
             config = Config()
         self.config = config
         _TextTestResult.__init__(self, stream, descriptions, verbosity)
+        if (getattr(config, 'durations', None) is not None
+            or getattr(config, 'durationsFile', None)):
+            self.testDurations = Durations()
+        else:
+            self.testDurations = None
+
+    def addTestDuration(self, test, elapsed):
+        """Record the time taken by a test, if durations are being
+        reported.
+        """
+        if self.testDurations is not None:
+            self.testDurations.addTest(test, elapsed)
+
+    def addContextDuration(self, context, setup, teardown):
+        """Record the time taken by the setup and teardown fixtures of a
+        context, if durations are being reported.
+        """
+        if self.testDurations is not None:
+            self.testDurations.addContext(context, setup, teardown)
 
     def addSkip(self, test, reason):
         # 2.7 skip compat
@@ -119,6 +140,7 @@ class TextTestResult(_TextTestResult):
         run = self.testsRun
         plural = run != 1 and "s" or ""
 
+        self.reportDurations()
         writeln(self.separator2)
         writeln("Ran %s test%s in %.3fs" % (run, plural, taken))
         writeln()
@@ -150,6 +172,21 @@ class TextTestResult(_TextTestResult):
         else:
             writeln()
 
+    def reportDurations(self):
+        """Print the slowest tests and fixture contexts, and save all
+        durations to a file, as configured.
+        """
+        durations = getattr(self, 'testDurations', None)
+        if durations is None:
+            return
+        if self.config.durations is not None:
+            durations.report(self.stream, self.config.durations,
+                             self.separator1)
+        if self.config.durationsFile:
+            durations.save(os.path.join(
+                self.config.workingDir,
+                os.path.expanduser(self.config.durationsFile)))
+
     def wasSuccessful(self):
         """Overrides to check that there are no errors in errorClasses
         lists that are marked as errors and should cause a run to
@@ -11,6 +11,7 @@ from __future__ import generators
 
 import logging
 import sys
+import time
 import unittest
 from nose.case import Test
 from nose.config import Config
@@ -155,6 +156,8 @@ class ContextSuite(LazySuite):
         self.has_run = False
         self.can_split = can_split
         self.error_context = None
+        self.fixtureTimes = {}
+        self.contextDurations = []
         super(ContextSuite, self).__init__(tests)
 
     def __repr__(self):
@@ -229,6 +232,18 @@ class ContextSuite(LazySuite):
             except:
                 self.error_context = 'teardown'
                 result.addError(self, self._exc_info())
+            self.reportDurations(result)
+
+    def reportDurations(self, result):
+        """Pass the time taken by the setup and teardown fixtures of each
+        context that I have torn down to result, if it records durations.
+        """
+        durations, self.contextDurations = self.contextDurations, []
+        add = getattr(result, 'addContextDuration', None)
+        if add is None:
+            return
+        for context, setup, teardown in durations:
+            add(context, setup, teardown)
 
     def hasFixtures(self, ctx_callback=None):
         context = self.context
@@ -310,7 +325,11 @@ class ContextSuite(LazySuite):
             names = self.moduleSetup
             if hasattr(context, '__path__'):
                 names = self.packageSetup + names
-        try_run(context, names)
+        start = time.time()
+        try:
+            try_run(context, names)
+        finally:
+            self.fixtureTimes[context] = time.time() - start
 
     def shortDescription(self):
         if self.context is None:
@@ -362,7 +381,14 @@ class ContextSuite(LazySuite):
             names = self.moduleTeardown
             if hasattr(context, '__path__'):
                 names = self.packageTeardown + names
-        try_run(context, names)
+        start = time.time()
+        try:
+            try_run(context, names)
+        finally:
+            setup = self.fixtureTimes.pop(context, 0.0)
+            if self.implementsAnyFixture(context, None):
+                self.contextDurations.append(
+                    (context, setup, time.time() - start))
         self.config.plugins.stopContext(context)
 
     # FIXME the wrapping has to move to the factory?
@@ -404,6 +430,19 @@ class ContextSuiteFactory(object):
         self.was_setup = {}
         self.was_torndown = {}
 
+    def reset(self):
+        """Forget all suites and contexts seen so far, and which contexts
+        have been set up and torn down, so that the factory may be reused
+        for an unrelated set of tests.
+        """
+        self.suites = {}
+        self.context = {}
+        self.was_setup = {}
+        self.was_torndown = {}
+        if isinstance(self.resultProxy, ResultProxyFactory):
+            # result proxy factories hold on to the first result they see
+            self.resultProxy = ResultProxyFactory(config=self.config)
+
     def __call__(self, tests, **kw):
         """Return ``ContextSuite`` for tests. ``tests`` may either
         be a callable (in which case the resulting ContextSuite will
@@ -1,4 +1,6 @@
 # -*- coding: utf-8 -*-
+import os
+import subprocess
 import sys
 import unittest
 from optparse import OptionParser
@@ -102,6 +104,47 @@ class TestCapturePlugin(unittest.TestCase):
         self.assertNotEqual(sys.stdout, sys.__stdout__)
         self.assertTrue(hasattr(sys.stdout, 'encoding'))
         c.end()
+    def test_captures_fd_output(self):
+        c = Capture()
+        c.captureFd = True
+        c.start()
+        try:
+            print "from python"
+            os.write(1, "from the fd\n")
+            subprocess.call([sys.executable, '-c', 'print "from a child"'])
+        finally:
+            c.end()
+        self.assertEqual(c.buffer,
+                         "from python\nfrom the fd\nfrom a child\n")
+
+    def test_fd_capture_nests(self):
+        c = Capture()
+        c.captureFd = True
+        c.start()
+        outer = c._buf
+        try:
+            os.write(1, "outer\n")
+            c.start()
+            os.write(1, "inner\n")
+            c.end()
+            inner = c.buffer
+            os.write(1, "outer again\n")
+        finally:
+            c.end()
+        self.assertEqual(inner, "inner\n")
+        self.assertEqual(outer.getvalue(), "outer\nouter again\n")
+
+    def test_spools_large_output(self):
+        c = Capture()
+        c.maxMemory = 10
+        c.start()
+        sys.stdout.write("short\n")
+        assert sys.stdout._file is None
+        print "test 日本", u"名"
+        c.end()
+        assert c._buf._file is not None
+        self.assertEqual(c.buffer, "short\ntest 日本 名\n")
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,125 @@
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+from nose.config import Config
+from nose.discovery import DiscoveryCache, cache_key
+from nose.loader import TestLoader
+from nose.selector import Selector
+
+
+class NoSelection(Selector):
+    def wantDirectory(self, dirname):
+        raise AssertionError("wantDirectory(%s) called" % dirname)
+
+    def wantFile(self, file):
+        raise AssertionError("wantFile(%s) called" % file)
+
+
+class TestDiscoveryCache(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.cache_file = os.path.join(self.dir, '.nosecache')
+        self.tests = os.path.join(self.dir, 'tests')
+        os.mkdir(self.tests)
+        self.write('test_disc_a.py', 'def test_a():\n    pass\n')
+        self.write('helper_disc.py', 'def test_helper():\n    pass\n')
+        self.write('test_disc_b.py', 'def test_b():\n    pass\n')
+        self.age()
+        self.mods = sys.modules.copy()
+        self.path = sys.path[:]
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+        sys.path = self.path
+        for name in sys.modules.keys():
+            if name not in self.mods:
+                del sys.modules[name]
+
+    def write(self, name, text):
+        fh = open(os.path.join(self.tests, name), 'w')
+        fh.write(text)
+        fh.close()
+
+    def age(self):
+        # make the tree look old enough to be cached
+        then = time.time() - 60
+        for path in (self.dir, self.tests):
+            os.utime(path, (then, then))
+
+    def config(self):
+        return Config(discoveryCache=self.cache_file, workingDir=self.dir,
+                      addPaths=False)
+
+    def load(self, loader):
+        return [t for t in loader.loadTestsFromDir(self.tests)]
+
+    def test_cache_written_and_replayed(self):
+        loader = TestLoader(config=self.config())
+        tests = self.load(loader)
+        self.assertEqual(len(tests), 2)
+        assert os.path.exists(self.cache_file)
+
+        warm = TestLoader(config=self.config(), selector=NoSelection)
+        warm_tests = self.load(warm)
+        self.assertEqual(len(warm_tests), 2)
+
+    def test_changed_directory_is_rescanned(self):
+        self.load(TestLoader(config=self.config()))
+        self.write('test_disc_c.py', 'def test_c():\n    pass\n')
+        self.age()
+        cache = DiscoveryCache(self.cache_file, cache_key(self.config()))
+        assert cache.get(self.tests) is None
+
+        tests = self.load(TestLoader(config=self.config()))
+        self.assertEqual(len(tests), 3)
+
+    def test_recent_directory_not_cached(self):
+        now = time.time()
+        os.utime(self.tests, (now, now))
+        self.load(TestLoader(config=self.config()))
+        cache = DiscoveryCache(self.cache_file, cache_key(self.config()))
+        assert cache.get(self.tests) is None
+
+    def test_key_depends_on_selection(self):
+        self.load(TestLoader(config=self.config()))
+        config = self.config()
+        config.testMatch = re.compile(r'helper')
+        cache = DiscoveryCache(self.cache_file, cache_key(config))
+        self.assertEqual(cache.dirs, {})
+
+    def test_key_depends_on_plugin_selection(self):
+        from optparse import OptionParser
+        from nose.plugins.doctests import Doctest
+        from nose.plugins.manager import PluginManager
+        def key(*args):
+            plugin = Doctest()
+            parser = OptionParser()
+            plugin.addOptions(parser, {})
+            options, argv = parser.parse_args(['--with-doctest'] + list(args))
+            plugin.configure(options, Config())
+            config = self.config()
+            config.plugins = PluginManager(plugins=[plugin])
+            return cache_key(config)
+        self.assertNotEqual(key('--doctest-extension=txt'),
+                            key('--doctest-extension=rst'))
+        self.assertEqual(key('--doctest-extension=txt'),
+                         key('--doctest-extension=txt'))
+
+    def test_cache_saved_when_loading_stops_early(self):
+        loader = TestLoader(config=self.config())
+        loading = loader.loadTestsFromDir(self.tests)
+        loading.next()
+        loader.discoveryCache.dirty = True
+        loading.close()
+        self.assertEqual(loader._dirDepth, 0)
+        assert os.path.exists(self.cache_file)
+
+
+if __name__ == '__main__':
+    unittest.main()
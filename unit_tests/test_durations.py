@@ -0,0 +1,86 @@
+import json
+import os
+import tempfile
+import unittest
+from nose.durations import Durations, context_name
+
+
+class FakeTest(object):
+    def __init__(self, name):
+        self.name = name
+
+    def id(self):
+        return self.name
+
+
+class FakeStream(object):
+    def __init__(self):
+        self.lines = []
+
+    def writeln(self, line=''):
+        self.lines.append(line)
+
+
+class TestDurations(unittest.TestCase):
+
+    def durations(self, *times):
+        durations = Durations()
+        for ix, elapsed in enumerate(times):
+            durations.addTest(FakeTest('test_%s' % ix), elapsed)
+        return durations
+
+    def test_context_name(self):
+        self.assertEqual(context_name(unittest), 'unittest')
+        self.assertEqual(context_name(FakeTest), 'test_durations.FakeTest')
+
+    def test_percentiles(self):
+        durations = self.durations(0.5, 0.1, 0.3)
+        self.assertEqual(durations.percentiles(),
+                         [(50, 0.3), (90, 0.5), (95, 0.5), (99, 0.5),
+                          (100, 0.5)])
+        self.assertEqual(Durations().percentiles(), [])
+
+    def test_histogram(self):
+        durations = self.durations(0.0005, 0.002, 0.003, 12.0)
+        self.assertEqual(durations.histogram(),
+                         [('< 1ms', 1), ('< 10ms', 2), ('< 100ms', 0),
+                          ('< 1s', 0), ('< 10s', 0), ('>= 10s', 1)])
+
+    def test_report(self):
+        durations = self.durations(0.5, 0.1, 0.3)
+        durations.addContext(unittest, 1.25, 0.25)
+        stream = FakeStream()
+        durations.report(stream, 2)
+        print "\n".join(stream.lines)
+        self.assertEqual(stream.lines[1:6], [
+            'Slowest 2 tests:',
+            '   0.500s  test_0',
+            '   0.300s  test_2',
+            'All 1 fixture contexts, slowest first:',
+            '   1.500s  unittest (setup 1.250s, teardown 0.250s)'])
+        self.assertEqual(stream.lines[6], 'Test durations (3 tests, 0.900s):')
+        self.assertEqual(stream.lines[-3],
+                         '       < 1s     3 ' + '#' * 42)
+
+    def test_save(self):
+        durations = self.durations(0.5)
+        worker = self.durations(0.25)
+        worker.addContext(unittest, 1.25, 0.25)
+        durations.update(worker.tests, worker.contexts)
+        fd, filename = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            durations.save(filename)
+            data = json.load(open(filename))
+        finally:
+            os.remove(filename)
+        self.assertEqual(data['tests'], [{'id': 'test_0', 'time': 0.5},
+                                         {'id': 'test_0', 'time': 0.25}])
+        self.assertEqual(data['contexts'], [{'id': 'unittest', 'time': 1.5,
+                                             'setup': 1.25,
+                                             'teardown': 0.25}])
+        self.assertEqual(data['percentiles']['max'], 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
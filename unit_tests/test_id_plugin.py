@@ -1,6 +1,11 @@
+import os
+import shutil
+import tempfile
 import unittest
+from cPickle import dump, load
 from nose.config import Config
 from nose.plugins.builtin import TestId
+from nose.plugins.testid import IdFile
 import mock
 
 class TestTestIdPlugin(unittest.TestCase):
@@ -16,5 +21,101 @@ class TestTestIdPlugin(unittest.TestCase):
                "%s is not under %s" % (tid.idfile, c.workingDir)
 
 
+class TestIdFile(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.dir, '.noseids')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def loaded(self):
+        store = IdFile(self.filename)
+        store.load()
+        return store
+
+    def pickles(self):
+        fh = open(self.filename, 'rb')
+        count = 0
+        try:
+            while True:
+                try:
+                    load(fh)
+                except EOFError:
+                    return count
+                count += 1
+        finally:
+            fh.close()
+
+    def test_concurrent_runs_merge(self):
+        IdFile(self.filename).save({1: 'a', 2: 'b'}, ['2'], [], ['.'])
+        one = self.loaded()
+        two = self.loaded()
+        # both runs find new tests, and give them the same next id
+        one.save({3: 'c'}, ['3'], ['2'], [])
+        saved = two.save({3: 'd', 4: 'c'}, ['1'], [], ['other'])
+        # c already has an id, and 3 is taken
+        self.assertEqual(saved, {3: 'c', 5: 'd'})
+        store = self.loaded()
+        self.assertEqual(store.ids, {1: 'a', 2: 'b', 3: 'c', 5: 'd'})
+        self.assertEqual(store.failed, ['3', '1'])
+        self.assertEqual(store.source_names, ['.', 'other'])
+        self.assertEqual(self.pickles(), 3)
+
+    def test_concurrent_runs_remap_results(self):
+        IdFile(self.filename).save({1: 'a', 2: 'b'}, [], [], ['.'])
+        one = self.loaded()
+        two = self.loaded()
+        one.save({3: 'c'}, [], ['3'], [])
+        # d moves to 5, and the other run's c is already 3
+        saved = two.save({3: 'd', 4: 'c'}, ['3', '1'], ['4'], [])
+        self.assertEqual(saved, {3: 'c', 5: 'd'})
+        store = self.loaded()
+        self.assertEqual(store.ids, {1: 'a', 2: 'b', 3: 'c', 5: 'd'})
+        self.assertEqual(store.failed, ['5', '1'])
+
+    def test_compaction(self):
+        IdFile.compactAfter, compactAfter = 2, IdFile.compactAfter
+        try:
+            IdFile(self.filename).save({1: 'a'}, ['1'], [], ['.'])
+            self.loaded().save({2: 'b'}, [], [], [])
+            self.assertEqual(self.pickles(), 2)
+            self.loaded().save({3: 'c'}, [], ['1'], [])
+            self.assertEqual(self.pickles(), 1)
+        finally:
+            IdFile.compactAfter = compactAfter
+        store = self.loaded()
+        self.assertEqual(store.ids, {1: 'a', 2: 'b', 3: 'c'})
+        self.assertEqual(store.failed, [])
+        self.assertEqual(store.updates, 0)
+
+    def test_old_format(self):
+        fh = open(self.filename, 'wb')
+        dump({'ids': {1: 'a'}, 'failed': ['1'], 'source_names': ['.']}, fh)
+        fh.close()
+        self.loaded().save({2: 'b'}, [], ['1'], [])
+        store = self.loaded()
+        self.assertEqual(store.ids, {1: 'a', 2: 'b'})
+        self.assertEqual(store.failed, [])
+        # earlier versions read the first pickle
+        fh = open(self.filename, 'rb')
+        self.assertEqual(load(fh)['ids'], {1: 'a'})
+        fh.close()
+
+    def test_partial_update_is_ignored(self):
+        IdFile(self.filename).save({1: 'a'}, [], [], [])
+        self.loaded().save({2: 'b'}, [], [], [])
+        size = os.path.getsize(self.filename)
+        fh = open(self.filename, 'r+b')
+        fh.truncate(size - 3)
+        fh.close()
+        store = self.loaded()
+        self.assertEqual(store.ids, {1: 'a'})
+        # the next update replaces it
+        store.save({3: 'c'}, [], [], [])
+        self.assertEqual(self.loaded().ids, {1: 'a', 3: 'c'})
+
+
 if __name__ == '__main__':
     unittest.main()
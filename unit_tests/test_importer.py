@@ -60,6 +60,35 @@ class TestImporter(unittest.TestCase):
 
         imp = nose.importer.Importer()
         mod = imp.importFromPath(mod, fqname)
-        
+
+    def test_cached_import(self):
+        where = os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                             'support'))
+        foo = os.path.join(where, 'foo')
+        foobar = os.path.join(foo, 'bar')
+        found = []
+        def find_module(part, path):
+            found.append(part)
+            return real_find_module(part, path)
+        real_find_module = nose.importer.find_module
+        nose.importer.find_module = find_module
+        try:
+            imp = nose.importer.Importer()
+            mod = imp.importFromDir(foobar, 'buz')
+            self.assertEqual(found, ['buz'])
+            assert imp.importFromDir(foobar, 'buz') is mod
+            self.assertEqual(found, ['buz'])
+            # a new module object is looked up again
+            del sys.modules['buz']
+            mod = imp.importFromDir(foobar, 'buz')
+            self.assertEqual(found, ['buz', 'buz'])
+            # and so is a module in a modified directory
+            imp._found[('buz', (foobar,))] = ((0,), mod)
+            assert imp.importFromDir(foobar, 'buz') is mod
+            self.assertEqual(found, ['buz', 'buz', 'buz'])
+        finally:
+            nose.importer.find_module = real_find_module
+
+
 if __name__ == '__main__':
     unittest.main()
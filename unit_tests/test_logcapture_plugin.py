@@ -273,3 +273,187 @@ class TestLogCapturePlugin(object):
         records = c.formatLogRecords()
         eq_(1, len(records))
         assert records[0].startswith('foo.yes:'), records[0]
+
+    def test_max_records(self):
+        c = LogCapture()
+        parser = OptionParser()
+        c.addOptions(parser, {})
+        options, args = parser.parse_args(['--logging-max-records=2'])
+        c.configure(options, Config())
+        c.start()
+        log = logging.getLogger("ring")
+        for n in range(5):
+            log.debug("record %s", n)
+        c.end()
+        eq_(2, len(c.handler.buffer))
+        records = c.formatLogRecords()
+        eq_(["(3 earlier log records not kept)",
+             "ring: DEBUG: record 3",
+             "ring: DEBUG: record 4"], records)
+        c.handler.truncate()
+        eq_([], c.formatLogRecords())
+
+    def test_max_bytes(self):
+        c = LogCapture()
+        parser = OptionParser()
+        c.addOptions(parser, {})
+        options, args = parser.parse_args(['--logging-max-bytes=100'])
+        c.configure(options, Config())
+        c.start()
+        log = logging.getLogger("big")
+        log.debug("small %s", 1)
+        log.debug("large %s", "x" * 60)
+        log.debug("large %s", "y" * 60)
+        c.end()
+        eq_(["(2 earlier log records not kept)",
+             "big: DEBUG: large " + "y" * 60], c.formatLogRecords())
+        # the last record is kept, however large
+        log.debug("huge %s", "z" * 200)
+        eq_(1, len(c.handler.buffer))
+        eq_(len("huge %s") + 200, c.handler.size)
+
+    def test_max_bytes_and_records(self):
+        c = LogCapture()
+        parser = OptionParser()
+        c.addOptions(parser, {})
+        options, args = parser.parse_args(['--logging-max-bytes=100',
+                                           '--logging-max-records=2'])
+        c.configure(options, Config())
+        c.start()
+        log = logging.getLogger("both")
+        for n in range(5):
+            log.debug("record %s", "x" * 10)
+        eq_(2, len(c.handler.buffer))
+        eq_(2 * len("record %s" + "x" * 10), c.handler.size)
+        log.debug("%(a)s", {'a': "y" * 95})
+        eq_(1, len(c.handler.buffer))
+        eq_(["(5 earlier log records not kept)", "both: DEBUG: " + "y" * 95],
+            c.formatLogRecords())
+        c.handler.truncate()
+        eq_(0, c.handler.size)
+
+    def test_max_records_formats_lazily(self):
+        formatted = []
+        class Arg(object):
+            def __str__(self):
+                formatted.append(self)
+                return 'arg'
+        c = LogCapture()
+        parser = OptionParser()
+        c.addOptions(parser, {})
+        options, args = parser.parse_args(['--logging-max-records=10'])
+        c.configure(options, Config())
+        c.start()
+        log = logging.getLogger("lazy")
+        log.debug("with %s", Arg())
+        try:
+            raise ValueError("oops")
+        except ValueError:
+            log.exception("failed")
+        c.end()
+        eq_([], formatted)
+        assert c.handler.buffer[1].exc_info is None
+        records = c.formatLogRecords()
+        eq_(1, len(formatted))
+        eq_("lazy: DEBUG: with arg", records[0])
+        assert records[1].startswith("lazy: ERROR: failed\nTraceback"), \
+               records[1]
+        assert "ValueError: oops" in records[1]
+
+    def test_filter_decisions_are_bounded(self):
+        from nose.plugins.logcapture import FilterSet
+        filterset = FilterSet(['foo', '-foo.bar'])
+        filterset.maxDecisions = 3
+        for name in ['foo', 'foo.bar', 'baz', 'foo.x']:
+            filterset.allow(name)
+        eq_(1, len(filterset._decisions))
+        assert filterset.allow('foo.x')
+        assert not filterset.allow('foo.bar.y')
+
+    def test_excludes_tree(self):
+        from nose.plugins.logcapture import FilterSet
+        filterset = FilterSet(['foo.bar', 'baz', '-baz.quux'])
+        assert filterset.excludes_tree('other')
+        assert filterset.excludes_tree('baz.quux')
+        assert filterset.excludes_tree('baz.quux.x')
+        assert not filterset.excludes_tree('foo')
+        assert not filterset.excludes_tree('foo.bar.x')
+        assert not filterset.excludes_tree('baz')
+        assert not FilterSet([]).excludes_tree('foo')
+        eq_(True, filterset._trees['other'])
+
+    def test_excluded_loggers_switched_off_during_tests(self):
+        c = LogCapture()
+        parser = OptionParser()
+        c.addOptions(parser, {})
+        options, args = parser.parse_args(
+            ['--logging-filter=-quiet', '--logging-switch-off-excluded'])
+        c.configure(options, Config())
+        c.begin()
+        quiet = logging.getLogger('quiet.child')
+        heard = logging.getLogger('heard')
+        heard_handler = logging.Handler()
+        shared = logging.getLogger('quiet.shared')
+        shared.addHandler(heard_handler)
+        try:
+            c.beforeTest(None)
+            assert not quiet.isEnabledFor(logging.CRITICAL)
+            assert heard.isEnabledFor(logging.DEBUG)
+            # another handler still wants these
+            assert shared.isEnabledFor(logging.DEBUG)
+            c.afterTest(None)
+            assert quiet.isEnabledFor(logging.DEBUG)
+            eq_(logging.NOTSET, quiet.level)
+        finally:
+            shared.removeHandler(heard_handler)
+
+    def test_excluded_loggers_left_on_by_default(self):
+        c = LogCapture()
+        parser = OptionParser()
+        c.addOptions(parser, {})
+        options, args = parser.parse_args(['--logging-filter=-noisy'])
+        c.configure(options, Config())
+        c.begin()
+        noisy = logging.getLogger('noisy.sub')
+        c.beforeTest(None)
+        # a handler added by the test itself still gets the records
+        heard = []
+        handler = logging.Handler()
+        handler.emit = lambda record: heard.append(record.getMessage())
+        noisy.addHandler(handler)
+        try:
+            noisy.warning('heard')
+            eq_(['heard'], heard)
+        finally:
+            noisy.removeHandler(handler)
+        c.afterTest(None)
+        eq_(logging.NOTSET, noisy.level)
+
+    def test_excluded_parent_of_handled_logger_stays_on(self):
+        c = LogCapture()
+        parser = OptionParser()
+        c.addOptions(parser, {})
+        options, args = parser.parse_args(
+            ['--logging-filter=-hush', '--logging-switch-off-excluded'])
+        c.configure(options, Config())
+        c.begin()
+        parent = logging.getLogger('hush')
+        c.beforeTest(None)
+        assert not parent.isEnabledFor(logging.CRITICAL)
+        c.afterTest(None)
+        # a child that inherits the parent's level has its own handler
+        child = logging.getLogger('hush.handled')
+        handler = logging.Handler()
+        child.addHandler(handler)
+        try:
+            c.beforeTest(None)
+            assert parent.isEnabledFor(logging.DEBUG)
+            assert child.isEnabledFor(logging.DEBUG)
+            c.afterTest(None)
+        finally:
+            child.removeHandler(handler)
+        # handlers are checked before every test
+        c.beforeTest(None)
+        assert not child.isEnabledFor(logging.CRITICAL)
+        c.afterTest(None)
+        eq_(logging.NOTSET, parent.level)
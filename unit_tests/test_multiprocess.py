@@ -60,3 +60,198 @@ def test_mp_process_args_pickleable():
         config=config)
     runner.run(test)
         
+
+def test_task_queues_partition_and_steal():
+    from Queue import Queue
+    queues = multiprocess.TaskQueues([Queue(), Queue()])
+    for i in range(5):
+        queues.put(('t%s' % i, None))
+    assert not queues.empty()
+    queues.dispatch()
+    first = queues.forWorker(0)
+    second = queues.forWorker(1)
+    assert [first.get(timeout=0) for i in range(2)] == [
+        ('t0', None), ('t1', None)]
+    queues.stop(1)
+    # worker 0 has run out of tasks: it steals from worker 1, but leaves
+    # worker 1's stop signal alone
+    assert [first.get(timeout=0) for i in range(3)] == [
+        ('t2', None), ('t3', None), ('t4', None)]
+    try:
+        first.get(timeout=0)
+    except multiprocess.Empty:
+        pass
+    else:
+        assert False, "Worker 0 should have no tasks left"
+    assert second.get(timeout=0) == 'STOP'
+    assert queues.empty()
+
+def test_task_queues_skip_idle_peers():
+    from Queue import Queue
+    class CountingQueue(Queue):
+        gets = 0
+        def get(self, *arg, **kw):
+            self.gets += 1
+            return Queue.get(self, *arg, **kw)
+    queues = multiprocess.TaskQueues([CountingQueue() for i in range(4)],
+                                     idle=[0] * 4)
+    for i in range(4):
+        queues.put(('t%s' % i, None))
+    queues.dispatch()
+    workers = [queues.forWorker(i) for i in range(4)]
+    for i, worker in enumerate(workers):
+        assert worker.get(timeout=0) == ('t%s' % i, None)
+    # workers 1, 2 and 3 find their own queues empty and mark them idle
+    for worker in workers[1:]:
+        try:
+            worker.get(timeout=0)
+        except multiprocess.Empty:
+            pass
+    assert queues.idle == [0, 1, 1, 1]
+    # worker 0 runs out too, and does not ask its drained peers for work
+    before = [q.gets for q in queues.queues]
+    try:
+        workers[0].get(timeout=0)
+    except multiprocess.Empty:
+        pass
+    else:
+        assert False, "Worker 0 should have no tasks left"
+    assert [q.gets - b for q, b in zip(queues.queues, before)] == [2, 0, 0, 0]
+    assert queues.idle == [1, 1, 1, 1]
+    # a worker that queues new work is no longer idle, and can be stolen from
+    workers[2].put(('t4', None))
+    assert queues.idle == [1, 1, 0, 1]
+    assert workers[0].get(timeout=0) == ('t4', None)
+
+def test_task_queues_dispatch_longest_first():
+    from Queue import Queue
+    times = {'slow': 5.0, 'medium': 3.0, 'quick': 1.0, 'quicker': 1.0}
+    queues = multiprocess.TaskQueues([Queue(), Queue()])
+    for name in ('quick', 'medium', 'quicker', 'slow'):
+        queues.put((name, None))
+    queues.dispatch(lambda task: times[task[0]])
+    first = queues.forWorker(0)
+    second = queues.forWorker(1)
+    assert first.queues[0].get(timeout=0) == ('slow', None)
+    assert first.queues[0].empty()
+    assert [second.queues[1].get(timeout=0) for i in range(3)] == [
+        ('medium', None), ('quick', None), ('quicker', None)]
+
+def test_forked_worker():
+    import os
+    import subprocess
+    if not hasattr(os, 'fork'):
+        raise SkipTest("os.fork not available")
+    assert multiprocess.ForkedWorker(os.getpid()).is_alive()
+    proc = subprocess.Popen([sys.executable, '-c', 'pass'])
+    proc.wait()
+    worker = multiprocess.ForkedWorker(proc.pid)
+    assert not worker.is_alive()
+    # returns at once for a worker that has exited
+    worker.join()
+
+def test_task_durations():
+    import os
+    import tempfile
+    fd, filename = tempfile.mkstemp()
+    os.close(fd)
+    try:
+        durations = multiprocess.TaskDurations(filename)
+        assert durations.estimate(('a', None)) == 0.0
+        durations.record('a', 2.0)
+        durations.record('b(1,)', 4.0)
+        durations.save()
+        durations = multiprocess.TaskDurations(filename)
+        assert durations.estimate(('a', None)) == 2.0
+        assert durations.estimate(('b', (1,))) == 4.0
+        # unknown tasks are estimated at the mean
+        assert durations.estimate(('c', None)) == 3.0
+    finally:
+        os.remove(filename)
+
+def test_module_cache():
+    import imp
+    class Importer:
+        imported = 0
+        def importFromPath(self, path, fqname):
+            self.imported += 1
+            mod = imp.new_module(fqname)
+            sys.modules[fqname] = mod
+            return mod
+    importer = Importer()
+    cache = multiprocess.ModuleCache(importer)
+    try:
+        mod = cache.importFromPath('/x/mp_cached.py', 'mp_cached')
+        assert cache.importFromPath('/x/mp_cached.py', 'mp_cached') is mod
+        assert cache.imported == 1
+        # a module replaced in sys.modules is imported again
+        del sys.modules['mp_cached']
+        assert cache.importFromPath('/x/mp_cached.py', 'mp_cached') is not mod
+        assert cache.imported == 2
+    finally:
+        sys.modules.pop('mp_cached', None)
+
+def test_task_set():
+    tasks = multiprocess.TaskSet()
+    tasks.extend(['a', 'b', 'a'])
+    assert len(tasks) == 3
+    tasks.remove('a')
+    assert sorted(tasks) == ['a', 'b']
+    tasks.remove('a')
+    tasks.remove('b')
+    assert len(tasks) == 0
+    try:
+        tasks.remove('a')
+    except ValueError:
+        pass
+    else:
+        assert False, "Removing an unknown task should raise ValueError"
+
+def test_result_batch():
+    from Queue import Queue
+    queue = Queue()
+    made = []
+    def makeResult():
+        made.append(object())
+        return made[-1]
+    results = multiprocess.ResultBatch(3, queue, makeResult, id,
+                                       size=2, interval=60)
+    first = results.getResult()
+    results.add('a', [], 1.0)
+    assert results.getResult() is first
+    assert queue.empty()
+    results.add('b', ['b.1'], 2.0)
+    assert queue.get(timeout=0) == (
+        3, [('a', [], 1.0), ('b', ['b.1'], 2.0)], id(first), False)
+    # a new batch gets a new result
+    assert results.getResult() is not first
+    results.flush()
+    assert queue.empty()
+    results.add('c', [], 0.5)
+    results.flush(retiring=True)
+    assert queue.get(timeout=0) == (3, [('c', [], 0.5)], id(made[-1]), True)
+    # a retiring worker always says so, even with nothing left to send
+    results.flush(retiring=True)
+    assert queue.get(timeout=0) == (3, [], id(made[-1]), True)
+
+def test_result_batch_unsent():
+    from Queue import Queue
+    class Value:
+        value = ''
+    queue = Queue()
+    unsent = Value()
+    results = multiprocess.ResultBatch(0, queue, object, id, size=3,
+                                       interval=60, unsent=unsent)
+    results.add('a', [], 1.0)
+    results.add('b', [], 1.0)
+    assert unsent.value == 'a\nb'
+    results.add('c', [], 1.0)
+    assert not queue.empty()
+    assert unsent.value == ''
+
+def test_max_rss():
+    rss = multiprocess.max_rss()
+    if rss is None:
+        raise SkipTest("memory use not available on this platform")
+    # the interpreter alone takes more than a megabyte
+    assert rss > 1, rss
@@ -70,5 +70,44 @@ class TestPluginManager(unittest.TestCase):
         self.assertEqual(len(pm.plugins), 1)
         assert isinstance(pm.plugins[0], BetterPlug2)
 
+    def test_compiled_dispatch(self):
+        from nose.config import Config
+        plug, plug2 = Plug(), Plug2()
+        plug.enabled = plug2.enabled = True
+        pm = PluginManager(plugins=[plug, plug2])
+        pm.configure(None, Config())
+
+        # calls are bound on the manager itself
+        assert 'addError' in pm.__dict__
+        self.assertEqual(pm.addError(None, None), True)
+        self.assertEqual(len(pm.loadTestsFromFile('foo')), 2)
+        # nobody implements startTest
+        self.assertEqual(pm.startTest(None), None)
+        self.assertEqual(pm.loadTestsFromModule(None), [])
+        # one plugin implements loadTestsFromPath: go straight to it
+        plug.loadTestsFromPath = lambda path: 'direct'
+        pm.compile()
+        self.assertEqual(pm.loadTestsFromPath('foo'), 'direct')
+
+        # changing the plugins throws the table away
+        pm.addPlugin(Plug3())
+        assert 'addError' not in pm.__dict__
+        self.assertEqual(len(pm.loadTestsFromModule(None)), 1)
+
+    def test_timing_proxy(self):
+        from nose.plugins.manager import TimingPluginProxy
+        class Proxy(TimingPluginProxy):
+            times = {}
+        pm = PluginManager(plugins=[Plug(), Plug2()], proxyClass=Proxy)
+        self.assertEqual(pm.addError(None, None), True)
+        self.assertEqual(pm.addError(None, None), True)
+        self.assertEqual(len(pm.loadTestsFromFile('foo')), 2)
+        calls, total, longest = Proxy.times[('plug', 'addError')]
+        self.assertEqual(calls, 2)
+        assert total >= longest >= 0
+        # Plug handled addError, so Plug2 was never called
+        self.assertEqual(Proxy.times[('plug2', 'addError')][0], 0)
+        self.assertEqual(Proxy.times[('plug2', 'loadTestsFromFile')][0], 1)
+
 if __name__ == '__main__':
     unittest.main()
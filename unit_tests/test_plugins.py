@@ -15,7 +15,7 @@ from nose.plugins.base import Plugin
 from nose.plugins.cover import Coverage
 from nose.plugins.doctests import Doctest
 from nose.plugins.failuredetail import FailureDetail
-from nose.plugins.prof import Profile
+from nose.plugins.prof import Profile, Sampler
 
 from mock import *
 
@@ -434,5 +434,48 @@ class TestProfPlugin(unittest.TestCase):
         assert not os.path.exists(pfile), \
                "finalize did not remove temp file %s" % pfile
 
+    def test_unit_file_names(self):
+        plug = Profile()
+        plug.saved = {}
+        self.assertEqual(plug._unitFile('/d', 'mod.test_gen(1, "a/b")'),
+            os.path.join('/d', 'mod.test_gen_1_a_b_.prof'))
+        self.assertEqual(plug._unitFile('/d', 'mod.test_gen(1, "a/b")'),
+            os.path.join('/d', 'mod.test_gen_1_a_b_.2.prof'))
+
+
+class TestSampler(unittest.TestCase):
+
+    def test_flush_and_load(self):
+        sampler = Sampler(0.001)
+        def inner():
+            sampler.sample(None, sys._getframe())
+        sampler.current = 'test_mod:test_a'
+        inner()
+        inner()
+        sampler.current = None
+        sampler.sample(None, sys._getframe())
+        stacks = sampler.collapsed()
+        self.assertEqual(sorted(stacks.values()), [1, 2])
+        for stack, count in stacks.items():
+            frames = stack.split(';')
+            if count == 2:
+                self.assertEqual(frames[0], 'test_mod:test_a')
+                assert frames[-1].startswith('inner ('), frames[-1]
+            else:
+                self.assertEqual(frames[0], '<no test>')
+                assert frames[-1].startswith('test_flush_and_load (')
+
+        fd, filename = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            sampler.flush(filename)
+            self.assertEqual(sampler.counts, {})
+            sampler.flush(filename)
+            merged = Sampler(0.001)
+            merged.load(filename)
+        finally:
+            os.remove(filename)
+        self.assertEqual(merged.collapsed(), stacks)
+
 if __name__ == '__main__':
     unittest.main()
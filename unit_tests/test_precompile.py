@@ -0,0 +1,120 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from nose.config import Config
+from nose.loader import TestLoader
+from nose.precompile import _bytecode_path, is_stale, precompile, \
+    stale_sources
+
+
+class TestPrecompile(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.dont_write_bytecode = sys.dont_write_bytecode
+        sys.dont_write_bytecode = False
+        self.write('test_pc_a.py', 'def test_a():\n    pass\n')
+        self.write('pkg/__init__.py', '')
+        self.write('pkg/test_pc_b.py', 'def test_b():\n    pass\n')
+        self.write('pkg/_private.py', 'x = 1\n')
+        self.write('.hidden/test_pc_c.py', 'def test_c():\n    pass\n')
+        self.write('README.txt', 'not python\n')
+
+    def tearDown(self):
+        sys.dont_write_bytecode = self.dont_write_bytecode
+        shutil.rmtree(self.dir)
+
+    def write(self, name, content):
+        path = os.path.join(self.dir, name)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        fh = open(path, 'w')
+        fh.write(content)
+        fh.close()
+        # an mtime well in the past, so that a rewrite is always noticed
+        os.utime(path, (1000000000, 1000000000))
+        return path
+
+    def path(self, name):
+        return os.path.join(self.dir, name)
+
+    def sources(self, *names):
+        return [self.path(name) for name in names]
+
+    def test_stale_sources(self):
+        sources = self.sources('test_pc_a.py', 'pkg/test_pc_b.py')
+        self.assertEqual(stale_sources(sources), sources)
+        precompile(sources[:1], 1)
+        self.assertEqual(stale_sources(sources), sources[1:])
+
+    def test_precompile(self):
+        sources = self.sources('test_pc_a.py', 'pkg/test_pc_b.py',
+                               'pkg/__init__.py')
+        self.assertEqual(precompile(sources, 2), 3)
+        for source in sources:
+            assert os.path.exists(_bytecode_path(source)), source
+            assert not is_stale(source), source
+        self.assertEqual(precompile(sources, 2), 0)
+
+        a = self.path('test_pc_a.py')
+        self.write('test_pc_a.py', 'def test_a():\n    assert True\n')
+        os.utime(a, (1000000100, 1000000100))
+        self.assertEqual(stale_sources(sources), [a])
+        self.assertEqual(precompile(sources, 1), 1)
+        assert not is_stale(a)
+
+    def test_compile_errors_are_left_to_import(self):
+        bad = self.write('test_pc_bad.py', 'def test_bad(:\n')
+        self.assertEqual(precompile([bad, self.path('test_pc_a.py')], 2), 1)
+        assert is_stale(bad)
+
+    def test_no_bytecode(self):
+        sys.dont_write_bytecode = True
+        self.assertEqual(precompile(self.sources('test_pc_a.py'), 2), 0)
+        assert is_stale(self.path('test_pc_a.py'))
+
+    def test_loader_compiles_what_it_collects(self):
+        self.write('venv/lib/test_pc_site.py', 'x = 1\n')
+        loader = TestLoader(config=Config(compileWorkers=2),
+                            workingDir=self.dir)
+        self.assertEqual(sorted(loader._sourceFiles(self.dir)),
+                         self.sources('pkg/__init__.py', 'pkg/test_pc_b.py',
+                                      'test_pc_a.py'))
+        # the entries found are kept for collection
+        assert self.dir in loader._scanned
+        assert self.path('pkg') in loader._scanned
+
+    def test_loader_compiles_before_collecting(self):
+        config = Config(compileWorkers=2)
+        loader = TestLoader(config=config, workingDir=self.dir)
+        # only the directory named is compiled, not the working directory
+        tests = list(loader.loadTestsFromDir(self.path('pkg')))
+        assert not is_stale(self.path('pkg/test_pc_b.py'))
+        assert is_stale(self.path('test_pc_a.py'))
+        self.assertEqual(loader._scanned, {})
+        for name in ('pkg', 'pkg.test_pc_b'):
+            sys.modules.pop(name, None)
+
+        # entries that are never loaded are not kept past the load
+        loader = TestLoader(config=config, workingDir=self.dir)
+        loader._scanned[self.path('elsewhere')] = []
+        list(loader.loadTestsFromDir(self.path('pkg')))
+        self.assertEqual(loader._scanned, {})
+        loader._scanned[self.path('elsewhere')] = []
+        tests = loader.loadTestsFromDir(self.dir)
+        tests.next()
+        tests.close()
+        self.assertEqual(loader._scanned, {})
+        for name in ('pkg', 'pkg.test_pc_b', 'test_pc_a'):
+            sys.modules.pop(name, None)
+
+        config.worker = True
+        loader = TestLoader(config=config, workingDir=self.dir)
+        self.assertEqual(loader.compileWorkers, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -284,6 +284,28 @@ class TestContextSuiteFactory(unittest.TestCase):
         top_ancestors = list([a for a in csf.ancestry(top)])
         self.assertEqual(top_ancestors, [])
 
+    def test_reset(self):
+        class TC(unittest.TestCase):
+            def runTest(self):
+                pass
+        class P:
+            setups = 0
+            def setup(self):
+                self.setups += 1
+
+        context = P()
+        csf = ContextSuiteFactory()
+        csf([TC()], context=context)(unittest.TestResult())
+        assert context in csf.was_setup
+        proxy = csf.resultProxy
+
+        csf.reset()
+        self.assertEqual(csf.was_setup, {})
+        self.assertEqual(csf.suites, {})
+        assert csf.resultProxy is not proxy
+        csf([TC()], context=context)(unittest.TestResult())
+        self.assertEqual(context.setups, 2)
+
 
 if __name__ == '__main__':
     import logging
@@ -400,3 +400,62 @@ class TestXMLOutputWithXML(BaseTestXMLOutputWithXML):
             assert '<?xml version="1.0" encoding="UTF-8"?>' in result
             assert ('<testcase classname="test_xunit.TC" '
                     'name="runTest" time="0') in result
+
+
+class TestXMLOutputStreamed(BaseTestXMLOutputWithXML):
+    def setUp(self):
+        super(TestXMLOutputStreamed, self).setUp()
+        self.configure([
+            "--with-xunit",
+            "--xunit-file=%s" % self.xmlfile,
+            "--xunit-stream"
+        ])
+        self.partial = self.xmlfile + '.partial'
+
+    def tearDown(self):
+        for name in (self.xmlfile, self.partial):
+            if os.path.exists(name):
+                os.unlink(name)
+
+    def add_results(self):
+        test = mktest()
+        self.x.beforeTest(test)
+        self.x.addSuccess(test, (None,None,None))
+        self.x.beforeTest(test)
+        try:
+            raise RuntimeError(u"some \xe6rror happened")
+        except RuntimeError:
+            some_err = sys.exc_info()
+        self.x.addError(test, some_err)
+
+    def test_testcases_written_as_they_complete(self):
+        self.add_results()
+        eq_(self.x.errorlist, [])
+        # the partial file is a report missing only its closing tag
+        f = open(self.partial, 'rb')
+        partial = f.read()
+        f.close()
+        print repr(partial)
+        assert partial.startswith('<?xml version="1.0" encoding="UTF-8"?>'
+                                  '<testsuite name="nosetests">')
+        assert partial.endswith('</error></testcase>')
+        if self.ET:
+            tree = self.ET.fromstring(partial + '</testsuite>')
+            eq_(len(tree.findall("testcase")), 2)
+
+    def test_report_matches_unstreamed(self):
+        self.add_results()
+        result = self.get_xml_report()
+        print repr(result)
+        assert not os.path.exists(self.partial)
+
+        self.x = Xunit()
+        self.configure([
+            "--with-xunit",
+            "--xunit-file=%s" % self.xmlfile
+        ])
+        self.add_results()
+        expected = self.get_xml_report()
+        # only the recorded times may differ
+        times = re.compile(r'time="[\d.]+"')
+        eq_(times.sub('', result), times.sub('', expected))